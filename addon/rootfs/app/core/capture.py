@@ -0,0 +1,201 @@
+"""
+ESP3 Capture Files
+Compact, append-only binary recording of raw ESP3 frames with monotonic
+timestamps and gateway id, plus a sidecar time index and file rotation.
+
+File layout (little endian):
+    Header:  8s magic b'ESP3CAP\\x01' | d wall-clock start (epoch seconds)
+    Record:  B type | B gateway index | H payload length | d seconds since start | payload
+        type 0x01: raw ESP3 frame
+        type 0x02: gateway declaration (payload = UTF-8 gateway id for the index)
+Index file (<capture>.idx), one entry every INDEX_INTERVAL frames:
+    Q byte offset of record | d seconds since start
+All known gateway declarations are repeated at every indexed offset, so a
+reader can start at any index entry.
+"""
+import glob
+import logging
+import os
+import struct
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b'ESP3CAP\x01'
+CAPTURE_SUFFIX = '.esp3cap'
+INDEX_SUFFIX = '.idx'
+
+RECORD_FRAME = 0x01
+RECORD_GATEWAY = 0x02
+
+_FILE_HEADER = struct.Struct('<8sd')
+_RECORD_HEADER = struct.Struct('<BBHd')
+_INDEX_ENTRY = struct.Struct('<Qd')
+
+
+class CaptureWriter:
+    """Append raw frames to rotating capture files"""
+
+    INDEX_INTERVAL = 256
+
+    def __init__(self, directory: str, max_bytes: int = 16 * 1024 * 1024, max_files: int = 10):
+        """
+        Initialize capture writer
+
+        Args:
+            directory: Target directory (created if missing)
+            max_bytes: Rotate to a new file once this size is exceeded
+            max_files: Number of capture files kept (oldest deleted)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.path: Optional[str] = None
+        self._file = None
+        self._index = None
+        self._start_monotonic = 0.0
+        self._gateways: Dict[str, int] = {}
+        self._frames_in_file = 0
+        self.frames_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_new_file(self):
+        self.close()
+        name = datetime.now().strftime('capture-%Y%m%d-%H%M%S-%f') + CAPTURE_SUFFIX
+        self.path = os.path.join(self.directory, name)
+        self._file = open(self.path, 'ab')
+        self._index = open(self.path + INDEX_SUFFIX, 'ab')
+        self._start_monotonic = time.monotonic()
+        self._file.write(_FILE_HEADER.pack(CAPTURE_MAGIC, time.time()))
+        self._gateways = {}
+        self._frames_in_file = 0
+        logger.info(f"Recording ESP3 capture to {self.path}")
+        self._remove_old_files()
+
+    def _remove_old_files(self):
+        files = sorted(glob.glob(os.path.join(self.directory, '*' + CAPTURE_SUFFIX)))
+        for path in files[:-self.max_files] if self.max_files > 0 else []:
+            for target in (path, path + INDEX_SUFFIX):
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+
+    def _declare_gateway(self, gateway_id: str, index: int):
+        payload = gateway_id.encode('utf-8')
+        self._file.write(_RECORD_HEADER.pack(RECORD_GATEWAY, index, len(payload), 0.0) + payload)
+
+    def _gateway_index(self, gateway_id: str) -> int:
+        index = self._gateways.get(gateway_id)
+        if index is None:
+            index = len(self._gateways) & 0xFF
+            self._gateways[gateway_id] = index
+            self._declare_gateway(gateway_id, index)
+        return index
+
+    def write_frame(self, frame: bytes, gateway_id: str = '', timestamp: Optional[float] = None):
+        """
+        Append one raw ESP3 frame
+
+        Args:
+            frame: Complete frame including sync byte and CRCs
+            gateway_id: Receiving gateway (e.g. its connection string)
+            timestamp: time.monotonic() of reception (default: now)
+        """
+        if self._file is None or self._file.tell() >= self.max_bytes:
+            self._open_new_file()
+        if timestamp is None:
+            timestamp = time.monotonic()
+        elapsed = timestamp - self._start_monotonic
+        if self._frames_in_file % self.INDEX_INTERVAL == 0:
+            self._index.write(_INDEX_ENTRY.pack(self._file.tell(), elapsed))
+            for known_id, known_index in self._gateways.items():
+                self._declare_gateway(known_id, known_index)
+        index = self._gateway_index(gateway_id)
+        self._file.write(_RECORD_HEADER.pack(RECORD_FRAME, index, len(frame), elapsed))
+        self._file.write(frame)
+        self._frames_in_file += 1
+        self.frames_written += 1
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+            self._index.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._index.close()
+        self._file = None
+        self._index = None
+
+
+class CaptureReader:
+    """Read frames back from a capture file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(_FILE_HEADER.size)
+        if len(header) != _FILE_HEADER.size:
+            raise ValueError(f"Capture file too short: {path}")
+        magic, self.start_time = _FILE_HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC:
+            raise ValueError(f"Not an ESP3 capture file: {path}")
+        self._index: Optional[List[Tuple[int, float]]] = None
+
+    def _load_index(self) -> List[Tuple[int, float]]:
+        if self._index is None:
+            entries = []
+            try:
+                with open(self.path + INDEX_SUFFIX, 'rb') as f:
+                    data = f.read()
+                usable = len(data) - len(data) % _INDEX_ENTRY.size
+                entries = list(_INDEX_ENTRY.iter_unpack(data[:usable]))
+            except OSError:
+                pass
+            self._index = entries
+        return self._index
+
+    def frames(self, start: float = 0.0) -> Iterator[Tuple[float, str, bytes]]:
+        """
+        Iterate over recorded frames
+
+        Args:
+            start: Skip frames before this many seconds since capture start (uses the index)
+
+        Yields:
+            (seconds since start, gateway id, raw frame)
+        """
+        gateways: Dict[int, str] = {}
+        offset = _FILE_HEADER.size
+        if start > 0:
+            index = self._load_index()
+            pos = bisect_right([entry[1] for entry in index], start) - 1
+            if pos >= 0:
+                offset = index[pos][0]
+
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return  # End of file (or truncated last record)
+                record_type, gateway_index, length, elapsed = _RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                if record_type == RECORD_GATEWAY:
+                    gateways[gateway_index] = payload.decode('utf-8', errors='replace')
+                elif record_type == RECORD_FRAME and elapsed >= start:
+                    yield elapsed, gateways.get(gateway_index, ''), payload
+
+
+def list_captures(path: str) -> List[str]:
+    """Capture files for a file or directory path, oldest first"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*' + CAPTURE_SUFFIX)))
+    return [path]
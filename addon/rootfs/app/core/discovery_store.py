@@ -0,0 +1,135 @@
+"""
+Discovery Store
+Remembers a hash of the last discovery config published (retained) per
+topic, so unchanged configs are not published again after a restart and
+configs of entities that no longer exist can be removed
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Iterable, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+class DiscoveryStore:
+    """Persistent topic -> (device id, config hash) map"""
+
+    def __init__(self, store_file: str = "/data/discovery_hashes.json"):
+        """
+        Initialize discovery store
+
+        Args:
+            store_file: Path to store file
+        """
+        self.store_file = store_file
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.stats = {'updated': 0, 'skipped': 0, 'removed': 0, 'invalidated': 0}
+        self._by_device: Dict[str, Set[str]] = {}
+        self._dirty = False
+        self._load()
+        for topic, entry in self.entries.items():
+            self._by_device.setdefault(entry.get('device'), set()).add(topic)
+
+    def _load(self):
+        """Load hashes from file"""
+        try:
+            if os.path.exists(self.store_file):
+                with open(self.store_file, 'r') as f:
+                    self.entries = json.load(f)
+                logger.info(f"Loaded {len(self.entries)} discovery config hashes from {self.store_file}")
+        except Exception as e:
+            # Without hashes everything is published once more
+            logger.error(f"Error loading discovery hashes: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Save hashes to file (only if something changed since the last save)"""
+        if not self._dirty:
+            return
+        try:
+            directory = os.path.dirname(self.store_file) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.discovery-')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.entries, f)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.store_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._dirty = False
+            logger.debug(f"Saved {len(self.entries)} discovery config hashes to {self.store_file}")
+        except Exception as e:
+            logger.error(f"Error saving discovery hashes: {e}")
+
+    @staticmethod
+    def _hash(payload: bytes) -> str:
+        return hashlib.sha256(payload).hexdigest()
+
+    def is_current(self, topic: str, payload: bytes) -> bool:
+        """True if payload is what was last published to topic"""
+        entry = self.entries.get(topic)
+        return entry is not None and entry['hash'] == self._hash(payload)
+
+    def record(self, topic: str, device_id: str, payload: bytes):
+        """Remember a published config"""
+        previous = self.entries.get(topic)
+        if previous is not None and previous.get('device') != device_id:
+            self._by_device.get(previous.get('device'), set()).discard(topic)
+        self.entries[topic] = {'device': device_id, 'hash': self._hash(payload)}
+        self._by_device.setdefault(device_id, set()).add(topic)
+        self._dirty = True
+
+    def forget(self, topics: Iterable[str]):
+        """Drop removed configs"""
+        for topic in topics:
+            entry = self.entries.pop(topic, None)
+            if entry is not None:
+                self._by_device.get(entry.get('device'), set()).discard(topic)
+                self._dirty = True
+
+    def revalidate(self, retained: Dict[str, bytes]) -> int:
+        """
+        Compare with the configs the broker actually retains (new broker,
+        wiped retained store, configs changed by someone else)
+
+        Args:
+            retained: topic -> payload of the retained configs on the broker
+
+        Returns:
+            Number of entries that no longer match (published again on the next sync)
+        """
+        invalid = 0
+        for topic, entry in list(self.entries.items()):
+            payload = retained.get(topic)
+            if payload is None:
+                # Nothing retained: nothing to clear either
+                self.forget([topic])
+                invalid += 1
+            elif entry['hash'] != self._hash(payload):
+                # Keep the topic, so it is still cleared if the entity is gone
+                entry['hash'] = ''
+                self._dirty = True
+                invalid += 1
+        self.stats['invalidated'] += invalid
+        return invalid
+
+    def topics_of(self, device_id: str) -> List[str]:
+        return sorted(self._by_device.get(device_id, ()))
+
+    def stale(self, current: Iterable[str], keep_devices: Iterable[str]) -> List[str]:
+        """
+        Recorded topics that are neither in current nor belong to keep_devices
+
+        Args:
+            current: Topics of all configs that should exist
+            keep_devices: Devices whose configs are left alone (disabled,
+                profile not available)
+        """
+        current, keep_devices = set(current), set(keep_devices)
+        return [topic for topic, entry in self.entries.items()
+                if topic not in current and entry.get('device') not in keep_devices]
@@ -0,0 +1,81 @@
+"""
+Duplicate Telegram Filter
+Suppresses repeated copies of the same telegram (repeaters, multiple
+subtelegrams) before they reach EEP parsing, persistence and MQTT.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict
+from .esp3_protocol import ESP3Packet
+
+logger = logging.getLogger(__name__)
+
+# Lower nibble of the ERP1 status byte is the repeater count; it differs
+# between the original and repeated copies and is not part of the key.
+REPEATER_COUNT_MASK = 0x0F
+
+
+class DuplicateFilter:
+    """Bounded, time-expiring cache of recently seen telegrams"""
+
+    def __init__(self, window: float = 0.5, max_entries: int = 4096):
+        """
+        Initialize duplicate filter
+
+        Args:
+            window: Seconds in which an identical telegram counts as repeat (0 disables)
+            max_entries: Upper bound of remembered telegrams (oldest evicted first)
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._seen: 'OrderedDict[tuple, float]' = OrderedDict()
+        self.suppressed_total = 0
+        self.suppressed_per_device: Dict[str, int] = {}
+
+    @staticmethod
+    def make_key(packet: ESP3Packet) -> tuple:
+        status = packet.get_status_byte() or 0
+        data = packet.data
+        return (packet.sender_id_int, data[:-1], status & ~REPEATER_COUNT_MASK & 0xFF)
+
+    def is_duplicate(self, packet: ESP3Packet) -> bool:
+        """
+        Check (and remember) a telegram
+
+        Returns:
+            True if the same telegram was seen within the window
+        """
+        if self.window <= 0:
+            return False
+
+        now = time.monotonic()
+        seen = self._seen
+
+        # Expire from the oldest end
+        while seen:
+            oldest_key, oldest_time = next(iter(seen.items()))
+            if now - oldest_time <= self.window:
+                break
+            seen.popitem(last=False)
+
+        key = self.make_key(packet)
+        if key in seen:
+            sender_id = packet.get_sender_id()
+            self.suppressed_total += 1
+            self.suppressed_per_device[sender_id] = self.suppressed_per_device.get(sender_id, 0) + 1
+            logger.debug(f"Suppressed repeated telegram from {sender_id}")
+            return True
+
+        seen[key] = now
+        if len(seen) > self.max_entries:
+            seen.popitem(last=False)
+        return False
+
+    def get_statistics(self) -> dict:
+        return {
+            'window': self.window,
+            'tracked': len(self._seen),
+            'suppressed_total': self.suppressed_total,
+            'suppressed_per_device': dict(self.suppressed_per_device),
+        }
@@ -0,0 +1,137 @@
+"""
+Streaming ESP3 Framer
+Cuts ESP3 packets out of an arbitrary byte stream (Serial/TCP chunks).
+Uses a reusable buffer, memoryview slicing and resynchronisation on the
+next 0x55 sync byte after a CRC error, so a corrupt frame does not take
+the following good packets with it.
+"""
+import logging
+from typing import Dict, List, Union
+from .crc8 import CRC8_TABLE, crc8
+from .esp3_protocol import ESP3Packet
+
+logger = logging.getLogger(__name__)
+
+
+class ESP3Framer:
+    """Incremental ESP3 stream framer with resync and statistics"""
+
+    HEADER_LENGTH = 6  # Sync + 4 header bytes + header CRC
+
+    def __init__(self, max_frame_length: int = 1024):
+        """
+        Initialize framer
+
+        Args:
+            max_frame_length: Upper bound for data + optional length. Headers
+                announcing more are treated as garbage and skipped.
+        """
+        self.max_frame_length = max_frame_length
+        self._buffer = bytearray()
+        self.stats: Dict[str, int] = {}
+        self.reset_statistics()
+
+    def reset(self):
+        """Drop any partially received data (e.g. after reconnect)"""
+        if self._buffer:
+            self.stats['bytes_discarded'] += len(self._buffer)
+        self._buffer.clear()
+
+    def reset_statistics(self):
+        self.stats = {
+            'frames': 0,
+            'bytes_received': 0,
+            'bytes_discarded': 0,
+            'resyncs': 0,
+            'header_crc_errors': 0,
+            'data_crc_errors': 0,
+            'oversized_frames': 0,
+        }
+
+    def get_statistics(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats['buffered_bytes'] = len(self._buffer)
+        return stats
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> List[ESP3Packet]:
+        """
+        Append received bytes and return all packets completed by them
+
+        Args:
+            data: Chunk read from the transport
+
+        Returns:
+            List of parsed ESP3Packet objects (may be empty)
+        """
+        if data:
+            self._buffer += data
+            self.stats['bytes_received'] += len(data)
+        return self._extract()
+
+    def _extract(self) -> List[ESP3Packet]:
+        packets = []
+        buf = self._buffer
+        size = len(buf)
+        pos = 0
+        stats = self.stats
+        table = CRC8_TABLE
+
+        with memoryview(buf) as view:
+            while pos < size:
+                sync = buf.find(ESP3Packet.SYNC_BYTE, pos)
+                if sync < 0:
+                    stats['bytes_discarded'] += size - pos
+                    pos = size
+                    break
+                if sync > pos:
+                    stats['bytes_discarded'] += sync - pos
+                    pos = sync
+
+                if size - pos < self.HEADER_LENGTH:
+                    break
+
+                # Header CRC (4 bytes, unrolled table lookups)
+                header_crc = table[table[table[table[buf[pos + 1]] ^ buf[pos + 2]] ^ buf[pos + 3]] ^ buf[pos + 4]]
+                if header_crc != buf[pos + 5]:
+                    stats['header_crc_errors'] += 1
+                    self._resync(pos)
+                    pos += 1
+                    continue
+
+                payload_length = ((buf[pos + 1] << 8) | buf[pos + 2]) + buf[pos + 3]
+                if payload_length > self.max_frame_length:
+                    stats['oversized_frames'] += 1
+                    self._resync(pos)
+                    pos += 1
+                    continue
+
+                frame_end = pos + self.HEADER_LENGTH + payload_length + 1
+                if frame_end > size:
+                    break  # Wait for the rest of the frame
+
+                data_start = pos + self.HEADER_LENGTH
+                if crc8(view[data_start:frame_end - 1]) != buf[frame_end - 1]:
+                    # The header may have been a false sync inside payload
+                    # data - rescan from the next byte instead of skipping.
+                    stats['data_crc_errors'] += 1
+                    self._resync(pos)
+                    pos += 1
+                    continue
+
+                frame = bytes(view[pos:frame_end])
+                packets.append(ESP3Packet.from_frame(frame))
+                stats['frames'] += 1
+                pos = frame_end
+
+        if pos:
+            del buf[:pos]
+        return packets
+
+    def _resync(self, pos: int):
+        self.stats['resyncs'] += 1
+        self.stats['bytes_discarded'] += 1
+        logger.debug(f"ESP3 framer resync at buffer offset {pos}")
@@ -4,12 +4,22 @@ Handles packet parsing and creation according to ESP3 specification
 """
 import logging
 from typing import Optional, Tuple
+from .crc8 import CRC8, crc8
 
 logger = logging.getLogger(__name__)
 
+# Marker for derived fields that have not been decoded yet
+_UNSET = object()
+
 
 class ESP3Packet:
-    """ESP3 packet structure parser and builder"""
+    """
+    ESP3 packet structure parser and builder
+    
+    Backed by a single buffer holding the complete frame. Derived fields
+    (sender id, RORG, status, dBm, subtelegram count) are decoded on first
+    access and cached.
+    """
     
     SYNC_BYTE = 0x55
     
@@ -36,130 +46,253 @@ class ESP3Packet:
     CO_WR_REPEATER = 0x09
     CO_RD_REPEATER = 0x0A
     
+    __slots__ = (
+        '_buf', 'packet_type', 'data_length', 'optional_length',
+        '_data', '_optional_data', '_sender_id', '_sender_int',
+        '_rorg', '_status', '_dbm', '_subtel_count',
+    )
+    
+    HEADER_LENGTH = 6
+    
     def __init__(self, raw_data: Optional[bytes] = None):
         """Initialize ESP3 packet from raw data or create empty packet"""
         if raw_data:
             self.parse(raw_data)
         else:
-            self.sync = self.SYNC_BYTE
-            self.data_length = 0
-            self.optional_length = 0
-            self.packet_type = 0
-            self.data = b''
-            self.optional_data = b''
-    
-    def parse(self, raw_data: bytes):
+            self._compose(0, b'', b'')
+    
+    @classmethod
+    def from_frame(cls, frame: bytes) -> 'ESP3Packet':
+        """Create packet from a complete frame whose CRCs were already verified (e.g. by the framer)"""
+        packet = cls.__new__(cls)
+        packet._load(frame)
+        return packet
+    
+    @classmethod
+    def from_parts(cls, packet_type: int, data: bytes, optional_data: bytes = b'') -> 'ESP3Packet':
+        """Create packet from packet type, data and optional data"""
+        packet = cls.__new__(cls)
+        packet._compose(packet_type, data, optional_data)
+        return packet
+    
+    def _load(self, frame: bytes):
+        """Adopt a complete frame as backing buffer (no copy, no CRC check)"""
+        self._buf = frame
+        self.data_length = (frame[1] << 8) | frame[2]
+        self.optional_length = frame[3]
+        self.packet_type = frame[4]
+        self._reset_cache()
+    
+    def _compose(self, packet_type: int, data: bytes, optional_data: bytes):
+        """Assemble the backing buffer (header, CRCs) from components"""
+        data_length = len(data)
+        optional_length = len(optional_data)
+        frame = bytearray(self.HEADER_LENGTH + data_length + optional_length + 1)
+        self.build_into(frame, 0, packet_type, data, optional_data)
+        self._buf = bytes(frame)
+        self.data_length = data_length
+        self.optional_length = optional_length
+        self.packet_type = packet_type
+        self._reset_cache()
+    
+    def _reset_cache(self):
+        self._data = None
+        self._optional_data = None
+        self._sender_id = _UNSET
+        self._sender_int = _UNSET
+        self._rorg = _UNSET
+        self._status = _UNSET
+        self._dbm = _UNSET
+        self._subtel_count = _UNSET
+    
+    def parse(self, raw_data: bytes, verify_crc: bool = True):
         """Parse raw ESP3 packet data"""
         if len(raw_data) < 6:
             raise ValueError("Packet too short")
         
         # Parse header
-        self.sync = raw_data[0]
-        if self.sync != self.SYNC_BYTE:
-            raise ValueError(f"Invalid sync byte: {hex(self.sync)}")
+        if raw_data[0] != self.SYNC_BYTE:
+            raise ValueError(f"Invalid sync byte: {hex(raw_data[0])}")
         
-        self.data_length = int.from_bytes(raw_data[1:3], 'big')
-        self.optional_length = raw_data[3]
-        self.packet_type = raw_data[4]
+        view = memoryview(raw_data)
         header_crc = raw_data[5]
         
         # Validate header CRC
-        calculated_header_crc = self.calculate_crc8(raw_data[1:5])
-        if header_crc != calculated_header_crc:
-            raise ValueError(f"Header CRC mismatch: {hex(header_crc)} != {hex(calculated_header_crc)}")
+        if verify_crc:
+            calculated_header_crc = crc8(view[1:5])
+            if header_crc != calculated_header_crc:
+                raise ValueError(f"Header CRC mismatch: {hex(header_crc)} != {hex(calculated_header_crc)}")
         
-        # Extract data and optional data
-        data_start = 6
-        data_end = data_start + self.data_length
-        optional_end = data_end + self.optional_length
+        data_length = (raw_data[1] << 8) | raw_data[2]
+        optional_end = self.HEADER_LENGTH + data_length + raw_data[3]
         
         if len(raw_data) < optional_end + 1:
             raise ValueError("Packet data incomplete")
         
-        self.data = raw_data[data_start:data_end]
-        self.optional_data = raw_data[data_end:optional_end]
+        # Validate data CRC
         data_crc = raw_data[optional_end]
+        if verify_crc:
+            calculated_data_crc = crc8(view[self.HEADER_LENGTH:optional_end])
+            if data_crc != calculated_data_crc:
+                raise ValueError(f"Data CRC mismatch: {hex(data_crc)} != {hex(calculated_data_crc)}")
         
-        # Validate data CRC
-        calculated_data_crc = self.calculate_crc8(self.data + self.optional_data)
-        if data_crc != calculated_data_crc:
-            raise ValueError(f"Data CRC mismatch: {hex(data_crc)} != {hex(calculated_data_crc)}")
+        frame = raw_data[:optional_end + 1]
+        self._load(frame if isinstance(frame, bytes) else bytes(frame))
         
         logger.debug(f"Parsed ESP3 packet: type={hex(self.packet_type)}, data_len={self.data_length}, opt_len={self.optional_length}")
     
+    # --- Field accessors ---
+    
+    @property
+    def sync(self) -> int:
+        return self.SYNC_BYTE
+    
+    @property
+    def data(self) -> bytes:
+        """Data block as bytes (sliced once, then cached)"""
+        if self._data is None:
+            self._data = self._buf[self.HEADER_LENGTH:self.HEADER_LENGTH + self.data_length]
+        return self._data
+    
+    @data.setter
+    def data(self, value: bytes):
+        self._compose(self.packet_type, bytes(value), self.optional_data)
+    
+    @property
+    def optional_data(self) -> bytes:
+        """Optional data block as bytes (sliced once, then cached)"""
+        if self._optional_data is None:
+            start = self.HEADER_LENGTH + self.data_length
+            self._optional_data = self._buf[start:start + self.optional_length]
+        return self._optional_data
+    
+    @optional_data.setter
+    def optional_data(self, value: bytes):
+        self._compose(self.packet_type, self.data, bytes(value))
+    
+    @property
+    def data_view(self) -> memoryview:
+        """Zero-copy view of the data block"""
+        return memoryview(self._buf)[self.HEADER_LENGTH:self.HEADER_LENGTH + self.data_length]
+    
+    @property
+    def optional_view(self) -> memoryview:
+        """Zero-copy view of the optional data block"""
+        start = self.HEADER_LENGTH + self.data_length
+        return memoryview(self._buf)[start:start + self.optional_length]
+    
+    @property
+    def raw(self) -> bytes:
+        """Complete frame including sync byte and CRCs"""
+        return self._buf
+    
     @staticmethod
     def calculate_crc8(data: bytes) -> int:
-        """Calculate CRC8 checksum using EnOcean polynomial"""
-        crc = 0
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = (crc << 1) ^ 0x07
-                else:
-                    crc = crc << 1
-                crc &= 0xFF
-        return crc
+        """Calculate CRC8 checksum using EnOcean polynomial (table-driven)"""
+        return crc8(data)
+    
+    @classmethod
+    def build_into(cls, buffer: bytearray, offset: int, packet_type: int, data: bytes, optional_data: bytes = b'') -> int:
+        """
+        Serialize a frame directly into a preallocated buffer
+        
+        Args:
+            buffer: Writable buffer (must have room for the frame at offset)
+            offset: Start position inside buffer
+            packet_type: ESP3 packet type
+            data: Data block
+            optional_data: Optional data block
+        
+        Returns:
+            Offset directly behind the written frame
+        """
+        data_length = len(data)
+        optional_length = len(optional_data)
+        header_end = offset + cls.HEADER_LENGTH
+        data_end = header_end + data_length
+        frame_end = data_end + optional_length
+        
+        buffer[offset] = cls.SYNC_BYTE
+        buffer[offset + 1] = (data_length >> 8) & 0xFF
+        buffer[offset + 2] = data_length & 0xFF
+        buffer[offset + 3] = optional_length
+        buffer[offset + 4] = packet_type
+        buffer[offset + 5] = crc8(memoryview(buffer)[offset + 1:offset + 5])
+        buffer[header_end:data_end] = data
+        buffer[data_end:frame_end] = optional_data
+        buffer[frame_end] = CRC8(data).update(optional_data).digest()
+        return frame_end + 1
     
     def build(self) -> bytes:
-        """Build raw ESP3 packet from components"""
-        # Build header
-        header = bytes([
-            (self.data_length >> 8) & 0xFF,
-            self.data_length & 0xFF,
-            self.optional_length,
-            self.packet_type
-        ])
-        header_crc = self.calculate_crc8(header)
-        
-        # Build data CRC
-        data_crc = self.calculate_crc8(self.data + self.optional_data)
-        
-        # Assemble packet
-        packet = bytes([self.SYNC_BYTE]) + header + bytes([header_crc]) + self.data + self.optional_data + bytes([data_crc])
-        return packet
+        """Build raw ESP3 packet from components (the backing buffer already is the frame)"""
+        return self._buf
     
     def get_sender_id(self) -> Optional[str]:
-        """Extract sender ID from radio telegram"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
+        """Extract sender ID from radio telegram (hex string, cached)"""
+        if self._sender_id is _UNSET:
+            sender = self.sender_id_int
+            self._sender_id = f"{sender:08x}" if sender is not None else None
+        return self._sender_id
+    
+    @property
+    def sender_id_int(self) -> Optional[int]:
+        """Sender ID as integer (cached)"""
+        if self._sender_int is _UNSET:
+            sender = None
             # Sender ID is always the last 4 bytes before status byte
             # Structure: [RORG] [Data...] [Sender ID - 4 bytes] [Status - 1 byte]
-            if len(self.data) >= 6:  # Minimum: RORG + 1 data + 4 sender + 1 status
-                sender_bytes = self.data[-5:-1]  # Last 4 bytes before status
-                return sender_bytes.hex()
-        return None
+            if self.packet_type == self.PACKET_TYPE_RADIO_ERP1 and self.data_length >= 6:
+                end = self.HEADER_LENGTH + self.data_length - 1
+                sender = int.from_bytes(self._buf[end - 4:end], 'big')
+            self._sender_int = sender
+        return self._sender_int
     
     def get_rorg(self) -> Optional[int]:
         """Extract RORG (R-ORG) from radio telegram"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            if len(self.data) >= 1:
-                return self.data[0]
-        return None
+        if self._rorg is _UNSET:
+            rorg = None
+            if self.packet_type == self.PACKET_TYPE_RADIO_ERP1 and self.data_length >= 1:
+                rorg = self._buf[self.HEADER_LENGTH]
+            self._rorg = rorg
+        return self._rorg
     
     def get_rssi(self) -> Optional[int]:
-        """Extract RSSI from optional data"""
-        if len(self.optional_data) >= 6:
-            # RSSI is at byte 5 of optional data
-            rssi_raw = self.optional_data[5]
-            # Convert to dBm (negative value)
-            return -rssi_raw
-        return None
+        """Extract RSSI (dBm) from optional data"""
+        if self._dbm is _UNSET:
+            dbm = None
+            if self.optional_length >= 6:
+                # RSSI is at byte 5 of optional data, convert to dBm (negative value)
+                dbm = -self._buf[self.HEADER_LENGTH + self.data_length + 5]
+            self._dbm = dbm
+        return self._dbm
+    
+    @property
+    def subtelegram_count(self) -> Optional[int]:
+        """Number of subtelegrams (first byte of ERP1 optional data)"""
+        if self._subtel_count is _UNSET:
+            count = None
+            if self.packet_type == self.PACKET_TYPE_RADIO_ERP1 and self.optional_length >= 1:
+                count = self._buf[self.HEADER_LENGTH + self.data_length]
+            self._subtel_count = count
+        return self._subtel_count
     
     def get_data_bytes(self) -> bytes:
         """Get data bytes (without RORG, sender ID, and status)"""
         if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            if len(self.data) >= 6:
+            if self.data_length >= 6:
                 # Data is between RORG and sender ID
                 # Structure: [RORG] [Data...] [Sender ID - 4 bytes] [Status - 1 byte]
-                return self.data[1:-5]  # Skip RORG, skip last 5 bytes (4 ID + 1 status)
+                return self._buf[self.HEADER_LENGTH + 1:self.HEADER_LENGTH + self.data_length - 5]
         return b''
     
     def get_status_byte(self) -> Optional[int]:
         """Get status byte from telegram"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            if len(self.data) >= 1:
-                return self.data[-1]
-        return None
+        if self._status is _UNSET:
+            status = None
+            if self.packet_type == self.PACKET_TYPE_RADIO_ERP1 and self.data_length >= 1:
+                status = self._buf[self.HEADER_LENGTH + self.data_length - 1]
+            self._status = status
+        return self._status
     
     def is_teach_in(self) -> bool:
         """Check if this is a teach-in telegram"""
@@ -184,13 +317,7 @@ class ESP3Packet:
     @classmethod
     def create_common_command(cls, command: int, data: bytes = b'') -> 'ESP3Packet':
         """Create a common command packet"""
-        packet = cls()
-        packet.packet_type = cls.PACKET_TYPE_COMMON_COMMAND
-        packet.data = bytes([command]) + data
-        packet.data_length = len(packet.data)
-        packet.optional_length = 0
-        packet.optional_data = b''
-        return packet
+        return cls.from_parts(cls.PACKET_TYPE_COMMON_COMMAND, bytes([command]) + data)
     
     @classmethod
     def create_read_base_id(cls) -> 'ESP3Packet':
@@ -216,9 +343,6 @@ class ESP3Packet:
         Returns:
             ESP3Packet with teach-in response
         """
-        packet = cls()
-        packet.packet_type = cls.PACKET_TYPE_RADIO_ERP1
-        
         # Convert device ID to bytes
         device_id_bytes = bytes.fromhex(device_id)
         
@@ -243,14 +367,10 @@ class ESP3Packet:
         rorg = 0xA5  # 4BS
         status = 0x00  # No special status
         
-        packet.data = bytes([rorg, db3, db2, db1, db0]) + device_id_bytes + bytes([status])
-        packet.data_length = len(packet.data)
+        data = bytes([rorg, db3, db2, db1, db0]) + device_id_bytes + bytes([status])
         
         # Optional data (empty for now)
-        packet.optional_length = 0
-        packet.optional_data = b''
-        
-        return packet
+        return cls.from_parts(cls.PACKET_TYPE_RADIO_ERP1, data)
     
     @classmethod
     def create_radio_packet(cls, sender_id: str, destination_id: str, rorg: int, data_bytes: bytes, status: int = 0x00) -> 'ESP3Packet':
@@ -267,24 +387,20 @@ class ESP3Packet:
         Returns:
             ESP3Packet ready to send
         """
-        packet = cls()
-        packet.packet_type = cls.PACKET_TYPE_RADIO_ERP1
-        
         # Convert IDs to bytes
         sender_id_bytes = bytes.fromhex(sender_id)
         destination_id_bytes = bytes.fromhex(destination_id)
         
         # Build packet data: RORG + Data + Sender ID + Status
-        packet.data = bytes([rorg]) + data_bytes + sender_id_bytes + bytes([status])
-        packet.data_length = len(packet.data)
+        data = bytes([rorg]) + data_bytes + sender_id_bytes + bytes([status])
         
         # Build optional data: SubTelNum + Destination ID + dBm + Security Level
         # SubTelNum: 3 (number of subtelegrams)
         # Destination ID: 4 bytes
         # dBm: 0xFF (not used for sending)
         # Security Level: 0 (no encryption)
-        packet.optional_data = bytes([0x03]) + destination_id_bytes + bytes([0xFF, 0x00])
-        packet.optional_length = len(packet.optional_data)
+        optional_data = bytes([0x03]) + destination_id_bytes + bytes([0xFF, 0x00])
+        packet = cls.from_parts(cls.PACKET_TYPE_RADIO_ERP1, data, optional_data)
         
         logger.debug(f"Created radio packet: RORG={hex(rorg)}, sender={sender_id}, dest={destination_id}, data={data_bytes.hex()}")
         
@@ -343,8 +459,9 @@ class ESP3Packet:
         return cls.create_radio_packet(sender_id, destination_id, 0xA5, data_bytes, 0x00)
     
     def __repr__(self) -> str:
+        rorg = self.get_rorg()
         return (f"ESP3Packet(type={hex(self.packet_type)}, "
                 f"data_len={self.data_length}, "
                 f"opt_len={self.optional_length}, "
                 f"sender={self.get_sender_id()}, "
-                f"rorg={hex(self.get_rorg()) if self.get_rorg() else None})")
+                f"rorg={hex(rorg) if rorg else None})")
@@ -0,0 +1,273 @@
+"""
+Gateway Manager
+Runs several EnOcean gateways (TCP and/or Serial) side by side, merges
+their telegrams into one pipeline with cross-gateway deduplication and
+routes outgoing commands through the gateway a device is paired with
+(optionally the one with the best link to the target).
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from .esp3_protocol import ESP3Packet
+from .serial_handler import SerialHandler
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingTelegram:
+    """Copies of one telegram collected during the hold time"""
+
+    __slots__ = ('packet', 'gateway_id', 'rssi', 'first_seen', 'copies', 'dispatched', 'gateways')
+
+    def __init__(self, packet: ESP3Packet, gateway_id: str, now: float):
+        self.packet = packet
+        self.gateway_id = gateway_id
+        self.rssi = packet.get_rssi()
+        self.first_seen = now
+        self.copies = 1
+        self.dispatched = False
+        self.gateways = {gateway_id}  # Gateways that delivered a copy
+
+
+class TelegramDeduplicator:
+    """
+    Time-windowed dedup cache for telegrams received by several gateways.
+
+    The key is sender id + payload (without the status byte, whose repeater
+    bits differ between copies). The first copy opens a short hold time in
+    which further copies compete on RSSI; the best one is dispatched, later
+    copies inside the window are dropped. Only copies from other gateways
+    are merged: the same telegram arriving twice at one gateway is a real
+    repeat (rocker pressed again, unchanged sensor value) and left to the
+    per-device DuplicateFilter. The window only has to cover the hold time
+    plus the latency difference between gateways.
+    """
+
+    def __init__(self, window: float = 0.3, hold_time: float = 0.03):
+        self.window = window
+        self.hold_time = hold_time
+        self._entries: Dict[tuple, _PendingTelegram] = {}
+        self._last_purge = 0.0
+
+    @staticmethod
+    def make_key(packet: ESP3Packet) -> tuple:
+        return (packet.sender_id_int, packet.data[:-1])
+
+    def _purge(self, now: float):
+        if now - self._last_purge < self.window:
+            return
+        self._last_purge = now
+        expired = [key for key, entry in self._entries.items() if now - entry.first_seen > self.window]
+        for key in expired:
+            del self._entries[key]
+
+    def offer(self, packet: ESP3Packet, gateway_id: str) -> Optional[_PendingTelegram]:
+        """
+        Register a received copy
+
+        Returns:
+            New pending entry if this is the first copy, otherwise None
+        """
+        now = time.monotonic()
+        self._purge(now)
+        key = self.make_key(packet)
+        entry = self._entries.get(key)
+        if entry and now - entry.first_seen <= self.window and gateway_id not in entry.gateways:
+            entry.copies += 1
+            entry.gateways.add(gateway_id)
+            if not entry.dispatched:
+                rssi = packet.get_rssi()
+                if rssi is not None and (entry.rssi is None or rssi > entry.rssi):
+                    entry.packet = packet
+                    entry.gateway_id = gateway_id
+                    entry.rssi = rssi
+            return None
+        entry = _PendingTelegram(packet, gateway_id, now)
+        self._entries[key] = entry
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class GatewayManager:
+    """Owns N SerialHandlers and feeds their telegrams into one callback"""
+
+    LINK_MAX_AGE = 600.0  # Seconds a gateway/device RSSI sample stays relevant
+
+    def __init__(self, connection_strings: List[str], duty_cycle: float = 0.01,
+                 dedup_window: float = 0.3, hold_time: float = 0.03, route_by_rssi: bool = False):
+        """
+        Args:
+            connection_strings: Gateways; the first one is the primary
+            duty_cycle: TX duty cycle per gateway
+            dedup_window: Seconds in which copies from other gateways are merged
+            hold_time: Seconds copies compete on RSSI before dispatch
+            route_by_rssi: Send commands of unpinned devices through the gateway
+                with the best recent RSSI instead of the primary gateway. Actuators
+                must then have learned the base ID of every gateway.
+        """
+        self.route_by_rssi = route_by_rssi
+        self.handlers: Dict[str, SerialHandler] = {}
+        for connection_string in connection_strings:
+            if connection_string in self.handlers:
+                continue
+            self.handlers[connection_string] = SerialHandler(connection_string, duty_cycle=duty_cycle)
+        self.dedup = TelegramDeduplicator(window=dedup_window, hold_time=hold_time)
+        self._callback: Optional[Callable[[ESP3Packet], Awaitable[None]]] = None
+        self._dispatch_queue: asyncio.Queue = asyncio.Queue()
+        # device_id -> gateway_id -> (rssi, monotonic timestamp)
+        self.links: Dict[str, Dict[str, tuple]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {
+            gateway_id: {'telegrams': 0, 'duplicates': 0, 'forwarded': 0, 'commands': 0, 'rssi_routed': 0}
+            for gateway_id in self.handlers
+        }
+
+    @property
+    def primary(self) -> Optional[SerialHandler]:
+        """First configured gateway (used for status display and as routing fallback)"""
+        return next(iter(self.handlers.values()), None)
+
+    async def open(self) -> int:
+        """Open all gateways; returns the number of connected ones"""
+        results = await asyncio.gather(*(handler.open() for handler in self.handlers.values()))
+        for gateway_id, success in zip(self.handlers, results):
+            if success:
+                logger.info(f"✓ Gateway connected: {gateway_id}")
+            else:
+                logger.warning(f"⚠️ Gateway {gateway_id} not reachable. Will retry...")
+        return sum(1 for success in results if success)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.stop_reading()
+            handler.close()
+
+    def is_open(self) -> bool:
+        return any(handler.is_open() for handler in self.handlers.values())
+
+    # --- Receive path ---
+
+    async def start_reading(self, callback: Callable[[ESP3Packet], Awaitable[None]]):
+        """Run all gateway read loops plus the dispatcher until stopped"""
+        self._callback = callback
+        tasks = [asyncio.create_task(self._dispatch_loop())]
+        for gateway_id, handler in self.handlers.items():
+            tasks.append(asyncio.create_task(handler.start_reading(self._make_receiver(gateway_id))))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _make_receiver(self, gateway_id: str):
+        async def receive(packet: ESP3Packet):
+            self._on_telegram(gateway_id, packet)
+        return receive
+
+    def _on_telegram(self, gateway_id: str, packet: ESP3Packet):
+        self.stats[gateway_id]['telegrams'] += 1
+        sender_id = packet.get_sender_id()
+        rssi = packet.get_rssi()
+        if sender_id and rssi is not None:
+            self.links.setdefault(sender_id, {})[gateway_id] = (rssi, time.monotonic())
+
+        if len(self.handlers) == 1:
+            self.stats[gateway_id]['forwarded'] += 1
+            self._dispatch_queue.put_nowait(packet)
+            return
+
+        entry = self.dedup.offer(packet, gateway_id)
+        if entry is None:
+            self.stats[gateway_id]['duplicates'] += 1
+            return
+        asyncio.get_running_loop().call_later(self.dedup.hold_time, self._release, entry)
+
+    def _release(self, entry: _PendingTelegram):
+        entry.dispatched = True
+        self.stats[entry.gateway_id]['forwarded'] += 1
+        self._dispatch_queue.put_nowait(entry.packet)
+
+    async def _dispatch_loop(self):
+        while True:
+            packet = await self._dispatch_queue.get()
+            try:
+                await self._callback(packet)
+            except Exception as e:
+                logger.error(f"Error dispatching telegram: {e}")
+
+    # --- Transmit path ---
+
+    def best_gateway(self, device_id: Optional[str]) -> Optional[SerialHandler]:
+        """Connected gateway with the best recent RSSI to device_id (fallback: first connected)"""
+        now = time.monotonic()
+        best_handler = None
+        best_rssi = None
+        for gateway_id, (rssi, seen) in self.links.get(device_id, {}).items():
+            handler = self.handlers.get(gateway_id)
+            if not handler or not handler.is_open() or now - seen > self.LINK_MAX_AGE:
+                continue
+            if best_rssi is None or rssi > best_rssi:
+                best_handler, best_rssi = handler, rssi
+        if best_handler:
+            return best_handler
+        for handler in self.handlers.values():
+            if handler.is_open():
+                return handler
+        return self.primary
+
+    def _gateway_id(self, handler: SerialHandler) -> str:
+        return handler.connection_string
+
+    def gateway_for(self, device_id: Optional[str], pinned: Optional[str] = None) -> Optional[SerialHandler]:
+        """
+        Gateway to send commands to device_id through
+
+        The sender ID of a command is the base ID of the sending gateway, so
+        an actuator only reacts to the gateway it was paired with: the
+        pinned gateway (device setting "gateway"), otherwise the primary
+        one. RSSI routing applies to unpinned devices if enabled.
+        """
+        if pinned:
+            handler = self.handlers.get(pinned)
+            if handler:
+                return handler
+            logger.warning(f"Gateway {pinned} of device {device_id} is not configured, using default routing")
+        if self.route_by_rssi:
+            handler = self.best_gateway(device_id)
+            if handler and handler is not self.primary:
+                self.stats[self._gateway_id(handler)]['rssi_routed'] += 1
+            return handler
+        return self.primary
+
+    async def send_telegram(self, destination_id: str, rorg: int, data_bytes: bytes,
+                            gateway: Optional[str] = None, **kwargs) -> bool:
+        handler = self.gateway_for(destination_id, gateway)
+        if not handler:
+            return False
+        self.stats[self._gateway_id(handler)]['commands'] += 1
+        return await handler.send_telegram(destination_id, rorg, data_bytes, **kwargs)
+
+    async def send_rps_command(self, destination_id: str, button_code: int,
+                               gateway: Optional[str] = None, **kwargs) -> bool:
+        handler = self.gateway_for(destination_id, gateway)
+        if not handler:
+            return False
+        self.stats[self._gateway_id(handler)]['commands'] += 1
+        return await handler.send_rps_command(destination_id, button_code, **kwargs)
+
+    # --- Status ---
+
+    def get_statistics(self) -> List[dict]:
+        result = []
+        for gateway_id, handler in self.handlers.items():
+            result.append({
+                'id': gateway_id,
+                'connected': handler.is_open(),
+                'base_id': handler.base_id,
+                'version': handler.version_info,
+                'telegrams': dict(self.stats[gateway_id]),
+                'link': handler.get_statistics(),
+            })
+        return result
@@ -0,0 +1,129 @@
+"""
+Home Assistant Replay
+Republishes discovery configs, availability and last known states when
+Home Assistant comes online (birth message on homeassistant/status).
+Messages are paced by a token bucket and only a limited number of devices
+wait for broker acknowledgement at a time, so a large installation does
+not flood the broker or HA.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows `rate` messages per second on average, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available (at most one full bucket is required)"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class HAReplay:
+    """Paced replay of per-device message batches"""
+
+    def __init__(self, rate: float = 50.0, concurrency: int = 4, burst: Optional[float] = None,
+                 ack_timeout: float = 5.0):
+        """
+        Args:
+            rate: Messages per second
+            concurrency: Devices whose messages may be unacknowledged at the same time
+            burst: Messages that may be sent at once (default: one second worth)
+            ack_timeout: Seconds to wait for the broker to acknowledge a device's messages
+        """
+        self.rate = max(0.1, rate)
+        self.concurrency = max(1, concurrency)
+        self.burst = burst if burst is not None else self.rate
+        self.ack_timeout = ack_timeout
+        self.stats = {'runs': 0, 'devices': 0, 'messages': 0, 'ack_timeouts': 0,
+                      'running': False, 'last_duration': None}
+        self._task: Optional[asyncio.Task] = None
+
+    def trigger(self, batches: List[List[Tuple[str, object]]], publish: Callable):
+        """
+        Start a replay, cancelling one still in progress (HA restarted again)
+
+        Args:
+            batches: Messages (topic, payload) per device, in replay order
+            publish: function(topic, payload) -> MQTTMessageInfo (or None)
+        """
+        if self._task and not self._task.done():
+            logger.info("Home Assistant online again, restarting replay")
+            self._task.cancel()
+        self._task = asyncio.create_task(self._run(batches, publish))
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def get_statistics(self) -> dict:
+        stats = dict(self.stats)
+        stats['rate'] = self.rate
+        stats['concurrency'] = self.concurrency
+        return stats
+
+    async def _run(self, batches, publish):
+        bucket = TokenBucket(self.rate, self.burst)
+        queue = asyncio.Queue()
+        for batch in batches:
+            queue.put_nowait(batch)
+        start = time.monotonic()
+        self.stats['runs'] += 1
+        self.stats['running'] = True
+        logger.info(f"Home Assistant online: replaying {len(batches)} devices "
+                    f"({sum(len(b) for b in batches)} messages, {self.rate:g}/s)")
+
+        async def worker():
+            while True:
+                try:
+                    batch = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await bucket.acquire(len(batch))
+                infos = [publish(topic, payload) for topic, payload in batch]
+                self.stats['devices'] += 1
+                self.stats['messages'] += len(batch)
+                await self._acknowledged(infos)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(batches)) or 1)]
+        try:
+            await asyncio.gather(*workers)
+            self.stats['last_duration'] = round(time.monotonic() - start, 2)
+            logger.info(f"✓ Replay finished in {self.stats['last_duration']}s")
+        except asyncio.CancelledError:
+            for task in workers:
+                task.cancel()
+            raise
+        finally:
+            self.stats['running'] = False
+
+    async def _acknowledged(self, infos):
+        """Wait until the broker acknowledged all messages (QoS 1) or ack_timeout passed"""
+        deadline = time.monotonic() + self.ack_timeout
+        pending = [info for info in infos if info is not None and hasattr(info, 'is_published')]
+        while pending:
+            pending = [info for info in pending if not info.is_published()]
+            if not pending:
+                return
+            if time.monotonic() > deadline:
+                self.stats['ack_timeouts'] += 1
+                return
+            await asyncio.sleep(0.02)
@@ -0,0 +1,201 @@
+"""
+Link Health Monitor
+Per-gateway state machine replacing the polling keepalive: pings with
+CO_RD_VERSION after an idle interval (measuring the round trip), declares
+the link dead after missed pings and reconnects with exponential backoff
+and jitter. Keeps a rolling RTT / uptime / reconnect history for the
+status API.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_CONNECTING = 'connecting'
+STATE_UP = 'up'
+STATE_PROBING = 'probing'       # Ping(s) missed, link not yet given up
+STATE_DOWN = 'down'             # Waiting for the next reconnect attempt
+
+
+class LinkHealthMonitor:
+    """Drives keepalive pings and reconnects for one gateway"""
+
+    def __init__(self, is_open: Callable[[], bool], reconnect: Callable[[], Awaitable[bool]],
+                 disconnect: Callable[[str], None], ping: Callable[[float], Awaitable[Optional[float]]],
+                 last_activity: Callable[[], float], ping_interval: float = 15.0, ping_timeout: float = 2.0,
+                 max_missed_pings: int = 2, backoff_initial: float = 1.0, backoff_max: float = 60.0,
+                 history_size: int = 60):
+        """
+        Initialize monitor
+
+        Args:
+            is_open: Returns the current transport state
+            reconnect: Opens the transport again, returns success
+            disconnect: Closes the transport (argument: reason)
+            ping: Sends CO_RD_VERSION, returns the round trip in seconds or None
+            last_activity: time.monotonic() of the last received byte
+            ping_interval: Idle seconds before a ping is sent
+            ping_timeout: Seconds to wait for the ping response
+            max_missed_pings: Consecutive missed pings before the link counts as dead
+            backoff_initial: First reconnect delay (doubles per failed attempt)
+            backoff_max: Upper bound of the reconnect delay
+            history_size: Entries kept per rolling history
+        """
+        self._is_open = is_open
+        self._reconnect = reconnect
+        self._disconnect = disconnect
+        self._ping = ping
+        self._last_activity = last_activity
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.max_missed_pings = max_missed_pings
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        self.state = STATE_CONNECTING
+        self.connected_since: Optional[float] = None
+        self.missed_pings = 0
+        self.reconnect_attempts = 0
+        self.next_attempt_in = 0.0
+        self.last_disconnect_reason: Optional[str] = None
+        self.rtt_history: deque = deque(maxlen=history_size)
+        self.session_history: deque = deque(maxlen=history_size)  # Durations of finished sessions
+        self.stats = {
+            'pings_sent': 0,
+            'pings_failed': 0,
+            'disconnects': 0,
+            'reconnects': 0,
+            'failed_reconnects': 0,
+        }
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Events from the handler ---
+
+    def notify_connection_lost(self, reason: str = 'connection lost'):
+        """Transport reported a loss; wakes the monitor immediately"""
+        self._mark_down(reason)
+        if self._changed:
+            self._changed.set()
+
+    def _mark_down(self, reason: str):
+        if self.connected_since is not None:
+            self.session_history.append(round(time.monotonic() - self.connected_since, 1))
+            self.connected_since = None
+            self.stats['disconnects'] += 1
+            self.last_disconnect_reason = reason
+            logger.warning(f"Link down: {reason}")
+        self.state = STATE_DOWN
+
+    def _mark_up(self):
+        self.state = STATE_UP
+        self.connected_since = time.monotonic()
+        self.missed_pings = 0
+
+    # --- State machine ---
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _wait(self, timeout: float):
+        """Sleep up to timeout, returning early on a connection event"""
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                if not self._is_open():
+                    if self.connected_since is not None:
+                        self._mark_down('connection lost')
+                    await self._reconnect_with_backoff()
+                    continue
+
+                if self.connected_since is None:
+                    self._mark_up()
+
+                idle = time.monotonic() - self._last_activity()
+                if idle < self.ping_interval:
+                    await self._wait(self.ping_interval - idle)
+                    continue
+
+                await self._probe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Link monitor error: {e}")
+                await asyncio.sleep(1)
+
+    async def _probe(self):
+        self.stats['pings_sent'] += 1
+        rtt = await self._ping(self.ping_timeout)
+        if rtt is not None:
+            self.rtt_history.append(round(rtt * 1000, 2))
+            self.missed_pings = 0
+            self.state = STATE_UP
+            logger.debug(f"Gateway ping RTT {rtt * 1000:.1f} ms")
+            return
+
+        self.stats['pings_failed'] += 1
+        self.missed_pings += 1
+        if self.missed_pings < self.max_missed_pings:
+            self.state = STATE_PROBING
+            logger.warning(f"Gateway ping unanswered ({self.missed_pings}/{self.max_missed_pings})")
+            return
+        reason = f"no answer to {self.missed_pings} pings"
+        self._mark_down(reason)
+        self._disconnect(reason)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with 'equal jitter' (half fixed, half random)"""
+        delay = min(self.backoff_max, self.backoff_initial * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _reconnect_with_backoff(self):
+        self.state = STATE_DOWN
+        self.next_attempt_in = self.backoff_delay(self.reconnect_attempts)
+        logger.warning(f"Reconnecting in {self.next_attempt_in:.1f}s (attempt {self.reconnect_attempts + 1})")
+        await asyncio.sleep(self.next_attempt_in)
+        self.state = STATE_CONNECTING
+        if await self._reconnect():
+            self.reconnect_attempts = 0
+            self.stats['reconnects'] += 1
+            self._mark_up()
+            logger.info("Connection re-established")
+        else:
+            self.reconnect_attempts += 1
+            self.stats['failed_reconnects'] += 1
+
+    # --- Status ---
+
+    def get_statistics(self) -> dict:
+        rtts = list(self.rtt_history)
+        stats = dict(self.stats)
+        stats.update({
+            'state': self.state,
+            'uptime': round(time.monotonic() - self.connected_since, 1) if self.connected_since is not None else 0.0,
+            'missed_pings': self.missed_pings,
+            'reconnect_attempts': self.reconnect_attempts,
+            'last_disconnect_reason': self.last_disconnect_reason,
+            'rtt_last_ms': rtts[-1] if rtts else None,
+            'rtt_avg_ms': round(sum(rtts) / len(rtts), 2) if rtts else None,
+            'rtt_min_ms': min(rtts) if rtts else None,
+            'rtt_max_ms': max(rtts) if rtts else None,
+            'rtt_history_ms': rtts,
+            'session_history_s': list(self.session_history),
+        })
+        return stats
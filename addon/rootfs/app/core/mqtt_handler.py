@@ -2,10 +2,19 @@ import asyncio
 import json
 import logging
 import os
+import time
 import paho.mqtt.client as mqtt
 
 logger = logging.getLogger(__name__)
 
+DEVICE_DISCOVERY_PREFIX = "homeassistant/device/"
+# Published to the old topics before switching discovery modes (HA keeps entity ids and history)
+MIGRATE_PAYLOAD = '{"migrate_discovery": true}'
+# HA birth/last will topic (MQTT integration default)
+HA_STATUS_TOPIC = "homeassistant/status"
+# Entity and device configs (homeassistant/<component>/<object id>/config)
+DISCOVERY_CONFIG_TOPICS = "homeassistant/+/+/config"
+
 class MQTTHandler:
     def __init__(self, host, port, username, password):
         self.host = host
@@ -22,11 +31,30 @@ class MQTTHandler:
         
         self.connected = False
         self.command_callback = None
+        self.ha_online_callback = None
+        self.reconnect_callback = None
         self.event_loop = None
+        self._was_connected = False
+        self._subscribed = set()
+        # topic -> payload while revalidate_discovery collects the retained configs
+        self._retained_configs = None
+        self._retained_last = 0.0
+
+        # (device_id, entity key) -> (entity descriptor, device fingerprint, topic, serialized config)
+        self._discovery_cache = {}
+        self.discovery_stats = {'hits': 0, 'misses': 0}
+        # Hashes of the retained configs (DiscoveryStore); None publishes every time
+        self.discovery_store = None
+        # Config topics the broker retains (last revalidate_discovery), None if unknown
+        self.retained_discovery = None
+        # One homeassistant/device/<id>/config per device instead of one config per entity
+        self.device_discovery = False
+        self.discovery_origin = {"name": "EnOcean MQTT TCP"}
 
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
+        self.client.on_subscribe = self.on_subscribe
 
     def connect(self):
         try:
@@ -43,6 +71,12 @@ class MQTTHandler:
             logger.info("✓ Connected to MQTT broker")
             if self.command_callback:
                 client.subscribe("enocean/+/set/#")
+            if self.ha_online_callback:
+                client.subscribe(HA_STATUS_TOPIC)
+            # Clean session: the broker may have been replaced or restarted without its retained store
+            if self._was_connected and self.reconnect_callback and self.event_loop:
+                asyncio.run_coroutine_threadsafe(self.reconnect_callback(), self.event_loop)
+            self._was_connected = True
         else:
             logger.error(f"Failed to connect to MQTT, return code {rc}")
 
@@ -50,8 +84,21 @@ class MQTTHandler:
         self.connected = False
         logger.warning("Disconnected from MQTT broker")
 
+    def on_subscribe(self, client, userdata, mid, granted_qos):
+        if self._retained_configs is not None:
+            self._subscribed.add(mid)
+
     def on_message(self, client, userdata, msg):
         try:
+            if self._retained_configs is not None and msg.retain and msg.topic.endswith('/config'):
+                self._retained_configs[msg.topic] = msg.payload
+                self._retained_last = time.monotonic()
+                return
+            if msg.topic == HA_STATUS_TOPIC:
+                # Retained "online" is no restart, only a new birth message triggers the replay
+                if msg.payload == b'online' and not msg.retain and self.ha_online_callback and self.event_loop:
+                    asyncio.run_coroutine_threadsafe(self.ha_online_callback(), self.event_loop)
+                return
             if not self.command_callback or not self.event_loop: return
             parts = msg.topic.split('/')
             if len(parts) >= 4 and parts[2] == 'set':
@@ -69,9 +116,191 @@ class MQTTHandler:
         self.command_callback = callback
         self.client.subscribe("enocean/+/set/#")
 
-    def publish_discovery(self, device, entity, controllable=False):
+    def subscribe_ha_status(self, callback):
+        """callback: async function() called when Home Assistant publishes its birth message"""
+        self.ha_online_callback = callback
+        self.client.subscribe(HA_STATUS_TOPIC)
+
+    async def revalidate_discovery(self, quiet=0.5, timeout=10.0):
+        """
+        Check the discovery store against the configs the broker retains;
+        configs the broker lost or that differ are published again by the
+        next sync instead of being skipped. Also fills retained_discovery
+
+        Args:
+            quiet: Seconds without a retained config after which all are assumed received
+            timeout: Seconds to wait at most
+
+        Returns:
+            Number of store entries invalidated, None if the broker did not answer
+        """
+        store = self.discovery_store
+        if store is None:
+            return 0
+        self._retained_configs = {}
+        start = time.monotonic()
+        _, mid = self.client.subscribe(DISCOVERY_CONFIG_TOPICS)
+        try:
+            # Retained messages follow the SUBACK
+            while mid not in self._subscribed:
+                if time.monotonic() - start > timeout:
+                    logger.warning("Broker did not acknowledge the discovery subscription, keeping discovery hashes")
+                    return None
+                await asyncio.sleep(0.05)
+            self._retained_last = time.monotonic()
+            while time.monotonic() - self._retained_last < quiet and time.monotonic() - start < timeout:
+                await asyncio.sleep(0.05)
+            self.client.unsubscribe(DISCOVERY_CONFIG_TOPICS)
+            self.retained_discovery = set(self._retained_configs)
+            invalid = store.revalidate(self._retained_configs)
+        finally:
+            self._retained_configs = None
+            self._subscribed.discard(mid)
+        if invalid:
+            logger.info(f"{invalid} discovery configs missing or changed on the broker, publishing them again")
+        return invalid
+
+    def publish_discovery(self, device, entity, controllable=False, force=False):
+        """Publish one entity config (retained); skipped if the broker already has it. Returns the topic"""
+        topic, payload = self.discovery_payload(device, entity, controllable)
+        self._publish_config(device['id'], topic, payload, force)
+        return topic
+
+    def publish_device_discovery(self, device, components):
+        """
+        Publish all discovery configs of a device and remove its outdated ones
+
+        Args:
+            device: Device dict
+            components: (entity descriptor, controllable) pairs
+
+        Returns:
+            Discovery topics of the device
+        """
+        if self.device_discovery:
+            published = [self.device_discovery_payload(device, components)]
+        else:
+            published = [self.discovery_payload(device, entity, controllable) for entity, controllable in components]
+        topics = [topic for topic, _ in published]
+
+        outdated = []
+        if self.discovery_store is not None:
+            outdated = [topic for topic in self.discovery_store.topics_of(device['id']) if topic not in topics]
+        # Configs of the other mode published before the store existed (first start after the upgrade)
+        for topic in self._other_mode_topics(device['id'], components):
+            if topic not in outdated and (self.retained_discovery is None or topic in self.retained_discovery):
+                outdated.append(topic)
+        # Switching between entity and device discovery: HA moves the entities instead of deleting them
+        for topic in outdated:
+            if topic.startswith(DEVICE_DISCOVERY_PREFIX) != self.device_discovery:
+                self.client.publish(topic, MIGRATE_PAYLOAD, qos=1, retain=True)
+
+        for topic, payload in published:
+            self._publish_config(device['id'], topic, payload)
+        # Entities the profile no longer has (profile edited, component changed) and migrated topics
+        self.remove_discovery(outdated)
+        return topics
+
+    def device_messages(self, device, components, state=None):
+        """
+        All retained messages of a device for a full replay: discovery
+        config(s), availability and the last known state
+
+        Returns:
+            (topic, payload) list; publish with publish_retained
+        """
+        if self.device_discovery:
+            messages = [self.device_discovery_payload(device, components)]
+        else:
+            messages = [self.discovery_payload(device, entity, controllable) for entity, controllable in components]
+        messages.append((f"enocean/{device['id']}/availability", "online"))
+        if state:
+            messages.append((f"enocean/{device['id']}/state", json.dumps(state)))
+        return messages
+
+    def publish_retained(self, topic, payload):
+        return self.client.publish(topic, payload, qos=1, retain=True)
+
+    def _publish_config(self, device_id, topic, payload, force=False):
+        store = self.discovery_store
+        if store is not None and not force and store.is_current(topic, payload):
+            store.stats['skipped'] += 1
+            return
+        self.client.publish(topic, payload, qos=1, retain=True)
+        if self.retained_discovery is not None:
+            self.retained_discovery.add(topic)
+        if store is not None:
+            store.record(topic, device_id, payload)
+            store.stats['updated'] += 1
+
+    def remove_discovery(self, topics):
+        """Remove retained configs (HA deletes the entities)"""
+        for topic in topics:
+            self.client.publish(topic, "", qos=1, retain=True)
+        if self.retained_discovery is not None:
+            self.retained_discovery.difference_update(topics)
+        if self.discovery_store is not None:
+            self.discovery_store.forget(topics)
+            self.discovery_store.stats['removed'] += len(topics)
+
+    @staticmethod
+    def _entity_topic(device_id, entity):
+        return f"homeassistant/{entity.get('component', 'sensor')}/{device_id}_{entity.get('key', 'main')}/config"
+
+    def _other_mode_topics(self, device_id, components):
+        """Topics the device's configs have in the discovery mode not in use"""
+        if self.device_discovery:
+            return [self._entity_topic(device_id, entity) for entity, _ in components]
+        return [f"{DEVICE_DISCOVERY_PREFIX}{device_id}/config"]
+
+    def _device_block(self, device):
+        return {
+            "identifiers": [f"enocean_{device['id']}"],
+            "name": device['name'],
+            "manufacturer": device.get('manufacturer', 'EnOcean'),
+            "model": device.get('eep', 'Unknown'),
+            "via_device": "EnOcean_MQTT_TCP"
+        }
+
+    @staticmethod
+    def _fingerprint(device, *extra):
+        return (device['name'], device.get('manufacturer', 'EnOcean'), device.get('eep', 'Unknown')) + extra
+
+    @staticmethod
+    def _entity_options(device_id, key, entity, controllable) -> dict:
+        """Entity specific part of a discovery config"""
+        config = {
+            "unique_id": f"{device_id}_{key}",
+            "value_template": f"{{{{ value_json.{key} }}}}",
+        }
+
+        for attr in ['device_class', 'unit_of_measurement', 'icon']:
+            if attr == 'unit_of_measurement':
+                if 'unit' in entity: config[attr] = entity['unit']
+            elif attr in entity:
+                config[attr] = entity[attr]
+
+        if controllable:
+            config["command_topic"] = f"enocean/{device_id}/set/{key}"
+        return config
+
+    def discovery_payload(self, device, entity, controllable=False):
+        """
+        Discovery topic and serialized HA config of one entity
+
+        Cached per (device, entity): rebuilt only when the device name,
+        manufacturer or EEP or the entity definition changes (profile
+        edited; a profile reloaded after LRU eviction compares equal)
+        """
         device_id = device['id']
         key = entity.get('key', 'main')
+        fingerprint = self._fingerprint(device, controllable)
+        cached = self._discovery_cache.get((device_id, key))
+        if cached is not None and cached[1] == fingerprint and (cached[0] is entity or cached[0] == entity):
+            self.discovery_stats['hits'] += 1
+            return cached[2], cached[3]
+        self.discovery_stats['misses'] += 1
+
         component = entity.get('component', 'sensor')
         unique_id = f"{device_id}_{key}"
         discovery_topic = f"homeassistant/{component}/{unique_id}/config"
@@ -79,28 +308,55 @@ class MQTTHandler:
         config = {
             "name": f"{device['name']} {entity.get('name', key)}",
             "unique_id": unique_id,
-            "device": {
-                "identifiers": [f"enocean_{device_id}"],
-                "name": device['name'],
-                "manufacturer": device.get('manufacturer', 'EnOcean'),
-                "model": device.get('eep', 'Unknown'),
-                "via_device": "EnOcean_MQTT_TCP"
-            },
+            "device": self._device_block(device),
             "state_topic": f"enocean/{device_id}/state",
             "availability_topic": f"enocean/{device_id}/availability",
-            "value_template": f"{{{{ value_json.{key} }}}}",
         }
+        config.update(self._entity_options(device_id, key, entity, controllable))
 
-        for attr in ['device_class', 'unit_of_measurement', 'icon']:
-            if attr == 'unit_of_measurement':
-                if 'unit' in entity: config[attr] = entity['unit']
-            elif attr in entity:
-                config[attr] = entity[attr]
+        payload = json.dumps(config).encode('utf-8')
+        self._discovery_cache[(device_id, key)] = (entity, fingerprint, discovery_topic, payload)
+        return discovery_topic, payload
 
-        if controllable:
-            config["command_topic"] = f"enocean/{device_id}/set/{key}"
+    def device_discovery_payload(self, device, components):
+        """
+        Topic and serialized HA config of a whole device (device based
+        discovery: one message with all entities as components)
 
-        self.client.publish(discovery_topic, json.dumps(config), qos=1, retain=True)
+        Cached per device like discovery_payload
+        """
+        device_id = device['id']
+        components = tuple(components)
+        fingerprint = self._fingerprint(device)
+        cached = self._discovery_cache.get((device_id, None))
+        if cached is not None and cached[1] == fingerprint and cached[0] == components:
+            self.discovery_stats['hits'] += 1
+            return cached[2], cached[3]
+        self.discovery_stats['misses'] += 1
+
+        config = {
+            "device": self._device_block(device),
+            "origin": self.discovery_origin,
+            "state_topic": f"enocean/{device_id}/state",
+            "availability_topic": f"enocean/{device_id}/availability",
+            "components": {},
+        }
+        for entity, controllable in components:
+            key = entity.get('key', 'main')
+            # Device name is prepended by HA
+            component = {"platform": entity.get('component', 'sensor'), "name": entity.get('name', key)}
+            component.update(self._entity_options(device_id, key, entity, controllable))
+            config["components"][key] = component
+
+        discovery_topic = f"{DEVICE_DISCOVERY_PREFIX}{device_id}/config"
+        payload = json.dumps(config).encode('utf-8')
+        self._discovery_cache[(device_id, None)] = (components, fingerprint, discovery_topic, payload)
+        return discovery_topic, payload
+
+    def forget_device(self, device_id):
+        """Drop the cached discovery payloads of a device"""
+        for cache_key in [k for k in self._discovery_cache if k[0] == device_id]:
+            del self._discovery_cache[cache_key]
 
     def publish_state(self, device_id, data, retain=True):
         topic = f"enocean/{device_id}/state"
@@ -112,12 +368,15 @@ class MQTTHandler:
         self.client.publish(topic, payload, qos=1, retain=True)
 
     def remove_device(self, device_id, entities):
+        self.forget_device(device_id)
         if not self.connected: return
         self.client.publish(f"enocean/{device_id}/state", "", qos=1, retain=True)
         self.client.publish(f"enocean/{device_id}/availability", "", qos=1, retain=True)
-        for entity in entities:
-            key = entity.get('key', 'main')
-            component = entity.get('component', 'sensor')
-            unique_id = f"{device_id}_{key}"
-            discovery_topic = f"homeassistant/{component}/{unique_id}/config"
-            self.client.publish(discovery_topic, "", qos=1, retain=True)
+        topics = [self._entity_topic(device_id, entity) for entity in entities]
+        if self.device_discovery:
+            topics.append(f"{DEVICE_DISCOVERY_PREFIX}{device_id}/config")
+        if self.discovery_store is not None:
+            topics.extend(t for t in self.discovery_store.topics_of(device_id) if t not in topics)
+        self.remove_discovery(topics)
+        if self.discovery_store is not None:
+            self.discovery_store.save()
@@ -0,0 +1,137 @@
+"""
+Response Multiplexer for ESP3 Common Commands
+Matches PACKET_TYPE_RESPONSE packets to outstanding commands (FIFO), so
+command/response round trips never consume radio telegrams and several
+commands can be in flight at once.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional
+from .esp3_protocol import ESP3Packet
+
+logger = logging.getLogger(__name__)
+
+
+class PendingResponse:
+    """A command waiting for its RESPONSE packet"""
+
+    __slots__ = ('command', 'future', 'timer', 'expired_at')
+
+    def __init__(self, command: int, future: asyncio.Future):
+        self.command = command
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.expired_at: Optional[float] = None
+
+
+class ResponseMultiplexer:
+    """
+    FIFO of pending command futures.
+
+    ESP3 answers common commands strictly in order, so the oldest pending
+    entry owns the next RESPONSE packet. Entries that timed out stay in the
+    queue for a short grace period so a late response is not handed to the
+    next command.
+    """
+
+    def __init__(self, max_pending: int = 1, late_response_grace: float = 1.0):
+        """
+        Initialize multiplexer
+
+        Args:
+            max_pending: Number of commands allowed in flight (1 = no pipelining)
+            late_response_grace: Seconds a timed-out entry may still absorb its response
+        """
+        self.max_pending = max(1, max_pending)
+        self.late_response_grace = late_response_grace
+        self._pending: Deque[PendingResponse] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.stats: Dict[str, int] = {
+            'commands': 0,
+            'responses': 0,
+            'timeouts': 0,
+            'late_responses': 0,
+            'unsolicited_responses': 0,
+        }
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for entry in self._pending if not entry.future.done())
+
+    def register(self, command: int, timeout: float) -> asyncio.Future:
+        """
+        Register a command that is about to be written
+
+        Returns:
+            Future resolving to the RESPONSE packet, or None on timeout/disconnect
+        """
+        loop = asyncio.get_running_loop()
+        entry = PendingResponse(command, loop.create_future())
+        entry.timer = loop.call_later(timeout, self._expire, entry)
+        self._pending.append(entry)
+        self.stats['commands'] += 1
+        return entry.future
+
+    def discard(self, future: asyncio.Future):
+        """Forget a registered command that could not be written"""
+        for entry in self._pending:
+            if entry.future is future:
+                self._pending.remove(entry)
+                self._finish(entry, None)
+                return
+
+    def _expire(self, entry: PendingResponse):
+        if entry.future.done():
+            return
+        entry.expired_at = asyncio.get_running_loop().time()
+        self.stats['timeouts'] += 1
+        logger.debug(f"Command {hex(entry.command)} timed out waiting for response")
+        entry.future.set_result(None)
+
+    def _finish(self, entry: PendingResponse, result: Optional[ESP3Packet]):
+        if entry.timer:
+            entry.timer.cancel()
+        if not entry.future.done():
+            entry.future.set_result(result)
+
+    def dispatch(self, packet: ESP3Packet) -> bool:
+        """
+        Hand a RESPONSE packet to the oldest pending command
+
+        Returns:
+            True if a waiting command received it
+        """
+        now = asyncio.get_running_loop().time()
+        while self._pending:
+            entry = self._pending.popleft()
+            if not entry.future.done():
+                self._finish(entry, packet)
+                self.stats['responses'] += 1
+                return True
+            if entry.expired_at is not None and now - entry.expired_at <= self.late_response_grace:
+                # Late answer to a timed-out command - drop it, keep FIFO aligned
+                self.stats['late_responses'] += 1
+                logger.debug(f"Dropping late response for command {hex(entry.command)}")
+                return False
+            # Expired long ago: assume its response was lost and try the next one
+        self.stats['unsolicited_responses'] += 1
+        logger.debug("Received response without pending command")
+        return False
+
+    def fail_all(self):
+        """Resolve every pending command with None (e.g. on disconnect)"""
+        while self._pending:
+            self._finish(self._pending.popleft(), None)
+
+    def get_statistics(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats['pending'] = self.pending
+        return stats
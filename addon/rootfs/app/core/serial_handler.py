@@ -4,14 +4,20 @@ Refactored: Separates Transport Layer (TCP/Serial) from Protocol Layer (ESP3)
 Includes Retry-Logic for Base ID fetching.
 """
 import asyncio
+import heapq
 import logging
 import serial
 import socket
 import time
 import urllib.parse
 from abc import ABC, abstractmethod
-from typing import Optional, Callable, Union
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+from .capture import CaptureReader, CaptureWriter, list_captures
 from .esp3_protocol import ESP3Packet
+from .esp3_framer import ESP3Framer
+from .link_monitor import LinkHealthMonitor
+from .response_multiplexer import ResponseMultiplexer
 
 logger = logging.getLogger(__name__)
 
@@ -21,47 +27,65 @@ logger = logging.getLogger(__name__)
 # ==============================================================================
 
 class BaseTransport(ABC):
-    """Abstract Base Class for Connection Transports"""
+    """
+    Abstract Base Class for Connection Transports.
+    Transports are asyncio-native: received bytes are pushed to the
+    registered data callback as soon as the event loop sees them.
+    """
     
     def __init__(self):
         self.connected = False
         self.connection_info = "Unknown"
+        self.on_data: Optional[Callable[[bytes], None]] = None
+        self.on_connection_lost: Optional[Callable[[Optional[Exception]], None]] = None
 
-    @abstractmethod
-    def open(self) -> bool:
-        pass
+    def set_callbacks(self, on_data: Callable[[bytes], None],
+                      on_connection_lost: Optional[Callable[[Optional[Exception]], None]] = None):
+        self.on_data = on_data
+        self.on_connection_lost = on_connection_lost
 
     @abstractmethod
-    def close(self):
+    async def open(self) -> bool:
         pass
 
     @abstractmethod
-    def read(self, count: int) -> bytes:
+    def close(self):
         pass
 
     @abstractmethod
     def write(self, data: bytes) -> bool:
         pass
         
-    @abstractmethod
     def flush_input(self):
         pass
     
     def is_open(self) -> bool:
         return self.connected
 
+    def data_received(self, data: bytes):
+        if self.on_data:
+            self.on_data(data)
+
+    def connection_lost(self, exc: Optional[Exception] = None):
+        self.connected = False
+        if self.on_connection_lost:
+            self.on_connection_lost(exc)
+
 
 class SerialTransport(BaseTransport):
-    """Transport implementation for Physical Serial Ports"""
+    """Transport implementation for Physical Serial Ports (event loop fd reader)"""
+    
+    WRITE_TIMEOUT = 1.0
     
     def __init__(self, port: str, baudrate: int = 57600):
         super().__init__()
         self.port = port
         self.baudrate = baudrate
         self.serial: Optional[serial.Serial] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.connection_info = f"Serial({port}@{baudrate})"
 
-    def open(self) -> bool:
+    async def open(self) -> bool:
         try:
             self.serial = serial.Serial(
                 port=self.port,
@@ -69,37 +93,50 @@ class SerialTransport(BaseTransport):
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
-                timeout=0.5
+                timeout=0,
+                write_timeout=self.WRITE_TIMEOUT
             )
+            self.flush_input()
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(self.serial.fileno(), self._on_readable)
             self.connected = True
             logger.info(f"Opened serial port {self.port}")
-            self.flush_input()
             return True
         except Exception as e:
             logger.error(f"Failed to open serial port {self.port}: {e}")
+            self._release()
             self.connected = False
             return False
 
-    def close(self):
+    def _on_readable(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except Exception as e:
+            logger.error(f"Serial read error: {e}")
+            self._release()
+            self.connection_lost(e)
+            return
+        if data:
+            self.data_received(data)
+
+    def _release(self):
+        if self._loop and self.serial:
+            try:
+                self._loop.remove_reader(self.serial.fileno())
+            except Exception:
+                pass
         if self.serial and self.serial.is_open:
             try:
                 self.serial.close()
             except Exception:
                 pass
         self.serial = None
+
+    def close(self):
+        self._release()
         self.connected = False
         logger.info(f"Closed serial port {self.port}")
 
-    def read(self, count: int) -> bytes:
-        if not self.serial or not self.serial.is_open:
-            return b''
-        try:
-            return self.serial.read(count)
-        except Exception as e:
-            logger.error(f"Serial read error: {e}")
-            self.close()
-            return b''
-
     def write(self, data: bytes) -> bool:
         if not self.serial or not self.serial.is_open:
             return False
@@ -108,7 +145,8 @@ class SerialTransport(BaseTransport):
             return True
         except Exception as e:
             logger.error(f"Serial write error: {e}")
-            self.close()
+            self._release()
+            self.connection_lost(e)
             return False
 
     def flush_input(self):
@@ -116,91 +154,524 @@ class SerialTransport(BaseTransport):
             self.serial.reset_input_buffer()
 
 
+class _TcpProtocol(asyncio.Protocol):
+    """asyncio Protocol forwarding socket events to the owning TcpTransport"""
+
+    def __init__(self, owner: 'TcpTransport'):
+        self.owner = owner
+
+    def data_received(self, data: bytes):
+        self.owner.data_received(data)
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.owner._handle_connection_lost(self, exc)
+
+
 class TcpTransport(BaseTransport):
-    """Transport implementation for TCP Sockets"""
+    """Transport implementation for TCP Sockets (asyncio protocol based)"""
+    
+    CONNECT_TIMEOUT = 5.0
     
     def __init__(self, host: str, port: int):
         super().__init__()
         self.host = host
         self.port = port
-        self.socket: Optional[socket.socket] = None
+        self._transport: Optional[asyncio.Transport] = None
+        self._protocol: Optional[_TcpProtocol] = None
         self.connection_info = f"TCP({host}:{port})"
 
-    def open(self) -> bool:
+    async def open(self) -> bool:
+        loop = asyncio.get_running_loop()
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
-            try:
-                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
-                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
-                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
-            except (AttributeError, OSError):
-                pass 
-
-            self.socket.settimeout(5.0) 
-            self.socket.connect((self.host, self.port))
-            self.socket.settimeout(0.5)
-            
+            protocol = _TcpProtocol(self)
+            transport, _ = await asyncio.wait_for(
+                loop.create_connection(lambda: protocol, self.host, self.port),
+                timeout=self.CONNECT_TIMEOUT
+            )
+            sock = transport.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                try:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+                except (AttributeError, OSError):
+                    pass 
+
+            self._transport = transport
+            self._protocol = protocol
             self.connected = True
             logger.info(f"Connected to TCP {self.host}:{self.port}")
-            self.flush_input()
             return True
+        except asyncio.TimeoutError:
+            logger.error(f"Failed to connect to {self.host}:{self.port}: timeout after {self.CONNECT_TIMEOUT}s")
         except Exception as e:
             logger.error(f"Failed to connect to {self.host}:{self.port}: {e}")
-            self.connected = False
-            return False
+        self.connected = False
+        return False
+
+    def _handle_connection_lost(self, protocol: _TcpProtocol, exc: Optional[Exception]):
+        # Ignore late notifications for connections we closed ourselves
+        if protocol is not self._protocol:
+            return
+        if exc:
+            logger.error(f"Socket error: {exc}")
+        else:
+            logger.warning("TCP connection closed by remote host (EOF)")
+        self._transport = None
+        self._protocol = None
+        self.connection_lost(exc)
 
     def close(self):
-        if self.socket:
+        transport = self._transport
+        self._transport = None
+        self._protocol = None
+        if transport:
             try:
-                self.socket.close()
+                transport.close()
             except Exception:
                 pass
-        self.socket = None
         self.connected = False
         logger.info(f"Closed TCP connection {self.host}:{self.port}")
 
-    def read(self, count: int) -> bytes:
-        if not self.socket: return b''
-        data = b''
-        try:
-            while len(data) < count:
-                chunk = self.socket.recv(count - len(data))
-                if not chunk: 
-                    logger.warning("TCP connection closed by remote host (EOF)")
-                    self.close()
-                    break
-                data += chunk
-            return data
-        except socket.timeout:
-            return data 
-        except Exception as e:
-            logger.error(f"Socket read error: {e}")
-            self.close()
-            return b''
-
     def write(self, data: bytes) -> bool:
-        if not self.socket: return False
+        if not self._transport or self._transport.is_closing(): return False
         try:
-            self.socket.sendall(data)
+            self._transport.write(data)
             return True
         except Exception as e:
             logger.error(f"Socket write error: {e}")
             self.close()
             return False
 
-    def flush_input(self):
-        if not self.socket: return
-        self.socket.setblocking(0)
+
+class ReplayTransport(BaseTransport):
+    """
+    Transport playing back ESP3 capture files (see core/capture.py).
+    speed: 1.0 = real time, N = N times faster, 0 = as fast as possible.
+    Common commands are answered with synthetic responses so Base ID,
+    version and keepalive work; radio telegrams written are discarded.
+    """
+    
+    MAX_SPEED_BATCH = 64  # Frames delivered between event loop yields at max speed
+    
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False, base_id: str = 'ff800000'):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.base_id = base_id
+        self.frames_replayed = 0
+        self.frames_written = 0
+        self._write_framer = ESP3Framer()
+        self._task: Optional[asyncio.Task] = None
+        self.connection_info = f"Replay({path} @ {'max' if speed <= 0 else f'{speed}x'})"
+
+    async def open(self) -> bool:
+        files = list_captures(self.path)
+        if not files:
+            logger.error(f"No capture files found at {self.path}")
+            return False
+        self._task = asyncio.create_task(self._play(files))
+        self.connected = True
+        logger.info(f"Replaying {len(files)} capture file(s) from {self.path}")
+        return True
+
+    async def _play(self, files: list):
+        loop = asyncio.get_running_loop()
         try:
             while True:
-                data = self.socket.recv(4096)
-                if not data: break
-        except (BlockingIOError, Exception):
+                for path in files:
+                    try:
+                        reader = CaptureReader(path)
+                    except (OSError, ValueError) as e:
+                        logger.error(f"Skipping capture {path}: {e}")
+                        continue
+                    base = None
+                    started = loop.time()
+                    batch = 0
+                    for elapsed, _, frame in reader.frames():
+                        if base is None:
+                            base = elapsed
+                        if self.speed > 0:
+                            delay = started + (elapsed - base) / self.speed - loop.time()
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                        else:
+                            batch += 1
+                            if batch >= self.MAX_SPEED_BATCH:
+                                batch = 0
+                                await asyncio.sleep(0)
+                        if not self.connected:
+                            return
+                        self.frames_replayed += 1
+                        self.data_received(frame)
+                if not self.loop:
+                    logger.info(f"Replay finished ({self.frames_replayed} frames)")
+                    return
+        except asyncio.CancelledError:
             pass
-        finally:
-            self.socket.setblocking(1)
-            self.socket.settimeout(0.5)
+
+    def _response_for(self, command: int) -> ESP3Packet:
+        if command == ESP3Packet.CO_RD_IDBASE:
+            data = bytes([0x00]) + bytes.fromhex(self.base_id) + bytes([0x0A])
+        elif command == ESP3Packet.CO_RD_VERSION:
+            description = b'REPLAY'.ljust(16, b'\x00')
+            data = bytes([0x00, 1, 0, 0, 0, 1, 0, 0, 0]) + bytes(4) + b'RPLY' + description
+        else:
+            data = bytes([0x00])
+        return ESP3Packet.from_parts(ESP3Packet.PACKET_TYPE_RESPONSE, data)
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.connected = False
+        logger.info(f"Closed replay {self.path}")
+
+    def write(self, data: bytes) -> bool:
+        if not self.connected:
+            return False
+        for packet in self._write_framer.feed(data):
+            self.frames_written += 1
+            if packet.packet_type == ESP3Packet.PACKET_TYPE_COMMON_COMMAND and packet.data_length:
+                response = self._response_for(packet.data[0]).build()
+                asyncio.get_running_loop().call_soon(self.data_received, response)
+        return True
+
+
+# ==============================================================================
+# TRANSMIT SCHEDULER (single writer, priorities, coalescing, duty cycle)
+# ==============================================================================
+
+# Lower values are sent first; all traffic today are MQTT / UI commands
+PRIORITY_USER = 0
+
+
+class _Coalesced:
+    """Result of a job superseded by a newer one with the same key (never sent)"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'COALESCED'
+
+
+COALESCED = _Coalesced()
+
+
+def estimate_airtime(packet: ESP3Packet) -> float:
+    """
+    Rough 868 MHz air time of a radio packet in seconds.
+    ERP1 at 125 kbit/s, 8/12 encoding, ~40 bit preamble/sync per subtelegram.
+    Non-radio packets (common commands) do not use air time.
+    """
+    if packet.packet_type != ESP3Packet.PACKET_TYPE_RADIO_ERP1:
+        return 0.0
+    subtelegrams = packet.subtelegram_count or 1
+    bits = (packet.data_length + 2) * 8 * 1.5 + 40
+    return subtelegrams * bits / 125000.0
+
+
+class TransmitJob:
+    """
+    One or more packets for one destination (e.g. RPS press/release).
+    The first packet is sent when the job is picked from the queue, the
+    following ones are scheduled as timed events gap seconds apart.
+    """
+
+    __slots__ = ('priority', 'seq', 'key', 'destination', 'packets', 'gap', 'index',
+                 'futures', 'enqueued_at', 'airtime', 'cancelled')
+
+    def __init__(self, priority: int, seq: int, key: Optional[tuple], destination: Optional[str],
+                 packets: list, gap: float, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.destination = destination
+        self.packets = packets
+        self.gap = gap
+        self.index = 0
+        self.futures = [future]
+        self.enqueued_at = time.monotonic()
+        self.airtime = sum(estimate_airtime(p) for p in packets)
+        self.cancelled = False
+
+    def __lt__(self, other: 'TransmitJob') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TransmitScheduler:
+    """
+    Single-writer TX queue for one gateway.
+
+    - Priorities: lower value first, FIFO within a priority
+    - Latest-wins coalescing: a queued job with the same key (destination +
+      entity) is replaced by the newer one; the replaced caller gets
+      COALESCED, only the newer one the transmit result
+    - Timed follow-ups: the release of an RPS press is a timer event, so
+      rocker emulations to different destinations interleave while the
+      release timing per destination stays exact. A destination with a
+      pending release gets no new job until that release is sent.
+    - Duty-cycle budget: air time used in a sliding window is capped
+      (868 MHz SRD band: 1% per hour)
+    - Batched writes: every frame that is ready at the same moment (up to
+      max_batch) goes out in one transport write; the next flush waits
+      frame_spacing per frame so the transceiver can work off its buffer
+    """
+
+    def __init__(self, write: Callable[[List[ESP3Packet]], Awaitable[bool]],
+                 duty_cycle: float = 0.01, window: float = 3600.0,
+                 max_batch: int = 8, frame_spacing: float = 0.0):
+        self._write = write
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.frame_spacing = frame_spacing
+        self._next_flush_at = 0.0
+        self._frame_time = 0.0  # Smoothed write duration per frame
+        self._queue: list = []
+        self._by_key: Dict[tuple, TransmitJob] = {}
+        self._timers: list = []
+        self._busy_destinations: set = set()
+        self._seq = 0
+        self._depth = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._airtime_log: deque = deque()
+        self._airtime_used = 0.0
+        self._budget_warned = False
+        self.stats = {
+            'enqueued': 0,
+            'sent': 0,
+            'failed': 0,
+            'coalesced': 0,
+            'max_depth': 0,
+            'timed_events': 0,
+            'release_late_max': 0.0,
+            'duty_cycle_waits': 0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+            'flushes': 0,
+            'frames_flushed': 0,
+            'frames_per_flush_max': 0,
+        }
+
+    @property
+    def airtime_budget(self) -> float:
+        return self.duty_cycle * self.window
+
+    def _ensure_running(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, packets: list, priority: int = PRIORITY_USER, key: Optional[tuple] = None,
+               gap: float = 0.0, destination: Optional[str] = None) -> asyncio.Future:
+        """
+        Queue packets for transmission
+
+        Args:
+            packets: ESP3 packets sent in order as one job
+            priority: Lower values are sent first (default PRIORITY_USER)
+            key: Coalescing key; a still queued job with the same key is superseded
+            gap: Delay between the packets of this job (seconds), kept exactly
+            destination: Target device; jobs for one destination never overlap
+
+        Returns:
+            Future resolving to True once all packets were written, False on
+            failure, COALESCED (falsy) if a newer job with the same key
+            replaced this one before it was sent
+        """
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        job = TransmitJob(priority, self._seq, key, destination, packets, gap, future)
+
+        if key is not None:
+            previous = self._by_key.get(key)
+            if previous and not previous.cancelled:
+                previous.cancelled = True
+                for superseded in previous.futures:
+                    if not superseded.done():
+                        superseded.set_result(COALESCED)
+                job.enqueued_at = previous.enqueued_at
+                self._depth -= 1
+                self.stats['coalesced'] += 1
+            self._by_key[key] = job
+
+        heapq.heappush(self._queue, job)
+        self._depth += 1
+        self.stats['enqueued'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], self._depth)
+        self._wakeup.set()
+        return future
+
+    def _airtime_wait(self, airtime: float, now: float) -> float:
+        """Seconds until the sliding-window budget allows airtime more (0 = now)"""
+        while self._airtime_log and now - self._airtime_log[0][0] > self.window:
+            self._airtime_used -= self._airtime_log.popleft()[1]
+        if self._airtime_used + airtime <= self.airtime_budget or not self._airtime_log:
+            self._budget_warned = False
+            return 0.0
+        return self.window - (now - self._airtime_log[0][0])
+
+    def _next_ready_job(self, now: float, batch_destinations: set = frozenset(), batch_airtime: float = 0.0):
+        """Pop the best job that may start now; returns (job, budget_delay)"""
+        skipped = []
+        ready = None
+        budget_delay = None
+        while self._queue:
+            job = heapq.heappop(self._queue)
+            if job.cancelled:
+                continue
+            if job.destination is not None and (job.destination in self._busy_destinations or
+                                                job.destination in batch_destinations):
+                skipped.append(job)
+                continue
+            wait = self._airtime_wait(job.airtime + batch_airtime, now)
+            if wait > 0:
+                skipped.append(job)
+                budget_delay = wait
+                self.stats['duty_cycle_waits'] += 1
+                if not self._budget_warned:
+                    self._budget_warned = True
+                    logger.warning(f"TX duty-cycle budget exhausted, delaying transmission by {wait:.1f}s")
+                break
+            ready = job
+            break
+        for job in skipped:
+            heapq.heappush(self._queue, job)
+        return ready, budget_delay
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+
+            # Give the transceiver time for the previous flush
+            if now < self._next_flush_at:
+                await asyncio.sleep(self._next_flush_at - now)
+                continue
+
+            # 1. Due timed follow-ups (e.g. RPS release) first
+            batch = []
+            while self._timers and self._timers[0][0] <= now and len(batch) < self.max_batch:
+                due, _, job = heapq.heappop(self._timers)
+                self.stats['timed_events'] += 1
+                self.stats['release_late_max'] = max(self.stats['release_late_max'], now - due)
+                batch.append(job)
+
+            # 2. Queued jobs, one per destination and batch
+            budget_delay = None
+            destinations = {job.destination for job in batch}
+            airtime = sum(job.airtime for job in batch)
+            while len(batch) < self.max_batch:
+                # Keep the flush short enough that a due release is not held back
+                per_frame = max(self.frame_spacing, self._frame_time)
+                if self._timers and self._timers[0][0] < now + per_frame * (len(batch) + 1):
+                    break
+                job, budget_delay = self._next_ready_job(now, destinations, airtime)
+                if not job:
+                    break
+                self._depth -= 1
+                if job.key is not None and self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+                batch.append(job)
+                destinations.add(job.destination)
+                airtime += job.airtime
+
+            if batch:
+                await self._flush(batch)
+                continue
+
+            # 3. Idle until a timer is due, the budget recovers or a job arrives
+            timeout = budget_delay
+            if self._timers:
+                timer_delay = self._timers[0][0] - now
+                timeout = timer_delay if timeout is None else min(timeout, timer_delay)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self, batch: List[TransmitJob]):
+        """Write the next packet of every job in batch with one transport write"""
+        packets = []
+        for job in batch:
+            packets.append(job.packets[job.index])
+            job.index += 1
+        started = time.monotonic()
+        try:
+            success = await self._write(packets)
+        except Exception as e:
+            logger.error(f"Error transmitting packets: {e}")
+            success = False
+
+        count = len(packets)
+        self._frame_time = 0.8 * self._frame_time + 0.2 * (time.monotonic() - started) / count
+        self.stats['flushes'] += 1
+        self.stats['frames_flushed'] += count
+        self.stats['frames_per_flush_max'] = max(self.stats['frames_per_flush_max'], count)
+        if self.frame_spacing:
+            self._next_flush_at = time.monotonic() + self.frame_spacing * count
+
+        for job, packet in zip(batch, packets):
+            self._after_send(job, packet, success)
+
+    def _after_send(self, job: TransmitJob, packet: ESP3Packet, success: bool):
+        if success:
+            airtime = estimate_airtime(packet)
+            if airtime:
+                self._airtime_log.append((time.monotonic(), airtime))
+                self._airtime_used += airtime
+            if job.index < len(job.packets):
+                if job.destination is not None:
+                    self._busy_destinations.add(job.destination)
+                self._seq += 1
+                heapq.heappush(self._timers, (time.monotonic() + job.gap, self._seq, job))
+                return
+
+        self._busy_destinations.discard(job.destination)
+        self._resolve(job, success)
+
+    def _resolve(self, job: TransmitJob, success: bool):
+        latency = time.monotonic() - job.enqueued_at
+        self.stats['sent' if success else 'failed'] += 1
+        self.stats['latency_total'] += latency
+        self.stats['latency_max'] = max(self.stats['latency_max'], latency)
+        for future in job.futures:
+            if not future.done():
+                future.set_result(success)
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        jobs = [job for job in self._queue if not job.cancelled] + [entry[2] for entry in self._timers]
+        for job in jobs:
+            for future in job.futures:
+                if not future.done():
+                    future.set_result(False)
+        self._queue.clear()
+        self._timers.clear()
+        self._by_key.clear()
+        self._busy_destinations.clear()
+        self._depth = 0
+
+    def get_statistics(self) -> dict:
+        stats = dict(self.stats)
+        finished = stats['sent'] + stats['failed']
+        stats['queue_depth'] = self._depth
+        stats['pending_timed_events'] = len(self._timers)
+        stats['latency_avg'] = stats['latency_total'] / finished if finished else 0.0
+        stats['frames_per_flush'] = round(stats['frames_flushed'] / stats['flushes'], 2) if stats['flushes'] else 0.0
+        stats['airtime_used'] = round(self._airtime_used, 3)
+        stats['airtime_budget'] = self.airtime_budget
+        return stats
 
 
 # ==============================================================================
@@ -213,124 +684,194 @@ class SerialHandler:
     Uses a Transport instance to be agnostic of Serial vs TCP.
     """
     
-    def __init__(self, connection_string: str, baudrate: int = 57600):
+    COMMAND_TIMEOUT = 2.0
+    PING_INTERVAL = 15.0      # Idle seconds before the link is probed
+    PING_TIMEOUT = 2.0
+    TX_MAX_BATCH = 8          # Frames per transport write
+    TX_FRAME_SPACING = 0.005  # Seconds per written frame before the next flush
+    
+    def __init__(self, connection_string: str, baudrate: int = 57600,
+                 max_pending_commands: int = 1, duty_cycle: float = 0.01):
         self.connection_string = connection_string
         self.baudrate = baudrate
         self.running = False
         self.base_id = None
         self.version_info = None
         self.last_data_received = 0.0
+        self._last_activity = time.monotonic()
         self._last_info_fetch_attempt = 0.0
+        self.framer = ESP3Framer()
+        self._packet_queue: asyncio.Queue = asyncio.Queue()
+        # RESPONSE packets go to waiting commands, everything else to the queue
+        self.responses = ResponseMultiplexer(max_pending=max_pending_commands)
+        # All radio telegrams go through one writer
+        self.tx = TransmitScheduler(self.write_packets, duty_cycle=duty_cycle,
+                                    max_batch=self.TX_MAX_BATCH, frame_spacing=self.TX_FRAME_SPACING)
+        
+        # Optional raw frame recording (see start_recording)
+        self.capture: Optional[CaptureWriter] = None
+        # Keepalive pings and reconnects (started with the read loop)
+        self.health = LinkHealthMonitor(
+            is_open=self.is_open,
+            reconnect=self._reconnect,
+            disconnect=self._disconnect,
+            ping=self.ping,
+            last_activity=lambda: self._last_activity,
+            ping_interval=self.PING_INTERVAL,
+            ping_timeout=self.PING_TIMEOUT,
+        )
         
         if connection_string.lower().startswith('tcp://'):
             parsed = urllib.parse.urlparse(connection_string)
             if not parsed.port:
                 raise ValueError("Port missing in TCP connection string")
             self.transport = TcpTransport(parsed.hostname, parsed.port)
+        elif connection_string.lower().startswith('replay://'):
+            # replay:///share/captures?speed=10&loop=1
+            parsed = urllib.parse.urlparse(connection_string)
+            query = urllib.parse.parse_qs(parsed.query)
+            speed = float(query.get('speed', ['1'])[0])
+            loop = query.get('loop', ['0'])[0].lower() in ('1', 'true', 'yes')
+            self.transport = ReplayTransport(parsed.netloc + parsed.path, speed=speed, loop=loop)
         else:
             self.transport = SerialTransport(connection_string, baudrate)
         
-    def open(self) -> bool:
-        success = self.transport.open()
+    async def open(self) -> bool:
+        self.transport.set_callbacks(self._on_data, self._on_connection_lost)
+        self.framer.reset()
+        self._drain_queue()
+        success = await self.transport.open()
         if success:
             self.last_data_received = time.time()
+            self._last_activity = time.monotonic()
         return success
     
     def close(self):
         self.transport.close()
+        self.responses.fail_all()
+        self._wakeup()
     
     def is_open(self) -> bool:
         return self.transport.is_open()
 
-    async def read_packet(self) -> Optional[ESP3Packet]:
-        if not self.is_open():
+    async def _reconnect(self) -> bool:
+        # Let the read loop hand out packets received before the loss first
+        for _ in range(50):
+            if self._packet_queue.empty():
+                break
+            await asyncio.sleep(0.1)
+        if not await self.open():
+            return False
+        self._last_info_fetch_attempt = 0.0
+        return True
+
+    def _disconnect(self, reason: str):
+        logger.warning(f"❌ Closing {self.transport.connection_info}: {reason}")
+        self.close()
+
+    def _on_data(self, data: bytes):
+        """Transport callback: frame incoming bytes and queue complete packets"""
+        self.last_data_received = time.time()
+        self._last_activity = time.monotonic()
+        for packet in self.framer.feed(data):
+            if self.capture:
+                self.capture.write_frame(packet.raw, self.connection_string)
+            if packet.packet_type == ESP3Packet.PACKET_TYPE_RESPONSE:
+                self.responses.dispatch(packet)
+            else:
+                self._packet_queue.put_nowait(packet)
+
+    def _on_connection_lost(self, exc: Optional[Exception]):
+        self.responses.fail_all()
+        self._wakeup()
+        self.health.notify_connection_lost(str(exc) if exc else 'connection lost')
+
+    def _wakeup(self):
+        # None wakes a pending read_packet() so the loop notices the state change
+        self._packet_queue.put_nowait(None)
+
+    def _drain_queue(self):
+        while not self._packet_queue.empty():
+            self._packet_queue.get_nowait()
+
+    async def read_packet(self, timeout: float = 1.0) -> Optional[ESP3Packet]:
+        """Wait up to timeout seconds for the next complete packet"""
+        if self._packet_queue.empty() and not self.is_open():
             return None
-        
         try:
-            byte = await asyncio.get_event_loop().run_in_executor(
-                None, self.transport.read, 1
-            )
-            
-            if not byte: return None 
-            
-            self.last_data_received = time.time()
-            
-            if byte[0] != ESP3Packet.SYNC_BYTE:
-                return None
-            
-            logger.debug("Found sync byte 0x55, reading header...")
-
-            header = await asyncio.get_event_loop().run_in_executor(
-                None, self.transport.read, 4
-            )
-            if len(header) != 4:
-                logger.warning("Incomplete header received")
-                return None
-            
-            data_length = int.from_bytes(header[0:2], 'big')
-            optional_length = header[2]
-            
-            header_crc = await asyncio.get_event_loop().run_in_executor(
-                None, self.transport.read, 1
-            )
-            if len(header_crc) != 1:
-                logger.warning("Missing header CRC")
-                return None
-            
-            total_data_length = data_length + optional_length + 1
-            data_block = await asyncio.get_event_loop().run_in_executor(
-                None, self.transport.read, total_data_length
-            )
-            if len(data_block) != total_data_length:
-                logger.warning(f"Incomplete data block: {len(data_block)}/{total_data_length}")
-                return None
-            
-            raw_packet = bytes([ESP3Packet.SYNC_BYTE]) + header + header_crc + data_block
-            packet = ESP3Packet(raw_packet)
-            logger.debug(f"Received packet: {packet}")
-            return packet
-            
-        except Exception as e:
-            logger.error(f"Error reading packet: {e}")
-            if isinstance(self.transport, TcpTransport):
-                self.close()
+            packet = await asyncio.wait_for(self._packet_queue.get(), timeout)
+        except asyncio.TimeoutError:
             return None
+        if packet:
+            logger.debug(f"Received packet: {packet}")
+        return packet
+
+    def start_recording(self, writer: CaptureWriter):
+        """Append every received raw frame to a capture (writer may be shared between gateways)"""
+        self.capture = writer
+        logger.info(f"Recording raw ESP3 frames of {self.transport.connection_info}")
+
+    def stop_recording(self):
+        if self.capture:
+            self.capture.flush()
+        self.capture = None
+
+    def get_statistics(self) -> dict:
+        """Framer counters (frames, resyncs, CRC failures, discarded bytes) and command/response counters"""
+        stats = self.framer.get_statistics()
+        stats['commands'] = self.responses.get_statistics()
+        stats['tx'] = self.tx.get_statistics()
+        stats['health'] = self.health.get_statistics()
+        return stats
     
     async def write_packet(self, packet: ESP3Packet) -> bool:
+        return await self.write_packets([packet])
+
+    async def write_packets(self, packets: List[ESP3Packet]) -> bool:
+        """Write several frames with a single transport write"""
         if not self.is_open():
             return False
         try:
-            raw_data = packet.build()
-            success = await asyncio.get_event_loop().run_in_executor(
-                None, self.transport.write, raw_data
-            )
+            # Immutable bytes: transports may keep a reference until the data is flushed
+            if len(packets) == 1:
+                data = packets[0].build()
+            else:
+                data = b''.join(packet.raw for packet in packets)
+            success = self.transport.write(data)
             if success:
-                logger.debug(f"Sent packet: {packet}")
+                for packet in packets:
+                    logger.debug(f"Sent packet: {packet}")
             return success
         except Exception as e:
             logger.error(f"Error writing packet: {e}")
             return False
 
-    async def send_ping(self) -> bool:
-        logger.info("⏳ Connection idle > 30s. Sending KeepAlive Ping...")
-        try:
-            ping_packet = ESP3Packet.create_read_version()
-            return await self.write_packet(ping_packet)
-        except Exception as e:
-            logger.error(f"Failed to send Ping: {e}")
-            return False
-
-    async def send_command_and_wait_response(self, command_packet: ESP3Packet, timeout: float = 2.0) -> Optional[ESP3Packet]:
-        if not await self.write_packet(command_packet):
+    async def ping(self, timeout: float = PING_TIMEOUT) -> Optional[float]:
+        """Send CO_RD_VERSION and return the round trip time in seconds (None = no answer)"""
+        async with self.responses.slots:
+            future = self.responses.register(ESP3Packet.CO_RD_VERSION, timeout)
+            started = time.monotonic()
+            if not await self.write_packet(ESP3Packet.create_read_version()):
+                self.responses.discard(future)
+                return None
+            response = await future
+        if response is None:
             return None
-        
-        start_time = asyncio.get_event_loop().time()
-        while asyncio.get_event_loop().time() - start_time < timeout:
-            packet = await self.read_packet()
-            if packet and packet.packet_type == ESP3Packet.PACKET_TYPE_RESPONSE:
-                return packet
-            await asyncio.sleep(0.01)
-        return None
+        return time.monotonic() - started
+
+    async def send_command_and_wait_response(self, command_packet: ESP3Packet, timeout: float = COMMAND_TIMEOUT) -> Optional[ESP3Packet]:
+        """
+        Send a common command and wait for its RESPONSE packet.
+        Radio telegrams received meanwhile keep flowing to the read loop.
+        Up to max_pending_commands commands may be in flight at once.
+        """
+        async with self.responses.slots:
+            command = command_packet.data[0] if command_packet.data_length else 0
+            future = self.responses.register(command, timeout)
+            if not await self.write_packet(command_packet):
+                self.responses.discard(future)
+                return None
+            return await future
 
     async def get_base_id(self) -> Optional[str]:
         if self.base_id: return self.base_id
@@ -350,34 +891,28 @@ class SerialHandler:
             self.version_info = {
                 'app_version': '.'.join(str(b) for b in response.data[1:5]),
                 'chip_id': response.data[9:13].hex(),
-                'app_description': response.data[17:33].decode('ascii', errors='ignore').strip('\x00')
+                'app_description': bytes(response.data[17:33]).decode('ascii', errors='ignore').strip('\x00')
             }
             logger.info(f"Gateway Version: {self.version_info}")
             return self.version_info
         return None
 
     async def start_reading(self, callback: Callable[[ESP3Packet], None]):
-        """Start reading loop with Reconnect, KeepAlive and Info-Retry logic"""
+        """Start reading loop; keepalive and reconnects are run by the link health monitor"""
         self.running = True
         logger.info(f"Started reading loop for {self.transport.connection_info}")
         logger.info("=" * 80)
         logger.info("🎧 LISTENING FOR ENOCEAN TELEGRAMS (KeepAlive Enabled)")
         logger.info("=" * 80)
         
-        PING_INTERVAL = 30.0
-        PING_TIMEOUT = 10.0
-        
-        self.last_data_received = time.time()
+        self._last_activity = time.monotonic()
+        self.health.start()
         
         while self.running:
             try:
-                # 1. Auto-Reconnect
-                if not self.is_open():
-                    logger.warning(f"Connection lost. Reconnecting to {self.transport.connection_info} in 5s...")
-                    await asyncio.sleep(5)
-                    if self.open():
-                        logger.info("Connection re-established")
-                        self.last_data_received = time.time()
+                # 1. Disconnected: the monitor reconnects, nothing to read meanwhile
+                if not self.is_open() and self._packet_queue.empty():
+                    await asyncio.sleep(0.5)
                     continue
 
                 # 2. RETRY INFO FETCH (Fix for "Status Connected but No ID")
@@ -397,24 +932,6 @@ class SerialHandler:
                 if packet:
                     if packet.packet_type == ESP3Packet.PACKET_TYPE_RADIO_ERP1:
                         await callback(packet)
-                    elif packet.packet_type == ESP3Packet.PACKET_TYPE_RESPONSE:
-                        logger.debug("Received Ping/Response")
-                    continue 
-                
-                # 4. Idle / KeepAlive Logic
-                now = time.time()
-                time_since_data = now - self.last_data_received
-                
-                if time_since_data > (PING_INTERVAL + PING_TIMEOUT):
-                     logger.warning(f"❌ Connection dead! No data for {time_since_data:.1f}s. Closing...")
-                     self.close()
-                     continue
-
-                if time_since_data > PING_INTERVAL:
-                    if int(time_since_data) % 5 == 0: 
-                        if not await self.send_ping():
-                            logger.warning("Failed to send Ping. Closing connection.")
-                            self.close()
                 
             except Exception as e:
                 logger.error(f"Error in read loop: {e}")
@@ -422,19 +939,23 @@ class SerialHandler:
     
     def stop_reading(self):
         self.running = False
+        self.health.stop()
+        self.tx.stop()
 
-    async def send_telegram(self, destination_id: str, rorg: int, data_bytes: bytes, status: int = 0x00) -> bool:
+    async def send_telegram(self, destination_id: str, rorg: int, data_bytes: bytes, status: int = 0x00,
+                            priority: int = PRIORITY_USER, coalesce_key: Optional[tuple] = None) -> bool:
+        """Queue a radio telegram; coalesce_key (e.g. (device, entity)) enables latest-wins replacement"""
         if not self.base_id: await self.get_base_id()
         packet = ESP3Packet.create_radio_packet(self.base_id, destination_id, rorg, data_bytes, status)
         logger.info(f"📤 Sending telegram to {destination_id}: RORG={hex(rorg)}")
-        return await self.write_packet(packet)
+        return await self.tx.submit([packet], priority, coalesce_key, destination=destination_id)
     
-    async def send_rps_command(self, destination_id: str, button_code: int, press_duration: float = 0.1) -> bool:
+    async def send_rps_command(self, destination_id: str, button_code: int, press_duration: float = 0.1,
+                               priority: int = PRIORITY_USER, coalesce_key: Optional[tuple] = None) -> bool:
         if not self.base_id: await self.get_base_id()
         logger.info(f"📤 Sending RPS command to {destination_id}: button={hex(button_code)}")
         packet_press = ESP3Packet.create_rps_packet(self.base_id, destination_id, button_code, pressed=True)
-        if await self.write_packet(packet_press):
-            await asyncio.sleep(press_duration)
-            packet_release = ESP3Packet.create_rps_packet(self.base_id, destination_id, button_code, pressed=False)
-            return await self.write_packet(packet_release)
-        return False
+        packet_release = ESP3Packet.create_rps_packet(self.base_id, destination_id, button_code, pressed=False)
+        # Release is a timed event in the TX scheduler; other commands interleave meanwhile
+        return await self.tx.submit([packet_press, packet_release], priority, coalesce_key,
+                                    gap=press_duration, destination=destination_id)
@@ -0,0 +1,469 @@
+"""
+EEP Batch Decoder
+Decodes many telegrams of the same EEP at once (capture replays, analytics
+backfills). Payloads come in as a NumPy uint8 matrix, one row per telegram;
+case selection, bitfield extraction and the scaling expressions run
+column-wise and the result is one masked array per shortcut (masked where
+the single-telegram path would not set the shortcut).
+
+Results are identical to EEPParser.parse_telegram_with_full_data: the
+expressions are translated into NumPy code with the same structure as the
+scalar compiler (eep.compiler), rows the column-wise form cannot decide
+(division by zero, 'if' without else) are re-evaluated with the scalar
+function, and expressions without a column-wise form (text operands,
+strict equality on computed values) are tabulated over the distinct raw
+values with the scalar function.
+
+NumPy is optional; it is only imported by this module.
+"""
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .compiler import VARIABLES, ExpressionError, _args, _identity
+from .dispatch import SOURCE_STATUS, CaseIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Batch decoding requires numpy (pip install numpy)")
+
+
+# --- Column-wise expressions ---
+
+def _truth(a):
+    a = np.asarray(a)
+    if a.dtype.kind == 'U':
+        return np.char.str_len(a) > 0
+    if a.dtype == object:
+        return np.array([bool(item) for item in a.reshape(-1)], dtype=bool).reshape(a.shape)
+    return a != 0
+
+
+def _where(truth, then, other):
+    then, other = np.asarray(then), np.asarray(other)
+    if (then.dtype.kind == 'U') != (other.dtype.kind == 'U'):
+        # Text and numbers: keep each row's own type
+        then, other = then.astype(object), other.astype(object)
+    return np.where(truth, then, other)
+
+
+def _if(conditions: list, results: list, other, suspect):
+    """
+    if/elif chain; the first truthy condition selects its result. Without
+    else (other None) the scalar path yields None for rows matching no
+    condition; those rows are left to it.
+    """
+    truths = [_truth(condition) for condition in conditions]
+    if other is None:
+        matched = truths[0]
+        for truth in truths[1:]:
+            matched = matched | truth
+        suspect.append(np.logical_not(matched))
+        other = results[-1]
+    for truth, result in zip(reversed(truths), reversed(results)):
+        other = _where(truth, result, other)
+    return other
+
+
+def _or(*args):
+    # Python 'or' returns the first truthy operand (or the last one)
+    result = args[-1]
+    for arg in reversed(args[:-1]):
+        result = np.where(_truth(arg), arg, result)
+    return result
+
+
+def _and(*args):
+    # Python 'and' returns the first falsy operand (or the last one)
+    result = args[-1]
+    for arg in reversed(args[:-1]):
+        result = np.where(_truth(arg), result, arg)
+    return result
+
+
+def _not(a):
+    return np.logical_not(_truth(a))
+
+
+def _div(a, b, suspect):
+    # Rows dividing by zero raise in the scalar path; remember them
+    suspect.append(np.asarray(b) == 0)
+    return np.true_divide(a, b)
+
+
+def _mod(a, b, suspect):
+    suspect.append(np.asarray(b) == 0)
+    return np.remainder(a, b)
+
+
+def _max(*args):
+    result = args[0]
+    for arg in args[1:]:
+        result = np.maximum(result, arg)
+    return result
+
+
+def _min(*args):
+    result = args[0]
+    for arg in args[1:]:
+        result = np.minimum(result, arg)
+    return result
+
+
+_NAMESPACE = {
+    '__builtins__': {},
+    '_if': _if,
+    '_or': _or,
+    '_and': _and,
+    '_not': _not,
+    '_truth': _truth,
+    '_div': _div,
+    '_mod': _mod,
+    '_max': _max,
+    '_min': _min,
+}
+
+_COMPARISONS = ('<', '<=', '>', '>=')
+
+
+def _is_number(arg) -> bool:
+    return isinstance(arg, (int, float)) and not isinstance(arg, bool)
+
+
+def _emit(expr, branch: bool = False) -> str:
+    """
+    Translate an expression tree into NumPy source (same structure as
+    compiler._emit). Text literals are only allowed as results of 'if'
+    (branch=True), never as operands.
+    """
+    if isinstance(expr, dict):
+        op, args = _args(expr)
+        if op == 'var':
+            name = args[0] if args else 'value'
+            if name not in VARIABLES:
+                raise ExpressionError(f"Unknown variable {name!r}")
+            return name
+        if not args:
+            raise ExpressionError(f"Operator '{op}' without arguments")
+        if op == 'if':
+            # [cond, then, cond, then, ..., else]
+            branches = [_emit(arg, branch=i % 2 == 1 or i == len(args) - 1) for i, arg in enumerate(args)]
+            other = branches.pop() if len(branches) % 2 else 'None'
+            if not branches:
+                return other
+            return (f'_if([{", ".join(branches[0::2])}], [{", ".join(branches[1::2])}], '
+                    f'{other}, _suspect)')
+        parts = [_emit(arg) for arg in args]
+        if op == '+':
+            return '(' + ' + '.join(parts) + ')'
+        if op == '*':
+            return '(' + ' * '.join(parts) + ')'
+        if op == '-':
+            return f'(-{parts[0]})' if len(parts) == 1 else f'({parts[0]} - {parts[1]})'
+        if op == '/' and len(parts) == 2:
+            return f'_div({parts[0]}, {parts[1]}, _suspect)'
+        if op == '%' and len(parts) == 2:
+            return f'_mod({parts[0]}, {parts[1]}, _suspect)'
+        if op in ('==', '!=') and len(parts) == 2:
+            return f'({parts[0]} {op} {parts[1]})'
+        if op in ('===', '!==') and len(parts) == 2 and all(
+                _is_number(arg) or (isinstance(arg, dict) and 'var' in arg) for arg in args):
+            # Raw bit columns are integers, never booleans: strict equality is plain equality
+            return f'({parts[0]} {"==" if op == "===" else "!="} {parts[1]})'
+        if op in _COMPARISONS and len(parts) == 2:
+            return f'({parts[0]} {op} {parts[1]})'
+        if op in _COMPARISONS and len(parts) == 3:
+            return f'(({parts[0]} {op} {parts[1]}) & ({parts[1]} {op} {parts[2]}))'
+        if op == 'or':
+            return f'_or({", ".join(parts)})'
+        if op == 'and':
+            return f'_and({", ".join(parts)})'
+        if op == '!':
+            return f'_not({parts[0]})'
+        if op == '!!':
+            return f'_truth({parts[0]})'
+        if op in ('max', 'min'):
+            return f'_{op}({", ".join(parts)})'
+        raise ExpressionError(f"Operator '{op}' has no column-wise form")
+    if isinstance(expr, (bool, int, float)) or (branch and isinstance(expr, str)):
+        return repr(expr)
+    raise ExpressionError(f"Literal {expr!r} has no column-wise form")
+
+
+# json key -> fn(value, value2, suspect), None if the expression is tabulated instead
+_cache: Dict[str, Optional[Callable]] = {}
+
+
+def compile_array_expression(expr) -> Optional[Callable]:
+    """
+    Compile an expression into fn(value, value2, suspect) over arrays; fn
+    appends boolean masks of rows the scalar path must decide to suspect.
+    None if the expression has no column-wise form.
+    """
+    key = json.dumps(expr, sort_keys=True)
+    if key not in _cache:
+        try:
+            body = _emit(expr)
+            _cache[key] = eval(compile(f'lambda value, value2, _suspect: {body}', '<eep-array-expression>', 'eval'),
+                               _NAMESPACE)
+        except (ExpressionError, SyntaxError) as e:
+            logger.debug(f"Tabulating expression {expr}: {e}")
+            _cache[key] = None
+    return _cache[key]
+
+
+# --- Evaluation ---
+
+def _table(results: list, ok: list) -> 'np.ndarray':
+    """Array of scalar results; numeric if every successful result is a number"""
+    good = [r for r, valid in zip(results, ok) if valid]
+    if good and all(isinstance(r, (bool, int, float)) for r in good):
+        # Failed entries get a placeholder of the same type; they are masked by ok
+        table = np.array([r if valid else good[0] for r, valid in zip(results, ok)])
+        if table.dtype != object:
+            return table
+    table = np.empty(len(results), dtype=object)
+    table[:] = results
+    return table
+
+
+def _common_dtype(dtypes):
+    if object in dtypes:
+        return object
+    try:
+        return np.result_type(*dtypes)
+    except TypeError:
+        return object  # Text and numbers
+
+
+def _merge(result, rows, values) -> 'np.ndarray':
+    """result with result[rows] = values, widened to a common dtype"""
+    result = result.astype(_common_dtype([result.dtype, values.dtype]))
+    result[rows] = values
+    return result
+
+
+def _tabulate(fn: Callable, value, value2, n: int) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Evaluate fn once per distinct (value, value2) and gather"""
+    if value is None and value2 is None:
+        keys, inverse = [(None, None)], np.zeros(n, dtype=np.intp)
+    elif value2 is None:
+        unique, inverse = np.unique(value, return_inverse=True)
+        keys = [(int(v), None) for v in unique]
+    elif value is None:
+        unique, inverse = np.unique(value2, return_inverse=True)
+        keys = [(None, int(v)) for v in unique]
+    else:
+        unique, inverse = np.unique(np.stack([value, value2], axis=1), axis=0, return_inverse=True)
+        keys = [(int(a), int(b)) for a, b in unique]
+
+    results, ok = [], []
+    for raw, raw2 in keys:
+        try:
+            results.append(fn(raw, raw2))
+            ok.append(True)
+        except (TypeError, ZeroDivisionError):
+            results.append(None)
+            ok.append(False)
+    inverse = np.asarray(inverse).reshape(-1)
+    return _table(results, ok)[inverse], np.array(ok, dtype=bool)[inverse]
+
+
+def _evaluate(expr, scalar: Callable, value, value2, n: int,
+              decimals: Optional[int] = None) -> Tuple['np.ndarray', 'np.ndarray']:
+    """
+    Column result and ok-mask (False where the scalar path raises) of one
+    expression over n rows; scalar is the compiled function of the same
+    expression (including its rounding to decimals)
+    """
+    vector = compile_array_expression(expr) if isinstance(expr, dict) else None
+    if vector is not None and value is not None:
+        suspects: List = []
+        try:
+            with np.errstate(all='ignore'):
+                result = np.array(np.broadcast_to(vector(value, value2, suspects), (n,)))
+        except (TypeError, ValueError):
+            result = None  # e.g. negating a boolean column, None operands
+        if result is not None:
+            if decimals is not None:
+                result = _round(result, decimals)
+            ok = np.ones(n, dtype=bool)
+            suspect = np.zeros(n, dtype=bool)
+            for mask in suspects:
+                suspect |= np.broadcast_to(mask, (n,))
+            rows = np.flatnonzero(suspect)
+            if len(rows):
+                # Division by zero, missing else: the scalar function decides
+                values, valid = _tabulate(scalar, value[rows], value2[rows] if value2 is not None else None,
+                                          len(rows))
+                if valid.any():
+                    result = _merge(result, rows[valid], values[valid])
+                ok[rows] = valid
+            return result, ok
+    return _tabulate(scalar, value, value2, n)
+
+
+def _round(column, decimals: int):
+    """Python round() per distinct float, so results match the scalar path bit for bit"""
+    if column.dtype == object:
+        rounded = np.empty(len(column), dtype=object)
+        rounded[:] = [round(v, decimals) if isinstance(v, float) else v for v in column]
+        return rounded
+    if column.dtype.kind != 'f':
+        return column
+    unique, inverse = np.unique(column, return_inverse=True)
+    return np.array([round(float(v), decimals) for v in unique])[np.asarray(inverse).reshape(-1)]
+
+
+def _bits(payloads, status, width: int, source: int, shift: int, mask: int):
+    """Column (payload_int >> shift) & mask per row, from the byte matrix"""
+    if not mask:
+        return None
+    if source == SOURCE_STATUS:
+        return (status >> shift) & mask
+    bitsize = mask.bit_length()
+    first = width - shift - bitsize
+    start, end = first // 8, (first + bitsize + 7) // 8
+    span = payloads[:, start:end]
+    if end - start > 8:
+        # Wider than 64 bits: Python integers
+        return np.array([(int.from_bytes(row.tobytes(), 'big') >> (end * 8 - first - bitsize)) & mask
+                         for row in span], dtype=object)
+    acc = np.zeros(len(payloads), dtype=np.uint64)
+    for j in range(end - start):
+        acc = (acc << np.uint64(8)) | span[:, j]
+    return ((acc >> np.uint64(end * 8 - first - bitsize)) & np.uint64(mask)).astype(np.int64)
+
+
+def _case_rows(index: CaseIndex, payloads, status, width: int) -> Dict[int, tuple]:
+    """order -> (case, rows matching it) with the semantics of CaseIndex.match"""
+    n = len(payloads)
+    unconditional, groups, predicates = index.layout(width)
+    matched: Dict[int, list] = {order: [case, np.ones(n, dtype=bool)] for order, case in unconditional}
+
+    for extractors, table in groups:
+        if not all(mask for _, _, mask in extractors):
+            continue  # Slice beyond this payload: group cannot match
+        columns = [_bits(payloads, status, width, *extractor) for extractor in extractors]
+        for values, hits in table.items():
+            rows = np.ones(n, dtype=bool)
+            for column, wanted in zip(columns, values):
+                rows &= column == wanted
+            if not rows.any():
+                continue
+            for order, case in hits:
+                if order in matched:
+                    matched[order][1] |= rows
+                else:
+                    matched[order] = [case, rows]
+
+    for order, entries in predicates.items():
+        if order not in matched:
+            continue
+        rows = matched[order][1]
+        for extractor, test, expr in entries:
+            column = _bits(payloads, status, width, *extractor)
+            if column is None:
+                rows = np.zeros(n, dtype=bool)
+                break
+            result, ok = _evaluate(expr, test, column, None, n)
+            rows = rows & ok & _truth(result)
+        matched[order][1] = rows
+    return {order: tuple(entry) for order, entry in sorted(matched.items()) if entry[1].any()}
+
+
+def decode_batch(index: CaseIndex, payloads, status=None) -> Dict[str, 'np.ma.MaskedArray']:
+    """
+    Decode many payloads of one EEP
+
+    Args:
+        index: Case index of the profile (EEPProfile.dispatch)
+        payloads: uint8 array of shape (telegrams, payload bytes); the ERP1
+            payload without RORG, sender and status
+        status: ERP1 status byte per telegram (default 0)
+
+    Returns:
+        shortcut -> masked array with one entry per telegram; masked where
+        the telegram has no value for the shortcut
+    """
+    _require_numpy()
+    payloads = np.asarray(payloads, dtype=np.uint8)
+    if payloads.ndim != 2:
+        raise ValueError(f"Expected a 2-D payload matrix, got shape {payloads.shape}")
+    n, width = payloads.shape[0], payloads.shape[1] * 8
+    status = np.zeros(n, dtype=np.int64) if status is None else np.asarray(status, dtype=np.int64)
+
+    # shortcut -> rows already assigned, [(rows, values)]
+    assigned: Dict[str, 'np.ndarray'] = {}
+    parts: Dict[str, list] = {}
+    columns = {}
+
+    def column(shift, mask):
+        key = (shift, mask)
+        if key not in columns:
+            columns[key] = _bits(payloads, status, width, 0, shift, mask)
+        return columns[key]
+
+    for case, case_rows in _case_rows(index, payloads, status, width).values():
+        for field, shift, mask, shift2, mask2 in case.plan(width):
+            shortcut = field.shortcut
+            done = assigned.setdefault(shortcut, np.zeros(n, dtype=bool))
+            rows = np.flatnonzero(case_rows & ~done)  # Earlier case wins
+            if not len(rows):
+                continue
+            value = column(shift, mask)[rows] if mask else None
+            value2 = column(shift2, mask2)[rows] if mask2 else None
+
+            ok = np.ones(len(rows), dtype=bool)
+            if field.condition:
+                passed, valid = _evaluate(field.source.get('condition'), field.condition, value, value2, len(rows))
+                ok &= valid & _truth(passed)
+
+            expr = field.source.get('value')
+            if field.decode is _identity:
+                result = value
+            elif isinstance(expr, dict):
+                decimals = field.source.get('decimals')
+                result, valid = _evaluate(expr, field.decode, value, value2, len(rows),
+                                          int(decimals) if decimals is not None else None)
+                ok &= valid
+            else:
+                result, valid = _tabulate(field.decode, None, None, len(rows))
+
+            if not ok.all():
+                rows, result = rows[ok], result[ok]
+            done[rows] = True
+            parts.setdefault(shortcut, []).append((rows, result))
+
+    decoded = {}
+    for shortcut, entries in parts.items():
+        data = np.zeros(n, dtype=_common_dtype([values.dtype for _, values in entries]))
+        for rows, values in entries:
+            data[rows] = values
+        decoded[shortcut] = np.ma.MaskedArray(data, mask=~assigned[shortcut])
+    return decoded
+
+
+def stack_telegrams(telegrams: List[bytes]) -> Tuple['np.ndarray', 'np.ndarray']:
+    """
+    ERP1 data blocks (RORG | payload | sender | status) of equal length into
+    (payload matrix, status vector) for decode_batch
+    """
+    _require_numpy()
+    if not telegrams:
+        return np.zeros((0, 0), dtype=np.uint8), np.zeros(0, dtype=np.int64)
+    lengths = {len(data) for data in telegrams}
+    if len(lengths) != 1:
+        raise ValueError(f"Telegrams differ in length ({sorted(lengths)}); batch them per length")
+    matrix = np.frombuffer(b''.join(bytes(data) for data in telegrams), dtype=np.uint8).reshape(len(telegrams), -1)
+    if matrix.shape[1] > 6:
+        return matrix[:, 1:-5], matrix[:, -1].astype(np.int64)
+    return matrix[:, 1:], matrix[:, -1].astype(np.int64)
@@ -0,0 +1,258 @@
+"""
+EEP Profile Bundle
+All profile definitions in one binary file: every profile stripped to the
+fields the runtime reads, together with the compiled code of its
+expressions. A cold start loads this one file instead of parsing every
+JSON definition and compiling its expressions.
+
+File layout: MAGIC | format version (1 byte) | interpreter magic (4 bytes;
+marshal data and code objects are specific to the Python version) |
+SHA-256 of the payload | payload (marshal). The payload keeps mtime, size
+and SHA-256 per source file, so sync() only reads files whose mtime or
+size changed and only recompiles those whose content changed.
+
+Build: python3 -m eep.bundle [definitions dir ...] [-o bundle]
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import marshal
+import os
+import tempfile
+from glob import glob
+from typing import Dict, Iterator, List, Optional, Tuple
+from .compiler import ExpressionError, export_code, preload
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'EEPBNDL'
+FORMAT_VERSION = 1
+_HEAD_SIZE = len(MAGIC) + 1 + len(importlib.util.MAGIC_NUMBER) + 32
+
+# Top-level keys of the manifest (see EEPLoader)
+HEADER_FIELDS = ('eep', 'rorg_number', 'func_number', 'type_number', 'type_title')
+
+# Fields kept in the bundle; everything else (ioBroker "common"/"native",
+# descriptions, comments) is never read at runtime
+PROFILE_FIELDS = HEADER_FIELDS + ('telegram', 'bidirectional', 'commands', 'objects', 'case')
+ENTITY_FIELDS = ('component', 'name', 'shortcut', 'device_class', 'unit', 'icon', 'state_class', 'entity_category')
+CASE_FIELDS = ('send', 'condition', 'data', 'status', 'datafield')
+DATAFIELD_FIELDS = ('shortcut', 'bitoffs', 'bitsize', 'value', 'value_out', 'decimals', 'secondArgument', 'condition')
+
+DEFAULT_DEFINITIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'definitions')
+DEFAULT_BUNDLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'definitions.bundle')
+
+
+class BundleError(ValueError):
+    """Bundle is corrupt or written by another format/interpreter version"""
+
+
+def _pick(data: dict, fields: tuple) -> dict:
+    return {key: data[key] for key in fields if key in data}
+
+
+def strip_profile(data: dict) -> dict:
+    """Profile definition reduced to the fields EEPProfile and the decoder use"""
+    profile = _pick(data, PROFILE_FIELDS)
+    objects = data.get('objects')
+    if isinstance(objects, dict):
+        profile['objects'] = {key: _pick(entity, ENTITY_FIELDS) if isinstance(entity, dict) else entity
+                              for key, entity in objects.items()}
+    cases = data.get('case')
+    if isinstance(cases, list):
+        profile['case'] = []
+        for case in cases:
+            if not isinstance(case, dict):
+                continue
+            case = _pick(case, CASE_FIELDS)
+            case['datafield'] = [_pick(field, DATAFIELD_FIELDS) for field in case.get('datafield', [])
+                                 if isinstance(field, dict)]
+            profile['case'].append(case)
+    return profile
+
+
+def _expressions(profile: dict) -> Iterator[Tuple[dict, Optional[int]]]:
+    """(expression, decimals) of everything compile_cases/CaseIndex compile"""
+    for case in profile.get('case', []):
+        condition = case.get('condition')
+        specs = condition if isinstance(condition, list) else [condition] if isinstance(condition, dict) else []
+        for spec in specs:
+            if not isinstance(spec, dict):
+                continue
+            # {"bitoffs": ...} or named groups {"statusfield": [...], "t_sensor": {...}}
+            groups = [spec] if 'bitoffs' in spec else list(spec.values())
+            for entry in (e for group in groups for e in (group if isinstance(group, list) else [group])):
+                if isinstance(entry, dict) and isinstance(entry.get('value'), dict):
+                    yield entry['value'], None
+        for field in case.get('datafield', []):
+            if isinstance(field.get('value'), dict):
+                yield field['value'], field.get('decimals')
+            for key in ('value_out', 'condition'):
+                if isinstance(field.get(key), dict):
+                    yield field[key], None
+
+
+class SourceEntry:
+    """One definition file: its stat/hash key, manifest header and compiled profile"""
+
+    __slots__ = ('key', 'mtime_ns', 'size', 'sha256', 'header', 'blob', 'codes')
+
+    def __init__(self, key: tuple, mtime_ns: int, size: int, sha256: str,
+                 header: Optional[dict], blob: Optional[bytes], codes: Dict[str, bytes]):
+        self.key = key            # (index of the base path, path relative to it)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
+        self.header = header      # None: file is no profile
+        self.blob = blob          # marshalled strip_profile() result
+        self.codes = codes        # compiler cache key -> marshalled code
+
+    def record(self) -> tuple:
+        return (self.key, self.mtime_ns, self.size, self.sha256, self.header, self.blob, self.codes)
+
+    def profile_data(self) -> dict:
+        return marshal.loads(self.blob)
+
+
+def compile_source(key: tuple, raw: bytes, sha256: str, stat: os.stat_result) -> SourceEntry:
+    """Parse, strip and compile one definition file"""
+    data = json.loads(raw.decode('utf-8'))
+    if not isinstance(data, dict) or 'eep' not in data:
+        return SourceEntry(key, stat.st_mtime_ns, stat.st_size, sha256, None, None, {})
+    profile = strip_profile(data)
+    codes = {}
+    for expr, decimals in _expressions(profile):
+        try:
+            cache_key, code = export_code(expr, decimals)
+            codes[cache_key] = code
+        except (ExpressionError, SyntaxError, TypeError, ValueError):
+            continue  # Interpreted at runtime, see compiler._compile_or_interpret
+    return SourceEntry(key, stat.st_mtime_ns, stat.st_size, sha256, _pick(profile, HEADER_FIELDS),
+                       marshal.dumps(profile), codes)
+
+
+def read_bundle(path: str) -> Dict[tuple, SourceEntry]:
+    """Source entries of a bundle; raises BundleError if it cannot be used"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if len(raw) < _HEAD_SIZE or not raw.startswith(MAGIC):
+        raise BundleError("not a profile bundle")
+    pos = len(MAGIC)
+    if raw[pos] != FORMAT_VERSION:
+        raise BundleError(f"format version {raw[pos]}, expected {FORMAT_VERSION}")
+    pos += 1
+    if raw[pos:pos + 4] != importlib.util.MAGIC_NUMBER:
+        raise BundleError("written by another Python version")
+    digest, payload = raw[pos + 4:_HEAD_SIZE], raw[_HEAD_SIZE:]
+    if hashlib.sha256(payload).digest() != digest:
+        raise BundleError("checksum mismatch")
+    try:
+        return {record[0]: SourceEntry(*record) for record in marshal.loads(payload)}
+    except (EOFError, ValueError, TypeError) as e:
+        raise BundleError(f"unreadable payload: {e}")
+
+
+def write_bundle(path: str, entries: List[SourceEntry]):
+    """Write atomically (temporary file + rename)"""
+    payload = marshal.dumps([entry.record() for entry in entries])
+    data = MAGIC + bytes([FORMAT_VERSION]) + importlib.util.MAGIC_NUMBER + hashlib.sha256(payload).digest() + payload
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.eep-bundle-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load_previous(paths) -> Tuple[Dict[tuple, SourceEntry], Optional[str]]:
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            return read_bundle(path), path
+        except (OSError, BundleError) as e:
+            logger.warning(f"Ignoring profile bundle {path}: {e}")
+    return {}, None
+
+
+def sync(base_paths: List[str], path: str, seed_path: Optional[str] = None) -> Tuple[List[SourceEntry], dict]:
+    """
+    Bring the bundle at path up to date with the definition files
+
+    Args:
+        base_paths: Definition directories; later ones override earlier ones
+        path: Writable bundle (runtime cache)
+        seed_path: Bundle to start from if path is missing or unusable
+            (e.g. the one built into the image)
+
+    Returns:
+        (source entries in override order, statistics) - the expression
+        code of all entries is registered with the compiler
+    """
+    previous, source = _load_previous([path, seed_path])
+    stats = {'reused': 0, 'rehashed': 0, 'compiled': 0, 'removed': 0, 'written': False}
+    entries: Dict[tuple, SourceEntry] = {}
+    changed = False
+
+    for index, base_path in enumerate(base_paths):
+        if not os.path.exists(base_path):
+            continue
+        for file_path in sorted(glob(os.path.join(base_path, '**', '*.json'), recursive=True)):
+            key = (index, os.path.relpath(file_path, base_path))
+            try:
+                stat = os.stat(file_path)
+                entry = previous.get(key)
+                if entry and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                    stats['reused'] += 1
+                else:
+                    with open(file_path, 'rb') as f:
+                        raw = f.read()
+                    sha256 = hashlib.sha256(raw).hexdigest()
+                    if entry and entry.sha256 == sha256:
+                        # Touched or copied, content unchanged
+                        entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                        stats['rehashed'] += 1
+                    else:
+                        entry = compile_source(key, raw, sha256, stat)
+                        stats['compiled'] += 1
+                    changed = True
+                entries[key] = entry
+            except Exception as e:
+                logger.error(f"Error loading EEP from {file_path}: {e}")
+
+    stats['removed'] = len(previous.keys() - entries.keys())
+    if changed or stats['removed'] or source != path:
+        try:
+            write_bundle(path, list(entries.values()))
+            stats['written'] = True
+        except OSError as e:
+            logger.warning(f"Could not write profile bundle {path}: {e}")
+
+    for entry in entries.values():
+        preload(entry.codes)
+    return list(entries.values()), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the EEP profile bundle")
+    parser.add_argument('definitions', nargs='*', default=[DEFAULT_DEFINITIONS],
+                        help='definition directories, later ones override earlier ones')
+    parser.add_argument('-o', '--output', default=DEFAULT_BUNDLE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    entries, stats = sync(args.definitions, args.output)
+    profiles = sum(1 for entry in entries if entry.header)
+    print(f"{args.output}: {profiles} profiles, {os.path.getsize(args.output)} bytes "
+          f"({stats['compiled']} compiled, {stats['reused'] + stats['rehashed']} unchanged)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+EEP Expression Compiler
+Turns the JSON-logic style expressions of the EEP definitions (datafield
+"value", "value_out" and "condition") into Python functions once per
+profile, so decoding a field costs a few arithmetic operations instead of
+a walk over the expression tree.
+
+Only whitelisted operators are translated and every literal is emitted via
+repr(), so custom profiles cannot inject code. evaluate() is the reference
+tree-walking interpreter with identical semantics.
+"""
+import json
+import logging
+import marshal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Variables an expression may reference: the field's raw bits and the raw
+# bits of its "secondArgument"
+VARIABLES = ('value', 'value2')
+
+
+class ExpressionError(ValueError):
+    """Expression uses an unknown operator or malformed arguments"""
+
+
+def _loose_eq(a, b) -> bool:
+    # JSON-logic '==': numeric strings compare equal to numbers
+    if isinstance(a, str) != isinstance(b, str):
+        try:
+            return float(a) == float(b)
+        except (TypeError, ValueError):
+            return False
+    return a == b
+
+
+def _strict_eq(a, b) -> bool:
+    # JSON-logic '===': booleans never equal numbers
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    return a == b
+
+
+def _round(value, decimals: int):
+    if isinstance(value, float):
+        return round(value, decimals)
+    return value
+
+
+_NAMESPACE = {
+    '__builtins__': {},
+    '_loose_eq': _loose_eq,
+    '_strict_eq': _strict_eq,
+    '_round': _round,
+    'max': max,
+    'min': min,
+    'bool': bool,
+}
+
+_COMPARISONS = {'<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+
+def _args(expr: dict) -> tuple:
+    if len(expr) != 1:
+        raise ExpressionError(f"Expression must have exactly one operator: {expr}")
+    op, args = next(iter(expr.items()))
+    if not isinstance(args, list):
+        args = [args]
+    return op, args
+
+
+def _emit(expr) -> str:
+    """Translate an expression tree into Python source"""
+    if isinstance(expr, dict):
+        op, args = _args(expr)
+        if op == 'var':
+            name = args[0] if args else 'value'
+            return name if name in VARIABLES else 'None'
+        if not args:
+            raise ExpressionError(f"Operator '{op}' without arguments")
+        parts = [_emit(arg) for arg in args]
+        if op == '+':
+            return '(' + ' + '.join(parts) + ')'
+        if op == '*':
+            return '(' + ' * '.join(parts) + ')'
+        if op == '-':
+            return f'(-{parts[0]})' if len(parts) == 1 else f'({parts[0]} - {parts[1]})'
+        if op in ('/', '%') and len(parts) == 2:
+            return f'({parts[0]} {op} {parts[1]})'
+        if op in ('==', '!=') and len(parts) == 2:
+            if any(isinstance(arg, str) for arg in args):
+                test = f'_loose_eq({parts[0]}, {parts[1]})'
+                return test if op == '==' else f'(not {test})'
+            return f'({parts[0]} {op} {parts[1]})'
+        if op in ('===', '!==') and len(parts) == 2:
+            test = f'_strict_eq({parts[0]}, {parts[1]})'
+            return test if op == '===' else f'(not {test})'
+        if op in _COMPARISONS and len(parts) in (2, 3):
+            # Three arguments: between (a < b < c)
+            return '(' + f' {_COMPARISONS[op]} '.join(parts) + ')'
+        if op == 'if':
+            # [cond, then, cond, then, ..., else]
+            result = parts[-1] if len(parts) % 2 else 'None'
+            pairs = parts[:-1] if len(parts) % 2 else parts
+            for i in range(len(pairs) - 2, -1, -2):
+                result = f'({pairs[i + 1]} if {pairs[i]} else {result})'
+            return result
+        if op == 'or':
+            return '(' + ' or '.join(parts) + ')'
+        if op == 'and':
+            return '(' + ' and '.join(parts) + ')'
+        if op == '!':
+            return f'(not {parts[0]})'
+        if op == '!!':
+            return f'bool({parts[0]})'
+        if op in ('max', 'min'):
+            return f'{op}({", ".join(parts)})'
+        raise ExpressionError(f"Unsupported operator '{op}'")
+    if expr is None or isinstance(expr, (bool, int, float, str)):
+        return repr(expr)
+    raise ExpressionError(f"Unsupported literal {expr!r}")
+
+
+def evaluate(expr, value=None, value2=None):
+    """Reference interpreter (tree walk); same semantics as compiled functions"""
+    if not isinstance(expr, dict):
+        return expr
+    op, args = _args(expr)
+    if op == 'var':
+        name = args[0] if args else 'value'
+        return {'value': value, 'value2': value2}.get(name) if isinstance(name, str) else None
+    if op == 'if':
+        for i in range(0, len(args) - 1, 2):
+            if evaluate(args[i], value, value2):
+                return evaluate(args[i + 1], value, value2)
+        return evaluate(args[-1], value, value2) if len(args) % 2 else None
+    if op == 'or':
+        result = None
+        for arg in args:
+            result = evaluate(arg, value, value2)
+            if result:
+                return result
+        return result
+    if op == 'and':
+        result = None
+        for arg in args:
+            result = evaluate(arg, value, value2)
+            if not result:
+                return result
+        return result
+
+    values = [evaluate(arg, value, value2) for arg in args]
+    if op == '+':
+        return sum(values[1:], values[0])
+    if op == '*':
+        result = values[0]
+        for item in values[1:]:
+            result = result * item
+        return result
+    if op == '-':
+        return -values[0] if len(values) == 1 else values[0] - values[1]
+    if op == '/':
+        return values[0] / values[1]
+    if op == '%':
+        return values[0] % values[1]
+    if op == '==':
+        return _loose_eq(values[0], values[1]) if any(isinstance(a, str) for a in args) else values[0] == values[1]
+    if op == '!=':
+        return not (_loose_eq(values[0], values[1]) if any(isinstance(a, str) for a in args) else values[0] == values[1])
+    if op == '===':
+        return _strict_eq(values[0], values[1])
+    if op == '!==':
+        return not _strict_eq(values[0], values[1])
+    if op in _COMPARISONS:
+        compare = {'<': lambda a, b: a < b, '<=': lambda a, b: a <= b,
+                   '>': lambda a, b: a > b, '>=': lambda a, b: a >= b}[op]
+        return all(compare(values[i], values[i + 1]) for i in range(len(values) - 1))
+    if op == '!':
+        return not values[0]
+    if op == '!!':
+        return bool(values[0])
+    if op in ('max', 'min'):
+        return max(values) if op == 'max' else min(values)
+    raise ExpressionError(f"Unsupported operator '{op}'")
+
+
+# Identical expressions are shared by many profiles (e.g. rocker tests)
+_cache: Dict[str, Callable] = {}
+# Marshalled code from a profile bundle (eep.bundle), turned into functions on first use
+_precompiled: Dict[str, bytes] = {}
+
+
+def _key(expr, decimals: Optional[int]) -> str:
+    return json.dumps([expr, decimals], sort_keys=True)
+
+
+def _code(expr, decimals: Optional[int]):
+    body = _emit(expr)
+    if decimals is not None:
+        body = f'_round({body}, {int(decimals)})'
+    return compile(f'lambda value, value2=None: {body}', '<eep-expression>', 'eval')
+
+
+def compile_expression(expr, decimals: Optional[int] = None) -> Callable[..., Any]:
+    """
+    Compile an expression into fn(value, value2=None)
+
+    Args:
+        expr: Expression tree (dict) or constant
+        decimals: Round float results to this many decimals
+
+    Returns:
+        Cached function; raises ExpressionError for unsupported expressions
+    """
+    key = _key(expr, decimals)
+    fn = _cache.get(key)
+    if fn is None:
+        code = _precompiled.pop(key, None)
+        fn = eval(marshal.loads(code) if code else _code(expr, decimals), _NAMESPACE)
+        _cache[key] = fn
+    return fn
+
+
+def export_code(expr, decimals: Optional[int] = None) -> Tuple[str, bytes]:
+    """(cache key, marshalled code) of an expression for a profile bundle; raises like compile_expression"""
+    return _key(expr, decimals), marshal.dumps(_code(expr, decimals))
+
+
+def preload(codes: Dict[str, bytes]):
+    """Register marshalled code exported by export_code (same interpreter version only)"""
+    for key, code in codes.items():
+        if key not in _cache:
+            _precompiled[key] = code
+
+
+def _interpreted(expr, decimals: Optional[int] = None) -> Callable[..., Any]:
+    """Fallback for expressions the compiler rejects"""
+    def run(value, value2=None):
+        result = evaluate(expr, value, value2)
+        return _round(result, int(decimals)) if decimals is not None else result
+    return run
+
+
+def _identity(value, value2=None):
+    return value
+
+
+class CompiledField:
+    """One datafield with its decode/encode functions"""
+
+    __slots__ = ('shortcut', 'bitoffs', 'bitsize', 'second_bitoffs', 'second_bitsize',
+                 'decode', 'encode', 'condition', 'fixed_value', 'source')
+
+    def __init__(self, field: dict):
+        self.source = field
+        self.shortcut = field.get('shortcut')
+        self.bitoffs = _int(field.get('bitoffs'))
+        self.bitsize = _int(field.get('bitsize'))
+        second = field.get('secondArgument') or {}
+        self.second_bitoffs = _int(second.get('bitoffs'))
+        self.second_bitsize = _int(second.get('bitsize'))
+        decimals = field.get('decimals')
+
+        value = field.get('value')
+        # Constant without shortcut: fixed bits that identify the case
+        self.fixed_value = value if isinstance(value, int) and not isinstance(value, bool) and not self.shortcut else None
+        if isinstance(value, dict):
+            self.decode = _compile_or_interpret(value, decimals)
+        elif value is None:
+            self.decode = _identity
+        else:
+            self.decode = lambda raw, raw2=None, constant=value: constant
+
+        value_out = field.get('value_out')
+        self.encode = _compile_or_interpret(value_out) if isinstance(value_out, dict) else None
+        condition = field.get('condition')
+        self.condition = _compile_or_interpret(condition) if isinstance(condition, dict) else None
+
+
+def bit_slice(bitoffs: Optional[int], bitsize: Optional[int], width: int) -> Tuple[int, int]:
+    """
+    Shift and mask for bits [bitoffs, bitoffs + bitsize) counted from the MSB
+    of a width-bit payload integer; (0, 0) if the field does not fit
+    """
+    if bitoffs is None or not bitsize or bitoffs + bitsize > width:
+        return 0, 0
+    return width - bitoffs - bitsize, (1 << bitsize) - 1
+
+
+class CompiledCase:
+    """Compiled datafields of one profile case"""
+
+    __slots__ = ('send', 'fields', 'source', '_plans')
+
+    def __init__(self, case: dict):
+        self.source = case
+        self.send = bool(case.get('send'))
+        self.fields: List[CompiledField] = [CompiledField(field) for field in case.get('datafield', [])]
+        self._plans: Dict[int, tuple] = {}
+
+    def plan(self, width: int) -> tuple:
+        """
+        Extraction plan for a payload of width bits: one entry
+        (field, shift, mask, shift2, mask2) per output field, so every value
+        is pulled from the payload integer with one shift and one mask.
+        Fields not covered by the payload (mask 0) are left out.
+        """
+        plan = self._plans.get(width)
+        if plan is None:
+            entries = []
+            for field in self.fields:
+                if not field.shortcut:
+                    continue
+                shift, mask = bit_slice(field.bitoffs, field.bitsize, width)
+                if not mask and (field.decode is _identity or isinstance(field.source.get('value'), dict)):
+                    continue  # Depends on bits the payload does not have
+                shift2, mask2 = bit_slice(field.second_bitoffs, field.second_bitsize, width)
+                entries.append((field, shift, mask, shift2, mask2))
+            plan = self._plans[width] = tuple(entries)
+        return plan
+
+
+def _int(text) -> Optional[int]:
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compile_or_interpret(expr, decimals: Optional[int] = None) -> Callable[..., Any]:
+    try:
+        return compile_expression(expr, decimals)
+    except (ExpressionError, SyntaxError) as e:
+        logger.warning(f"Falling back to interpreter for expression {expr}: {e}")
+        return _interpreted(expr, decimals)
+
+
+def compile_cases(profile_data: dict) -> List[CompiledCase]:
+    """Compile every case of a profile definition"""
+    cases = profile_data.get('case', [])
+    if not isinstance(cases, list):
+        return []
+    return [CompiledCase(case) for case in cases if isinstance(case, dict)]
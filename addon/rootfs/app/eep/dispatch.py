@@ -0,0 +1,177 @@
+"""
+EEP Case Dispatch Index
+Built once per profile over the receive-side cases (send: true cases are
+left out). Every constant condition - statusfield bits, command nibble,
+named data conditions, fixed "data"/"status" values - becomes a bit slice
+of the payload or the status byte. Cases constraining the same slices form
+a group whose dict is keyed on the slice values, so finding the matching
+cases costs one lookup per group instead of a scan over all cases.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+from .compiler import CompiledCase, ExpressionError, bit_slice, compile_expression
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DATA = 0
+SOURCE_STATUS = 1
+FULL_PAYLOAD = -1  # bitsize marker: the complete payload ("data": "0x30")
+
+# (source, bitoffs, bitsize)
+Slice = Tuple[int, int, int]
+
+
+def _to_int(value) -> int:
+    if isinstance(value, str):
+        return int(value, 0)
+    return int(value)
+
+
+def _condition_entries(case: dict) -> List[Tuple[int, dict]]:
+    """All bit conditions of a case as (source, {bitoffs, bitsize, value})"""
+    condition = case.get('condition')
+    entries = []
+    if isinstance(condition, list):
+        entries = [(SOURCE_DATA, entry) for entry in condition]
+    elif isinstance(condition, dict):
+        if 'bitoffs' in condition:
+            entries = [(SOURCE_DATA, condition)]
+        else:
+            # {"statusfield": [...]}, {"command": [...]}, {"t_sensor": {...}}, ...
+            for name, spec in condition.items():
+                source = SOURCE_STATUS if name == 'statusfield' else SOURCE_DATA
+                for entry in spec if isinstance(spec, list) else [spec]:
+                    entries.append((source, entry))
+    # Entries without a bit position (e.g. {"command": [{"value": 1}]}) only label the case
+    return [(source, entry) for source, entry in entries
+            if isinstance(entry, dict) and 'bitoffs' in entry and 'bitsize' in entry and 'value' in entry]
+
+
+class CaseIndex:
+    """Receive cases of one profile, indexed on their discriminating bits"""
+
+    def __init__(self, cases: List[CompiledCase]):
+        self.cases = cases
+        # slices -> {values: [(order, case)]}
+        self._groups: Dict[Tuple[Slice, ...], Dict[tuple, list]] = {}
+        self._unconditional: List[Tuple[int, CompiledCase]] = []
+        # Conditions whose value is an expression ({"or": [...]}) are tested per telegram
+        self._predicates: Dict[int, List[Tuple[Slice, callable, dict]]] = {}
+        self._extractors: Dict[int, tuple] = {}
+
+        for order, case in enumerate(cases):
+            if case.send:
+                continue
+            try:
+                slices, values, predicates = self._conditions(case.source)
+            except (TypeError, ValueError, ExpressionError) as e:
+                logger.warning(f"Ignoring malformed case condition {case.source.get('condition')}: {e}")
+                continue
+            if predicates:
+                self._predicates[order] = predicates
+            if not slices:
+                self._unconditional.append((order, case))
+                continue
+            # Sort slices so equal condition sets in different order share a group
+            pairs = sorted(zip(slices, values))
+            key = tuple(slice_ for slice_, _ in pairs)
+            self._groups.setdefault(key, {}).setdefault(tuple(v for _, v in pairs), []).append((order, case))
+
+    @staticmethod
+    def _conditions(case: dict):
+        slices: List[Slice] = []
+        values: List[int] = []
+        predicates = []
+        for source, entry in _condition_entries(case):
+            slice_ = (source, int(entry['bitoffs']), int(entry['bitsize']))
+            value = entry['value']
+            if isinstance(value, dict):
+                predicates.append((slice_, compile_expression(value), value))
+            else:
+                slices.append(slice_)
+                values.append(_to_int(value))
+        if 'data' in case:
+            slices.append((SOURCE_DATA, 0, FULL_PAYLOAD))
+            values.append(_to_int(case['data']))
+        if 'status' in case:
+            slices.append((SOURCE_STATUS, 0, 8))
+            values.append(_to_int(case['status']))
+        return slices, values, predicates
+
+    @staticmethod
+    def _slice_extractor(slice_: Slice, width: int) -> Tuple[int, int, int]:
+        source, bitoffs, bitsize = slice_
+        if source == SOURCE_STATUS:
+            shift, mask = bit_slice(bitoffs, bitsize, 8)
+        elif bitsize == FULL_PAYLOAD:
+            shift, mask = 0, (1 << width) - 1
+        else:
+            shift, mask = bit_slice(bitoffs, bitsize, width)
+        return source, shift, mask
+
+    def _group_extractors(self, width: int) -> tuple:
+        """Per payload width: (slice extractors, table) for every group"""
+        extractors = self._extractors.get(width)
+        if extractors is None:
+            extractors = tuple(
+                (tuple(self._slice_extractor(slice_, width) for slice_ in slices), table)
+                for slices, table in self._groups.items()
+            )
+            self._extractors[width] = extractors
+        return extractors
+
+    def _value(self, slice_: Slice, raw_val: int, width: int, status: int) -> Optional[int]:
+        source, shift, mask = self._slice_extractor(slice_, width)
+        if not mask:
+            return None
+        return ((status if source == SOURCE_STATUS else raw_val) >> shift) & mask
+
+    def match(self, raw_val: int, width: int, status: int) -> List[CompiledCase]:
+        """
+        Receive cases matching a telegram, in definition order
+
+        Args:
+            raw_val: Payload as big-endian integer
+            width: Payload length in bits
+            status: ERP1 status byte
+        """
+        found = list(self._unconditional)
+        for extractors, table in self._group_extractors(width):
+            key = []
+            for source, shift, mask in extractors:
+                if not mask:
+                    break  # Slice beyond this payload: group cannot match
+                key.append(((status if source == SOURCE_STATUS else raw_val) >> shift) & mask)
+            else:
+                hit = table.get(tuple(key))
+                if hit:
+                    found.extend(hit)
+
+        if self._predicates:
+            found = [(order, case) for order, case in found
+                     if all(self._test(slice_, test, raw_val, width, status)
+                            for slice_, test, _ in self._predicates.get(order, ()))]
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0])
+        return [case for _, case in found]
+
+    def layout(self, width: int) -> tuple:
+        """
+        Match structure for evaluating many telegrams at once (eep.batch):
+        (unconditional [(order, case)], [(extractors, {values: [(order, case)]})],
+        {order: [((source, shift, mask), test, expression)]}) where every
+        extractor is (source, shift, mask) and mask 0 means the slice does
+        not fit the payload
+        """
+        predicates = {
+            order: [(self._slice_extractor(slice_, width), test, expr) for slice_, test, expr in entries]
+            for order, entries in self._predicates.items()
+        }
+        return self._unconditional, self._group_extractors(width), predicates
+
+    def _test(self, slice_: Slice, test, raw_val: int, width: int, status: int) -> bool:
+        value = self._value(slice_, raw_val, width, status)
+        try:
+            return value is not None and bool(test(value))
+        except (TypeError, ZeroDivisionError):
+            return False
@@ -1,10 +1,26 @@
 import os
+import re
 import json
+import hashlib
 import logging
+from collections import OrderedDict
+from collections.abc import Mapping
 from glob import glob
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+from . import bundle
+from .bundle import HEADER_FIELDS
+from .compiler import compile_cases, preload
+from .dispatch import CaseIndex
 
 logger = logging.getLogger(__name__)
 
+# The manifest fields precede "objects"/"case" in the definitions
+HEADER_BYTES = 4096
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'\s*')
+
 class EEPProfile:
     """Wrapper class for profile data"""
     def __init__(self, data):
@@ -12,63 +28,340 @@ class EEPProfile:
         self.eep = data.get('eep')
         self.title = data.get('type_title', 'Unknown')
         self.rorg = data.get('rorg_number')
+        # Datafield expressions and case dispatch built once per profile
+        self.cases = compile_cases(data)
+        self.dispatch = CaseIndex(self.cases)
+        # Read-only entity descriptors, shared by every device using this profile
+        # (non-dict objects such as "preDefined" lists are no entities)
+        self.entities = tuple(MappingProxyType({'component': 'sensor', **config, 'key': key})
+                              for key, config in data.get('objects', {}).items() if isinstance(config, dict))
 
     def get_entities(self):
-        entities = []
-        objects = self.data.get('objects', {})
-        for key, config in objects.items():
-            entity = config.copy()
-            entity['key'] = key
-            if 'component' not in entity:
-                entity['component'] = 'sensor'
-            entities.append(entity)
-        return entities
+        """Entity descriptors (read-only mappings; identical objects until the profile is reloaded)"""
+        return self.entities
+
+
+def _skip(text: str, pos: int) -> int:
+    return _whitespace.match(text, pos).end()
+
+
+def read_header(path: str) -> Optional[dict]:
+    """
+    Manifest fields of a profile file without parsing the whole definition:
+    decodes the leading top-level scalars of the first HEADER_BYTES and
+    falls back to a full json.load if they are not all there
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read(HEADER_BYTES)
+        complete = len(text) < HEADER_BYTES
+    header = {}
+    try:
+        pos = _skip(text, 0)
+        if text[pos] != '{':
+            raise ValueError("not an object")
+        pos = _skip(text, pos + 1)
+        while len(header) < len(HEADER_FIELDS) and text[pos] != '}':
+            key, pos = _decoder.raw_decode(text, pos)
+            pos = _skip(text, pos)
+            if text[pos] != ':':
+                raise ValueError("':' expected")
+            value, pos = _decoder.raw_decode(text, _skip(text, pos + 1))
+            if key in HEADER_FIELDS:
+                header[key] = value
+            pos = _skip(text, pos)
+            if text[pos] == ',':
+                pos = _skip(text, pos + 1)
+        if 'eep' in header or complete:
+            return header if 'eep' in header else None
+    except (ValueError, IndexError):
+        pass  # Header runs past the chunk (or malformed): parse everything
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or 'eep' not in data:
+        return None
+    return {key: data[key] for key in HEADER_FIELDS if key in data}
+
+
+class ManifestEntry:
+    """Where a profile lives and what list_profiles shows, without its definition"""
+
+    __slots__ = ('eep', 'path', 'mtime', 'rorg', 'func', 'type', 'title', 'source')
+
+    def __init__(self, path: str, mtime: float, header: dict, source: Optional[bundle.SourceEntry] = None):
+        self.eep = header['eep']
+        self.path = path
+        self.mtime = mtime
+        self.source = source  # Stripped, precompiled profile from the bundle (None: read the file)
+        self.rorg = header.get('rorg_number')
+        self.func = header.get('func_number')
+        self.type = header.get('type_number')
+        self.title = header.get('type_title', 'Unknown')
+
+
+class _ProfileView(Mapping):
+    """Read-only eep -> EEPProfile mapping over the manifest; loads on access"""
+
+    def __init__(self, loader: 'EEPLoader'):
+        self._loader = loader
+
+    def __getitem__(self, eep_name):
+        profile = self._loader.get_profile(eep_name)
+        if profile is None:
+            raise KeyError(eep_name)
+        return profile
+
+    def __iter__(self):
+        return iter(self._loader.manifest)
+
+    def __len__(self):
+        return len(self._loader.manifest)
+
+    def __contains__(self, eep_name):
+        return eep_name in self._loader.manifest
+
 
 class EEPLoader:
-    def __init__(self, base_paths):
+    def __init__(self, base_paths, cache_size: int = 64, bundle_path: Optional[str] = None,
+                 seed_bundle: Optional[str] = None):
         """
         base_paths: List of directories to search for EEPs (or single string)
+        cache_size: Parsed profiles kept in memory (least recently used are dropped)
+        bundle_path: Profile bundle used as cache of all definitions (see eep.bundle);
+            None reads the JSON files directly
+        seed_bundle: Prebuilt bundle to start from while bundle_path does not exist yet
         """
         if isinstance(base_paths, str):
             self.base_paths = [base_paths]
         else:
             self.base_paths = base_paths
-            
-        self.profiles = {}
+
+        self.cache_size = max(1, cache_size)
+        self.bundle_path = bundle_path
+        self.seed_bundle = seed_bundle
+        self.bundle_stats: Optional[dict] = None
+        self.manifest: Dict[str, ManifestEntry] = {}
+        # Every indexed file by (index of the base path, relative path), including overridden ones
+        self._files: Dict[Tuple[int, str], ManifestEntry] = {}
+        self._sources: Dict[Tuple[int, str], bundle.SourceEntry] = {}
+        self._cache: OrderedDict = OrderedDict()
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0, 'errors': 0, 'reloads': 0}
+        # Mapping interface kept for callers iterating all profiles (loads lazily)
+        self.profiles = _ProfileView(self)
         self.load_profiles()
 
     def load_profiles(self):
-        """Loads or reloads all JSON profiles from all configured base paths"""
-        self.profiles = {}
-        count = 0
-        
-        # Durchlaufe alle Pfade (z.B. erst /app/eep..., dann /data/eep...)
+        """Builds or rebuilds the manifest from all configured base paths; profiles are parsed on demand"""
+        if self.bundle_path:
+            self._files = self._index_bundle()
+        else:
+            self._files = self._index_files()
+
         # Spätere Definitionen überschreiben frühere -> Custom > Built-in
-        for base_path in self.base_paths:
+        manifest = {}
+        for key in sorted(self._files):
+            manifest[self._files[key].eep] = self._files[key]
+        self.manifest = manifest
+        self._cache.clear()
+        source = f" from bundle {self.bundle_path}" if self.bundle_path else ""
+        logger.info(f"Indexed total {len(self.manifest)} unique EEP profiles{source}")
+
+    def _index_files(self) -> Dict[Tuple[int, str], ManifestEntry]:
+        # Durchlaufe alle Pfade (z.B. erst /app/eep..., dann /data/eep...)
+        files = {}
+        for index, base_path in enumerate(self.base_paths):
             if not os.path.exists(base_path):
                 continue
-                
+
             logger.info(f"Scanning for EEPs in {base_path}...")
             pattern = os.path.join(base_path, '**', '*.json')
-            files = glob(pattern, recursive=True)
-            
-            for file_path in files:
+            for file_path in glob(pattern, recursive=True):
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if 'eep' in data:
-                            self.profiles[data['eep']] = EEPProfile(data)
-                            count += 1
+                    header = read_header(file_path)
+                    if header:
+                        key = (index, os.path.relpath(file_path, base_path))
+                        files[key] = ManifestEntry(file_path, os.path.getmtime(file_path), header)
                 except Exception as e:
                     logger.error(f"Error loading EEP from {file_path}: {e}")
-        
-        logger.info(f"Loaded total {len(self.profiles)} unique EEP profiles")
+        return files
 
-    def get_profile(self, eep_name):
-        return self.profiles.get(eep_name)
+    def _index_bundle(self) -> Dict[Tuple[int, str], ManifestEntry]:
+        entries, self.bundle_stats = bundle.sync(self.base_paths, self.bundle_path, self.seed_bundle)
+        logger.info(f"Profile bundle: {self.bundle_stats['compiled']} compiled, "
+                    f"{self.bundle_stats['reused'] + self.bundle_stats['rehashed']} unchanged, "
+                    f"{self.bundle_stats['removed']} removed")
+        self._sources = {entry.key: entry for entry in entries}
+        files = {}
+        for entry in entries:
+            if entry.header:
+                index, relative_path = entry.key
+                path = os.path.join(self.base_paths[index], relative_path)
+                files[entry.key] = ManifestEntry(path, entry.mtime_ns / 1e9, entry.header, entry)
+        return files
+
+    def _locate(self, path: str) -> Optional[Tuple[int, str]]:
+        """(index of the base path, relative path) of a definition file, None outside the base paths"""
+        path = os.path.abspath(path)
+        for index in reversed(range(len(self.base_paths))):
+            base_path = os.path.abspath(self.base_paths[index])
+            if os.path.commonpath([path, base_path]) == base_path:
+                return index, os.path.relpath(path, base_path)
+        return None
+
+    def upsert_file(self, path: str) -> List[str]:
+        """
+        Index (or re-index) one added or changed definition file
+
+        The profile is parsed and compiled before it replaces the previous
+        one, so a broken file keeps the old definition active.
+
+        Returns:
+            EEPs whose active profile changed (empty if the content is unchanged)
+        """
+        key = self._locate(path)
+        if key is None or not path.endswith('.json'):
+            return []
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return self.remove_file(path)
+
+        old = self._files.get(key)
+        source = self._sources.get(key)
+        if self.bundle_path and source and (source.mtime_ns, source.size) == (stat.st_mtime_ns, stat.st_size):
+            return []
+        if not self.bundle_path and old and old.mtime == stat.st_mtime:
+            return []
+
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            if self.bundle_path:
+                sha256 = hashlib.sha256(raw).hexdigest()
+                if source and source.sha256 == sha256:
+                    # Touched or copied, content unchanged
+                    source.mtime_ns, source.size = stat.st_mtime_ns, stat.st_size
+                    self._write_bundle()
+                    return []
+                source = bundle.compile_source(key, raw, sha256, stat)
+                preload(source.codes)
+                header = source.header
+                data = source.profile_data() if header else None
+                entry = ManifestEntry(path, stat.st_mtime_ns / 1e9, header, source) if header else None
+            else:
+                data = json.loads(raw.decode('utf-8'))
+                header = data if isinstance(data, dict) and 'eep' in data else None
+                entry = ManifestEntry(path, stat.st_mtime, header) if header else None
+            profile = EEPProfile(data) if header else None
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error loading EEP from {path}: {e}")
+            return []
+
+        if self.bundle_path:
+            self._sources[key] = source
+        if entry:
+            self._files[key] = entry
+        else:
+            self._files.pop(key, None)
+
+        eeps = {old.eep} if old else set()
+        if entry:
+            eeps.add(entry.eep)
+        changed = self._swap(eeps, {entry.eep: (entry, profile)} if entry else {})
+        self._write_bundle()
+        self.stats['reloads'] += 1
+        logger.info(f"Reloaded EEP definition {path}" + (f" ({', '.join(changed)})" if changed else ""))
+        return changed
+
+    def remove_file(self, path: str) -> List[str]:
+        """
+        Drop one deleted definition file; an overridden definition of the
+        same EEP (e.g. the built-in one) becomes active again
+
+        Returns:
+            EEPs whose active profile changed
+        """
+        key = self._locate(path)
+        if key is None:
+            return []
+        old = self._files.pop(key, None)
+        if self._sources.pop(key, None) is not None:
+            self._write_bundle()
+        if old is None:
+            return []
+        changed = self._swap({old.eep}, {})
+        self.stats['reloads'] += 1
+        logger.info(f"Removed EEP definition {path}" + (f" ({', '.join(changed)})" if changed else ""))
+        return changed
+
+    def _swap(self, eeps, loaded: dict) -> List[str]:
+        """Point the manifest of eeps at their highest-priority file; loaded: eep -> (entry, parsed profile)"""
+        changed = []
+        for eep in sorted(eeps):
+            key = max((key for key, entry in self._files.items() if entry.eep == eep), default=None)
+            winner = self._files[key] if key is not None else None
+            if self.manifest.get(eep) is winner:
+                continue
+            changed.append(eep)
+            self._cache.pop(eep, None)
+            if winner is None:
+                del self.manifest[eep]
+                continue
+            self.manifest[eep] = winner
+            if eep in loaded and loaded[eep][0] is winner:
+                self._store(eep, loaded[eep][1])
+        return changed
+
+    def _write_bundle(self):
+        if not self.bundle_path:
+            return
+        try:
+            bundle.write_bundle(self.bundle_path, [self._sources[key] for key in sorted(self._sources)])
+        except OSError as e:
+            logger.warning(f"Could not write profile bundle {self.bundle_path}: {e}")
+
+    def _store(self, eep_name, profile: EEPProfile):
+        self._cache[eep_name] = profile
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_profile(self, eep_name) -> Optional[EEPProfile]:
+        profile = self._cache.get(eep_name)
+        if profile is not None:
+            self._cache.move_to_end(eep_name)
+            self.stats['hits'] += 1
+            return profile
+
+        entry = self.manifest.get(eep_name)
+        if entry is None:
+            return None
+        try:
+            if entry.source is not None:
+                profile = EEPProfile(entry.source.profile_data())
+            else:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    profile = EEPProfile(json.load(f))
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error loading EEP from {entry.path}: {e}")
+            return None
+
+        self.stats['loads'] += 1
+        self._store(eep_name, profile)
+        return profile
 
     def list_profiles(self):
         result = []
-        for p in self.profiles.values():
-            result.append({'eep': p.eep, 'title': p.title, 'rorg': p.rorg})
+        for entry in self.manifest.values():
+            result.append({'eep': entry.eep, 'title': entry.title, 'rorg': entry.rorg})
         return result
+
+    def get_statistics(self) -> dict:
+        stats = dict(self.stats)
+        stats['indexed'] = len(self.manifest)
+        stats['loaded'] = len(self._cache)
+        stats['max_loaded'] = self.cache_size
+        if self.bundle_stats is not None:
+            stats['bundle'] = dict(self.bundle_stats)
+        return stats
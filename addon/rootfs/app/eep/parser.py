@@ -1,11 +1,25 @@
 import logging
 import struct
+from collections import OrderedDict
+from types import MappingProxyType
+from .compiler import compile_cases
+from .dispatch import CaseIndex
 
 logger = logging.getLogger(__name__)
 
 class EEPParser:
-    def __init__(self):
-        pass
+    def __init__(self, cache_size: int = 4096):
+        """
+        Args:
+            cache_size: Decoded payloads kept in the LRU decode cache (0 disables)
+        """
+        # Case index for profiles passed as plain dicts (EEPProfile carries its own)
+        self._dispatch = {}
+        # (eep, RORG + payload, status) -> (profile, read-only result)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._numpy_warned = False
 
     def _get_profile_data(self, profile):
         """Helper to extract dict data from profile object or dict"""
@@ -18,54 +32,141 @@ class EEPParser:
         try: return profile.__dict__
         except: return {}
 
+    def _get_dispatch(self, profile, profile_data) -> CaseIndex:
+        index = getattr(profile, 'dispatch', None)
+        if index is None:
+            key = profile_data.get('eep')
+            cached = self._dispatch.get(key)
+            if cached is None or cached[0] is not profile_data:
+                cached = (profile_data, CaseIndex(compile_cases(profile_data)))
+                self._dispatch[key] = cached
+            index = cached[1]
+        return index
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def get_cache_statistics(self) -> dict:
+        stats = dict(self.cache_stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['size'] = len(self._cache)
+        stats['max_size'] = self.cache_size
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
     def parse_telegram_with_full_data(self, data, profile):
+        """
+        Decode an ERP1 data block with an EEP profile
+
+        Returns:
+            Read-only mapping shortcut -> value (shared between identical
+            telegrams, copy before modifying), {} if no case matches, None
+            without profile
+        """
         if not profile: return None
         
         # --- FIX: Safe Data Access ---
         profile_data = self._get_profile_data(profile)
         # -----------------------------
-        
+
+        if not self.cache_size or len(data) < 6:
+            return MappingProxyType(self._decode(data, profile, profile_data))
+
+        # Sender id is not part of the key: identical payloads of different devices share an entry
+        key = (profile_data.get('eep'), bytes(data[:-5]), data[-1])
+        stats = self.cache_stats
+        entry = self._cache.get(key)
+        if entry is not None:
+            if entry[0] is profile:
+                self._cache.move_to_end(key)
+                stats['hits'] += 1
+                return entry[1]
+            # Profile object replaced by EEPLoader.load_profiles - decode again
+            stats['invalidations'] += 1
+        stats['misses'] += 1
+
+        result = MappingProxyType(self._decode(data, profile, profile_data))
+        self._cache[key] = (profile, result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            stats['evictions'] += 1
+        return result
+
+    def parse_batch(self, payloads, profile, status=None):
+        """
+        Decode many payloads of the same EEP column-wise (numpy; optional)
+
+        Args:
+            payloads: uint8 matrix, one ERP1 payload (without RORG, sender
+                and status) per row; see eep.batch.stack_telegrams. Without
+                numpy any sequence of payload bytes
+            profile: EEP profile of all rows
+            status: ERP1 status byte per row
+
+        Returns:
+            shortcut -> masked array (masked where the row has no value),
+            identical to parse_telegram_with_full_data row by row; without
+            numpy shortcut -> list (None where the row has no value); None
+            without profile
+        """
+        if not profile: return None
+        from . import batch
+        profile_data = self._get_profile_data(profile)
+        if batch.np is None:
+            if not self._numpy_warned:
+                self._numpy_warned = True
+                logger.warning("numpy is not installed, parse_batch decodes telegram by telegram "
+                               "(pip install numpy for column-wise decoding)")
+            return self._decode_rows(payloads, profile, profile_data, status)
+        return batch.decode_batch(self._get_dispatch(profile, profile_data), payloads, status)
+
+    def _decode_rows(self, payloads, profile, profile_data, status) -> dict:
+        """parse_batch without numpy: the single-telegram decoder per row"""
+        rows = []
+        for i, payload in enumerate(payloads):
+            # RORG and sender are not used for decoding
+            data = b'\x00' + bytes(payload) + bytes(4) + bytes([status[i] if status is not None else 0])
+            rows.append(self._decode(data, profile, profile_data))
+        columns = {}
+        for i, row in enumerate(rows):
+            for shortcut, value in row.items():
+                columns.setdefault(shortcut, [None] * len(rows))[i] = value
+        return columns
+
+    def _decode(self, data, profile, profile_data) -> dict:
         rorg = data[0]
         eep_name = profile_data.get('eep', 'Unknown')
-        logger.info(f"📊 Parsing telegram with profile {eep_name}")
+        logger.debug(f"📊 Parsing telegram with profile {eep_name}")
         
-        matched_case = None
-        raw_val = 0
         status_byte = data[-1]
         
-        if rorg == 0xF6:
-            raw_val = data[1]
-            logger.info(f"RPS (F6) Data Byte: {hex(raw_val)}")
-        elif rorg == 0xD5:
-            raw_val = data[1]
-            logger.info(f"1BS (D5) Data Byte: {hex(raw_val)}")
-        else:
-            raw_val = int.from_bytes(data[1:5], 'big')
-            logger.info(f"4BS (A5) Data Bytes: {data[1:5].hex()}")
-
-        for case in profile_data.get('case', []):
-            match = True
-            if 'data' in case:
-                if int(case['data'], 16) != raw_val: match = False
-            if match and 'status' in case:
-                if int(case['status'], 16) != status_byte: match = False
-            if match:
-                matched_case = case
-                break
-        
-        if not matched_case:
-            logger.info(f"No matching case found for Data={hex(raw_val)}")
+        # ERP1 data: RORG | payload (1 byte RPS/1BS, 4 bytes 4BS, 1-14 bytes VLD) | sender (4) | status
+        payload = data[1:-5] if len(data) > 6 else data[1:]
+        width = len(payload) * 8
+        raw_val = int.from_bytes(payload, 'big')
+        logger.debug(f"{hex(rorg)} payload: {payload.hex()}")
+
+        # Receive cases selected by their condition bits (several may apply, e.g. A5-09-07)
+        matched_cases = self._get_dispatch(profile, profile_data).match(raw_val, width, status_byte)
+        if not matched_cases:
+            logger.debug(f"No matching case found for Data={hex(raw_val)}")
             return {}
 
         result = {}
-        for field in matched_case.get('datafield', []):
-            shortcut = field.get('shortcut')
-            value = field.get('value')
-            if shortcut and value is not None:
+        for case in matched_cases:
+            # One payload integer, then one shift and mask per field
+            for field, shift, mask, shift2, mask2 in case.plan(width):
+                if field.shortcut in result:
+                    continue  # Earlier case wins
+                value = (raw_val >> shift) & mask if mask else None
+                value2 = (raw_val >> shift2) & mask2 if mask2 else None
                 try:
-                    if "." in str(value): result[shortcut] = float(value)
-                    else: result[shortcut] = int(value)
-                except: result[shortcut] = value
+                    if field.condition and not field.condition(value, value2):
+                        continue
+                    result[field.shortcut] = field.decode(value, value2)
+                except (TypeError, ZeroDivisionError) as e:
+                    logger.debug(f"Could not decode {field.shortcut} of {eep_name}: {e}")
 
-        logger.info(f"Parsed result: {result}")
+        logger.debug(f"Parsed result: {result}")
         return result
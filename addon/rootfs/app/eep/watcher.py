@@ -0,0 +1,227 @@
+"""
+EEP Profile Watcher
+Reports added, changed and deleted definition files (*.json) below a
+directory, e.g. profiles provisioned to /data/eep or copied there by hand.
+Uses inotify on Linux (no polling, the event loop wakes on the change) and
+falls back to comparing mtime and size every poll_interval seconds where
+inotify is unavailable. Changes are collected for `debounce` seconds and
+then handed to the callback in one batch.
+"""
+import asyncio
+import ctypes
+import logging
+import os
+import struct
+from glob import glob
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+# IN_MODIFY is not watched: files are reported once they are closed (IN_CLOSE_WRITE)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (name follows, NUL padded)
+
+
+class _Inotify:
+    """Minimal ctypes binding (the image has no inotify package)"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), path)
+        return wd
+
+    def read(self):
+        """(wd, mask, name) of all queued events"""
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            pos = 0
+            while pos < len(buffer):
+                wd, mask, _, length = _EVENT.unpack_from(buffer, pos)
+                pos += _EVENT.size
+                name = buffer[pos:pos + length].rstrip(b'\0')
+                pos += length
+                yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ProfileWatcher:
+    """Watches a definition directory and reports changed files in batches"""
+
+    def __init__(self, directory: str, on_change: Callable[[Set[str]], Awaitable[None]],
+                 poll_interval: float = 5.0, debounce: float = 0.5):
+        """
+        Args:
+            directory: Directory to watch (created if missing), including subdirectories
+            on_change: async function(paths) with the added, changed or deleted files
+            poll_interval: Seconds between scans without inotify
+            debounce: Seconds to wait for further changes before reporting
+        """
+        self.directory = directory
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.mode = None  # 'inotify' or 'polling' once started
+        self.stats = {'batches': 0, 'files': 0, 'overflows': 0, 'errors': 0}
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, str] = {}
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self._pending: Set[str] = set()
+        self._flush_handle = None
+        self._poll_task = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        """Start watching (requires a running event loop)"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._snapshot = self._scan()
+        try:
+            self._inotify = _Inotify()
+            self._watch_tree(self.directory)
+            asyncio.get_running_loop().add_reader(self._inotify.fd, self._on_readable)
+            self.mode = 'inotify'
+        except (OSError, AttributeError) as e:
+            # No inotify (non-Linux libc, limits reached): scan periodically
+            if self._inotify:
+                self._inotify.close()
+                self._inotify = None
+            self._watches.clear()
+            logger.debug(f"inotify unavailable ({e}), polling {self.directory}")
+            self._poll_task = asyncio.create_task(self._poll_loop())
+            self.mode = 'polling'
+        logger.info(f"✓ Watching {self.directory} for EEP profile changes ({self.mode})")
+
+    def stop(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        if self._poll_task:
+            self._poll_task.cancel()
+        if self._inotify:
+            try:
+                asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            except RuntimeError:
+                pass
+            self._inotify.close()
+            self._inotify = None
+        logger.info("EEP profile watcher stopped")
+
+    def get_statistics(self) -> dict:
+        stats = dict(self.stats)
+        stats['mode'] = self.mode
+        stats['files_watched'] = len(self._snapshot)
+        return stats
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in glob(os.path.join(self.directory, '**', '*.json'), recursive=True):
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        return snapshot
+
+    def _watch_tree(self, directory: str):
+        for root, _, _ in os.walk(directory):
+            self._watches[self._inotify.add_watch(root)] = root
+
+    def _on_readable(self):
+        rescan = False
+        for wd, mask, name in self._inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                self.stats['overflows'] += 1
+                rescan = True
+                continue
+            directory = self._watches.get(wd)
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # New subdirectory: watch it and report what was moved in with it
+                    try:
+                        self._watch_tree(path)
+                    except OSError as e:
+                        logger.warning(f"Cannot watch {path}: {e}")
+                rescan = True
+            elif name.endswith('.json') and not mask & IN_CREATE:
+                # IN_CREATE is followed by IN_CLOSE_WRITE once the file is written
+                self._pending.add(path)
+        if rescan:
+            self._diff()
+        self._schedule()
+
+    def _diff(self):
+        """Compare with the last scan (polling, queue overflow, moved directories)"""
+        snapshot = self._scan()
+        for path in snapshot.keys() | self._snapshot.keys():
+            if snapshot.get(path) != self._snapshot.get(path):
+                self._pending.add(path)
+        self._snapshot = snapshot
+
+    def _schedule(self):
+        if not self._pending:
+            return
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(self.debounce, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        paths, self._pending = self._pending, set()
+        asyncio.create_task(self._report(paths))
+
+    async def _report(self, paths: Set[str]):
+        async with self._lock:
+            if self.mode == 'inotify':
+                # Keep the snapshot current for a later overflow rescan
+                for path in paths:
+                    try:
+                        stat = os.stat(path)
+                        self._snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        self._snapshot.pop(path, None)
+            self.stats['batches'] += 1
+            self.stats['files'] += len(paths)
+            try:
+                await self.on_change(paths)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error reloading EEP profiles {sorted(paths)}: {e}", exc_info=True)
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self._diff()
+                self._schedule()
+            except Exception as e:
+                logger.error(f"Error scanning {self.directory}: {e}")
@@ -17,15 +17,21 @@ if BASE_PATH not in sys.path:
 # FIX: Persistent Storage Path definition
 DATA_PATH = '/data'
 
-from core.serial_handler import SerialHandler
+from core.gateway_manager import GatewayManager
+from core.serial_handler import COALESCED
 from core.esp3_protocol import ESP3Packet
 from core.mqtt_handler import MQTTHandler
 from core.device_manager import DeviceManager
 from core.state_persistence import StatePersistence
+from core.discovery_store import DiscoveryStore
+from core.ha_replay import HAReplay
 from core.command_translator import CommandTranslator
 from core.command_tracker import CommandTracker
+from core.duplicate_filter import DuplicateFilter
+from core.capture import CaptureWriter
 from eep.loader import EEPLoader
 from eep.parser import EEPParser
+from eep.watcher import ProfileWatcher
 from service_state import service_state
 import uvicorn
 from web_ui.app import app as web_app
@@ -41,14 +47,19 @@ logger = logging.getLogger(__name__)
 
 class EnOceanMQTTService:
     def __init__(self):
-        self.serial_handler = None
+        self.serial_handler = None  # Primary gateway (status display)
+        self.gateways = None
         self.mqtt_handler = None
         self.device_manager = None
         self.state_persistence = None
         self.eep_loader = None
         self.eep_parser = None
+        self.profile_watcher = None
+        self.ha_replay = None
         self.command_translator = None
         self.command_tracker = None
+        self.duplicate_filter = None
+        self.capture_writer = None
         self.running = False
         self.discovery_end_time = None
         
@@ -62,6 +73,13 @@ class EnOceanMQTTService:
         self.restore_state = os.getenv('RESTORE_STATE', 'true').lower() == 'true'
         self.restore_delay = int(os.getenv('RESTORE_DELAY', 5))
         self.provisioning_url = os.getenv('PROVISIONING_URL', 'https://prov.busser.io')
+        self.tx_duty_cycle = float(os.getenv('TX_DUTY_CYCLE_PERCENT', 1.0)) / 100.0
+        self.duplicate_window = float(os.getenv('DUPLICATE_WINDOW', 0.5))
+        self.route_by_rssi = os.getenv('ROUTE_BY_RSSI', 'false').lower() == 'true'
+        self.capture_dir = os.getenv('CAPTURE_DIR', '')
+        self.device_discovery = os.getenv('DEVICE_DISCOVERY', 'false').lower() == 'true'
+        self.ha_replay_rate = float(os.getenv('HA_REPLAY_RATE', 50))
+        self.ha_replay_concurrency = int(os.getenv('HA_REPLAY_CONCURRENCY', 4))
 
     # --- Discovery Methods ---
     def start_discovery(self, duration_seconds=60):
@@ -109,10 +127,12 @@ class EnOceanMQTTService:
                         os.makedirs(path, exist_ok=True)
                         
                         filename = f"{filename_hint}.json"
-                        with open(os.path.join(path, filename), 'w') as f:
+                        file_path = os.path.join(path, filename)
+                        with open(file_path, 'w') as f:
                             json.dump(data, f, indent=2)
                         
-                        self.eep_loader.load_profiles() 
+                        # Only this file is compiled and swapped in (the watcher then sees it unchanged)
+                        await self.on_profiles_changed({file_path})
                         logger.info(f"✅ Profile loaded to persistent storage. Internal Name: {real_eep_name}")
                         return real_eep_name
                     else:
@@ -121,6 +141,23 @@ class EnOceanMQTTService:
             logger.error(f"Download failed: {e}")
         return None
 
+    async def on_profiles_changed(self, paths):
+        """Reload changed definition files and republish discovery of the devices using them"""
+        eeps = set()
+        for path in sorted(paths):
+            if os.path.exists(path):
+                eeps.update(self.eep_loader.upsert_file(path))
+            else:
+                eeps.update(self.eep_loader.remove_file(path))
+        if not eeps:
+            return
+        service_state.update_status('eep_profiles', len(self.eep_loader.profiles))
+        if not self.device_manager:
+            return
+        for device in self.device_manager.list_devices():
+            if device.get('enabled') and device.get('eep') in eeps:
+                await self.publish_device_discovery(device)
+
     async def check_cloud_provisioning(self, device_id):
         if not self.provisioning_url: return None
         import aiohttp
@@ -149,24 +186,36 @@ class EnOceanMQTTService:
         eep_path_custom = os.path.join(DATA_PATH, 'eep')
         
         # FIX: Loader mit beiden Pfaden initialisieren
-        self.eep_loader = EEPLoader([eep_path_builtin, eep_path_custom])
+        # Bundle: stripped, precompiled profiles in one file, rebuilt only for changed definitions
+        self.eep_loader = EEPLoader([eep_path_builtin, eep_path_custom],
+                                    bundle_path=os.path.join(DATA_PATH, 'eep_profiles.bundle'),
+                                    seed_bundle=os.path.join(BASE_PATH, 'eep', 'definitions.bundle'))
         self.eep_parser = EEPParser() 
         service_state.update_status('eep_profiles', len(self.eep_loader.profiles))
         logger.info(f"✓ EEP Loader initialized (Custom Path: {eep_path_custom})")
 
-        # 2. Connection
-        if self.serial_port:
-            logger.info(f"Initializing connection to: {self.serial_port}")
+        # 2. Connection(s) - SERIAL_PORT may list several gateways, comma separated
+        connection_strings = [c.strip() for c in self.serial_port.split(',') if c.strip()]
+        if connection_strings:
+            logger.info(f"Initializing connection to: {', '.join(connection_strings)}")
             try:
-                self.serial_handler = SerialHandler(self.serial_port)
-                if self.serial_handler.open():
-                    logger.info("✓ Transceiver connection established")
+                self.gateways = GatewayManager(connection_strings, duty_cycle=self.tx_duty_cycle,
+                                               route_by_rssi=self.route_by_rssi)
+                self.serial_handler = self.gateways.primary
+                if self.capture_dir:
+                    self.capture_writer = CaptureWriter(self.capture_dir)
+                    for handler in self.gateways.handlers.values():
+                        handler.start_recording(self.capture_writer)
+                connected = await self.gateways.open()
+                if connected:
+                    logger.info(f"✓ Transceiver connection established ({connected}/{len(connection_strings)} gateways)")
                     service_state.update_status('gateway_connected', True)
                 else:
                     logger.warning("⚠️ Connection failed. Will retry...")
                     service_state.update_status('gateway_connected', False)
             except Exception as e:
                 logger.error(f"Error initializing handler: {e}")
+                self.gateways = None
                 self.serial_handler = None
         else:
             logger.warning("No connection string configured")
@@ -178,11 +227,15 @@ class EnOceanMQTTService:
         self.state_persistence = StatePersistence() # StatePersistence nutzt intern meist eh schon default paths, aber ist hier ok.
         self.command_translator = CommandTranslator(self.eep_loader)
         self.command_tracker = CommandTracker()
+        self.duplicate_filter = DuplicateFilter(window=self.duplicate_window)
         self.command_tracker.set_confirmation_callback(self.on_command_confirmed)
         self.command_tracker.start()
 
         # 4. MQTT
         self.mqtt_handler = MQTTHandler(self.mqtt_host, self.mqtt_port, self.mqtt_user, self.mqtt_password)
+        self.mqtt_handler.discovery_store = DiscoveryStore(os.path.join(DATA_PATH, 'discovery_hashes.json'))
+        self.mqtt_handler.device_discovery = self.device_discovery
+        self.mqtt_handler.discovery_origin['sw_version'] = self.addon_version
         if self.mqtt_handler.connect():
             await asyncio.sleep(1)
             if self.mqtt_handler.connected:
@@ -190,41 +243,104 @@ class EnOceanMQTTService:
                 service_state.update_status('mqtt_connected', True)
                 self.mqtt_handler.event_loop = asyncio.get_event_loop()
                 self.mqtt_handler.subscribe_commands(self.handle_command)
+                self.mqtt_handler.reconnect_callback = self.sync_discovery
                 
-                # Discovery for existing devices
-                for device in self.device_manager.list_devices():
-                    if device.get('enabled') and device.get('eep') != 'pending':
-                        await self.publish_device_discovery(device)
+                # Discovery for existing devices (only new or changed configs)
+                await self.sync_discovery()
+
+                # HA restarts: replay discovery and states, paced
+                self.ha_replay = HAReplay(rate=self.ha_replay_rate, concurrency=self.ha_replay_concurrency)
+                self.mqtt_handler.subscribe_ha_status(self.on_ha_online)
             else:
                 service_state.update_status('mqtt_connected', False)
         
         return True
 
     # --- Core Logic ---
-    async def publish_device_discovery(self, device: dict):
-        if device.get('eep') == 'pending': return
+    async def publish_device_discovery(self, device: dict, save: bool = True):
+        """
+        Publish the discovery configs of a device (unchanged ones are skipped)
+
+        Returns:
+            Discovery topics of the device, None if nothing could be published
+        """
+        if device.get('eep') == 'pending': return None
         try:
-            profile = self.eep_loader.get_profile(device['eep'])
-            if not profile: return
-            is_controllable = self.command_translator.is_controllable(device['eep'])
+            components = self.discovery_components(device)
+            if components is None: return None
             
             if self.mqtt_handler and self.mqtt_handler.connected:
-                self.mqtt_handler.client.publish(f"enocean/{device['id']}/state", "", qos=1, retain=True)
-                self.mqtt_handler.client.publish(f"enocean/{device['id']}/availability", "", qos=1, retain=True)
-                await asyncio.sleep(0.1)
-                
-                entities = profile.get_entities()
-                for entity in entities:
-                    entity_controllable = is_controllable
-                    if entity.get('component', 'sensor') in ['sensor', 'binary_sensor']:
-                        entity_controllable = False
-                    self.mqtt_handler.publish_discovery(device, entity, entity_controllable)
+                topics = self.mqtt_handler.publish_device_discovery(device, components)
                 self.mqtt_handler.publish_availability(device['id'], True)
+                if save and self.mqtt_handler.discovery_store:
+                    self.mqtt_handler.discovery_store.save()
+                return topics
         except Exception as e:
             logger.error(f"Error publishing discovery: {e}")
+        return None
+
+    def discovery_components(self, device: dict):
+        """(entity descriptor, controllable) pairs of a device, None without profile"""
+        profile = self.eep_loader.get_profile(device['eep'])
+        if not profile: return None
+        is_controllable = self.command_translator.is_controllable(device['eep'])
+        components = []
+        for entity in profile.get_entities():
+            entity_controllable = is_controllable
+            if entity.get('component', 'sensor') in ['sensor', 'binary_sensor']:
+                entity_controllable = False
+            components.append((entity, entity_controllable))
+        return components
+
+    async def on_ha_online(self):
+        """HA birth message: replay configs, availability and last states, most recently active devices first"""
+        saved = self.state_persistence.states if self.state_persistence else {}
+        devices = [d for d in self.device_manager.list_devices()
+                   if d.get('enabled') and d.get('eep') != 'pending']
+        # saved_at (UTC) of the last state, then last_seen for devices without saved state
+        devices.sort(key=lambda d: (saved.get(d['id'], {}).get('saved_at', ''), d.get('last_seen', '')), reverse=True)
+
+        batches = []
+        for device in devices:
+            try:
+                components = self.discovery_components(device)
+                if components is None: continue
+                state = saved.get(device['id'], {}).get('state')
+                batches.append(self.mqtt_handler.device_messages(device, components, state))
+            except Exception as e:
+                logger.error(f"Error preparing replay for {device.get('id')}: {e}")
+        self.ha_replay.trigger(batches, self.mqtt_handler.publish_retained)
+
+    async def sync_discovery(self):
+        """Bring the retained discovery configs in line with the enabled devices"""
+        store = self.mqtt_handler.discovery_store
+        before = dict(store.stats)
+        # The hashes only say what was published, not what the broker still retains
+        await self.mqtt_handler.revalidate_discovery()
+        current, keep = set(), set()
+        for device in self.device_manager.list_devices():
+            topics = None
+            if device.get('enabled') and device.get('eep') != 'pending':
+                topics = await self.publish_device_discovery(device, save=False)
+            if topics is None:
+                # Disabled, pending or profile missing: leave its configs alone
+                keep.add(device['id'])
+            else:
+                current.update(topics)
+
+        self.mqtt_handler.remove_discovery(store.stale(current, keep))
+        store.save()
+        counts = {key: store.stats[key] - before[key] for key in store.stats}
+        service_state.update_status('discovery_sync', counts)
+        logger.info(f"✓ Discovery: {counts['updated']} configs published, {counts['skipped']} unchanged, "
+                    f"{counts['removed']} stale removed, {counts['invalidated']} lost or changed on the broker")
 
     async def process_telegram(self, packet: ESP3Packet):
         try:
+            # Repeated copies (repeaters, subtelegrams) are dropped before any decoding
+            if self.duplicate_filter and self.duplicate_filter.is_duplicate(packet):
+                return
+
             sender_id = packet.get_sender_id()
             rorg = packet.get_rorg()
             rssi = packet.get_rssi()
@@ -288,10 +404,11 @@ class EnOceanMQTTService:
                 # logger.warning(f"Profile {device['eep']} not found!")
                 return
             
-            parsed_data = self.eep_parser.parse_telegram_with_full_data(packet.data, profile)
+            decoded = self.eep_parser.parse_telegram_with_full_data(packet.data, profile)
 
-            if parsed_data:
+            if decoded:
                 from datetime import datetime, timezone
+                parsed_data = dict(decoded)  # Cached result is read-only
                 parsed_data['rssi'] = rssi
                 parsed_data['last_seen'] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
                 
@@ -320,7 +437,7 @@ class EnOceanMQTTService:
         Verarbeitet eingehende MQTT-Befehle und sendet sie an das EnOcean-Gerät.
         """
         try:
-            if not self.serial_handler:
+            if not self.gateways:
                 logger.warning("Kein Serial-Handler aktiv – Befehl kann nicht gesendet werden.")
                 return
 
@@ -341,14 +458,20 @@ class EnOceanMQTTService:
                 # 2. Senden des Telegramms (Bi-Di)
                 if cmd_type == 'telegram':
                     # arg1 = RORG, arg2 = Data Bytes
-                    success = await self.serial_handler.send_telegram(device_id, arg1, arg2)
+                    # Latest-wins per device+entity (e.g. dimmer slider bursts)
+                    success = await self.gateways.send_telegram(device_id, arg1, arg2, gateway=device.get('gateway'),
+                                                                coalesce_key=(device_id, entity))
                 
                 elif cmd_type == 'rps':
                     # arg1 = Button Code, arg2 = Bytes (leer)
-                    success = await self.serial_handler.send_rps_command(device_id, arg1)
+                    success = await self.gateways.send_rps_command(device_id, arg1, gateway=device.get('gateway'),
+                                                                   coalesce_key=(device_id, entity))
 
                 # 3. Tracking & Optimistisches Update
-                if success:
+                if success is COALESCED:
+                    # Durch neueren Befehl für dieselbe Entität ersetzt - nie gesendet
+                    logger.info(f"↪️ Befehl an {device_id}/{entity} durch neueren ersetzt")
+                elif success:
                     logger.info(f"✅ Befehl erfolgreich an {device_id} gesendet!")
                     
                     # Erwarteten Status für den CommandTracker berechnen
@@ -381,8 +504,8 @@ class EnOceanMQTTService:
             logger.error(f"❌ Fehler bei Befehlsverarbeitung: {e}", exc_info=True)
 
     async def run_serial_reader(self):
-        if self.serial_handler:
-            try: await self.serial_handler.start_reading(self.process_telegram)
+        if self.gateways:
+            try: await self.gateways.start_reading(self.process_telegram)
             except: pass
 
     async def run_web_server(self):
@@ -403,13 +526,21 @@ class EnOceanMQTTService:
             try: loop.add_signal_handler(sig, lambda: stop_event.set())
             except: pass
         tasks.append(asyncio.create_task(stop_event.wait()))
-        if self.serial_handler: tasks.append(asyncio.create_task(self.run_serial_reader()))
+        if self.gateways: tasks.append(asyncio.create_task(self.run_serial_reader()))
+        # Custom profiles (provisioned or copied to /data/eep) are reloaded one file at a time
+        self.profile_watcher = ProfileWatcher(os.path.join(DATA_PATH, 'eep'), self.on_profiles_changed)
+        try: self.profile_watcher.start()
+        except Exception as e: logger.warning(f"EEP profile watcher not started: {e}")
         await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
         service_state.update_status('status', 'stopping')
         self.running = False
-        if self.serial_handler: 
-            self.serial_handler.stop_reading()
-            self.serial_handler.close()
+        self.profile_watcher.stop()
+        if self.ha_replay:
+            self.ha_replay.stop()
+        if self.gateways: 
+            self.gateways.close()
+        if self.capture_writer:
+            self.capture_writer.close()
 
 async def main():
     service = EnOceanMQTTService()
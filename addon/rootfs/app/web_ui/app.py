@@ -42,6 +42,7 @@ async def api_status(request):
         if service.mqtt_handler:
             status['mqtt_info']['connected'] = service.mqtt_handler.connected
             status['mqtt_info']['client_id'] = getattr(service.mqtt_handler, 'client_id', 'Unknown')
+            status['mqtt_info']['discovery_cache'] = dict(getattr(service.mqtt_handler, 'discovery_stats', {}))
 
         # --- Gateway Info (FIXED LOGIC) ---
         
@@ -79,6 +80,31 @@ async def api_status(request):
             # Version Info
             if hasattr(service.serial_handler, 'version_info') and service.serial_handler.version_info:
                 status['gateway_info']['version'] = str(service.serial_handler.version_info)
+
+            # Framer Statistics (resyncs, CRC failures, discarded bytes)
+            if hasattr(service.serial_handler, 'get_statistics'):
+                status['gateway_info']['statistics'] = service.serial_handler.get_statistics()
+
+        if getattr(service, 'duplicate_filter', None):
+            status['duplicates'] = service.duplicate_filter.get_statistics()
+
+        # EEP decode cache (hit rate, evictions)
+        if getattr(service, 'eep_parser', None):
+            status['decode_cache'] = service.eep_parser.get_cache_statistics()
+
+        # EEP profiles: indexed vs. parsed (lazy loading)
+        if getattr(service, 'eep_loader', None):
+            status['eep_loader'] = service.eep_loader.get_statistics()
+        if getattr(service, 'profile_watcher', None):
+            status['eep_watcher'] = service.profile_watcher.get_statistics()
+
+        # Replay after HA birth messages
+        if getattr(service, 'ha_replay', None):
+            status['ha_replay'] = service.ha_replay.get_statistics()
+
+        # All gateways (multi-gateway setups) with per-gateway statistics
+        if getattr(service, 'gateways', None):
+            status['gateways'] = service.gateways.get_statistics()
     else:
         status['discovery_active'] = False
         status['discovery_remaining'] = 0
@@ -17,6 +17,14 @@ else
     SERIAL_PORT="/dev/ttyUSB0"
 fi
 
+# Additional gateways (multi-gateway setups): appended comma separated
+if bashio::config.has_value 'additional_gateways'; then
+    for GATEWAY in $(bashio::config 'additional_gateways'); do
+        bashio::log.info "Configuration: Additional gateway ${GATEWAY}"
+        SERIAL_PORT="${SERIAL_PORT},${GATEWAY}"
+    done
+fi
+
 LOG_LEVEL=$(bashio::config 'log_level')
 
 # --- Version automatisch holen ---
@@ -38,6 +46,15 @@ export MQTT_PASSWORD=$(bashio::services mqtt "password")
 export RESTORE_STATE=$(bashio::config 'restore_state')
 export RESTORE_DELAY=$(bashio::config 'restore_delay')
 export PROVISIONING_URL=$(bashio::config 'provisioning_url')
+export TX_DUTY_CYCLE_PERCENT=$(bashio::config 'tx_duty_cycle_percent' '1.0')
+export DUPLICATE_WINDOW=$(bashio::config 'duplicate_window' '0.5')
+export ROUTE_BY_RSSI=$(bashio::config 'route_by_rssi' 'false')
+export DEVICE_DISCOVERY=$(bashio::config 'device_discovery' 'false')
+export HA_REPLAY_RATE=$(bashio::config 'ha_replay_rate' '50')
+export HA_REPLAY_CONCURRENCY=$(bashio::config 'ha_replay_concurrency' '4')
+if bashio::config.true 'capture'; then
+    export CAPTURE_DIR="/share/enocean-mqtt/captures"
+fi
 
 bashio::log.info "Starting EnOcean MQTT..."
 cd /app
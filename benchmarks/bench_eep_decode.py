@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Throughput Benchmark: EEP decoding per family
+Decodes synthetic telegrams (from the gateway simulator) for every bundled
+EEP family with EEPParser and reports decodes/second. The same telegrams
+are also decoded by walking the expression trees with the reference
+interpreter (eep.compiler.evaluate) to show the gain of compiled
+expressions.
+
+Usage: python3 benchmarks/bench_eep_decode.py [--telegrams 2000] [--families A5-02,F6]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import types
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+from eep.compiler import _interpreted, compile_cases  # noqa: E402
+from eep.dispatch import CaseIndex  # noqa: E402
+from eep.loader import EEPLoader  # noqa: E402
+from eep.parser import EEPParser  # noqa: E402
+from gateway_simulator import DEFINITIONS_PATH, GatewaySimulator  # noqa: E402
+
+
+def make_telegrams(loader, family: str, count: int):
+    """(data, profile) pairs for all profiles of a family"""
+    sim = GatewaySimulator(devices=len([e for e in loader.profiles if e.startswith(family)]),
+                           families=[family], seed=1)
+    telegrams = []
+    for i in range(count):
+        device = sim.devices[i % len(sim.devices)]
+        packet = ESP3Packet.from_frame(sim.build_frame(device))
+        telegrams.append((packet.data, loader.get_profile(device.eep)))
+    return telegrams
+
+
+def interpreted_profile(profile):
+    """Same profile, but every expression evaluated by walking its tree"""
+    cases = compile_cases(profile.data)
+    for case in cases:
+        for field in case.fields:
+            source = field.source
+            if isinstance(source.get('value'), dict):
+                field.decode = _interpreted(source['value'], source.get('decimals'))
+            if isinstance(source.get('condition'), dict):
+                field.condition = _interpreted(source['condition'])
+    return types.SimpleNamespace(data=profile.data, eep=profile.eep, cases=cases, dispatch=CaseIndex(cases))
+
+
+def rate(fn, telegrams) -> float:
+    start = time.perf_counter()
+    for data, profile in telegrams:
+        fn(data, profile)
+    return len(telegrams) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--telegrams', type=int, default=2000, help='telegrams per family')
+    parser.add_argument('--families', default='', help='comma separated family prefixes (default: all)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    loader = EEPLoader(DEFINITIONS_PATH)
+    eep_parser = EEPParser(cache_size=0)  # Measure decoding, not the decode cache
+    families = [f.strip() for f in args.families.split(',') if f.strip()]
+    if not families:
+        families = sorted({eep[:5] for eep in loader.profiles})
+
+    print(f"{'family':8} {'profiles':>8} {'compiled/s':>12} {'tree walk/s':>12} {'speedup':>8}")
+    for family in families:
+        try:
+            telegrams = make_telegrams(loader, family, args.telegrams)
+        except ValueError:
+            continue
+        interpreted = {}
+        for _, profile in telegrams:
+            if profile.eep not in interpreted:
+                interpreted[profile.eep] = interpreted_profile(profile)
+        compiled = rate(eep_parser.parse_telegram_with_full_data, telegrams)
+        walked = rate(eep_parser.parse_telegram_with_full_data,
+                      [(data, interpreted[profile.eep]) for data, profile in telegrams])
+        profiles = len({profile.eep for _, profile in telegrams})
+        print(f"{family:8} {profiles:8d} {compiled:12.0f} {walked:12.0f} {compiled / walked:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
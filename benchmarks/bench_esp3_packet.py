@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Memory/Allocation Benchmark: ESP3Packet representation
+Compares the former dict-backed packet (several bytes slices, derived
+fields recomputed on every call) with the slotted, lazily-decoded packet
+at a simulated load of 1000 telegrams per second.
+
+Usage: python3 benchmarks/bench_esp3_packet.py [--rate 1000] [--seconds 10]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+from core.crc8 import crc8  # noqa: E402
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+
+
+class LegacyESP3Packet:
+    """Replica of the previous representation (plain attributes, bytes slices)"""
+
+    def __init__(self, raw_data: bytes):
+        self.sync = raw_data[0]
+        self.data_length = int.from_bytes(raw_data[1:3], 'big')
+        self.optional_length = raw_data[3]
+        self.packet_type = raw_data[4]
+        if crc8(raw_data[1:5]) != raw_data[5]:
+            raise ValueError("Header CRC mismatch")
+        data_end = 6 + self.data_length
+        optional_end = data_end + self.optional_length
+        self.data = raw_data[6:data_end]
+        self.optional_data = raw_data[data_end:optional_end]
+        if crc8(self.data + self.optional_data) != raw_data[optional_end]:
+            raise ValueError("Data CRC mismatch")
+
+    def get_sender_id(self):
+        if self.packet_type == 0x01 and len(self.data) >= 6:
+            return self.data[-5:-1].hex()
+        return None
+
+    def get_rorg(self):
+        if self.packet_type == 0x01 and len(self.data) >= 1:
+            return self.data[0]
+        return None
+
+    def get_rssi(self):
+        if len(self.optional_data) >= 6:
+            return -self.optional_data[5]
+        return None
+
+
+def make_frames(count: int):
+    frames = []
+    for i in range(count):
+        sender = f"{0x01800000 + (i % 500):08x}"
+        packet = ESP3Packet.create_4bs_packet(sender, 'ffffffff', i & 0xFF, 0x55, 0x10, 0x08)
+        # Received telegrams carry a real dBm value
+        data = packet.data
+        optional = bytes([0x01]) + bytes.fromhex('ffffffff') + bytes([0x40 + (i % 40), 0x00])
+        frames.append(ESP3Packet.from_parts(ESP3Packet.PACKET_TYPE_RADIO_ERP1, data, optional).build())
+    return frames
+
+
+def consume(packet):
+    # Access pattern of main.process_telegram + one __repr__ style access
+    packet.get_sender_id()
+    packet.get_rorg()
+    packet.get_rssi()
+    packet.get_sender_id()
+    packet.get_rorg()
+
+
+def run(label, factory, frames, keep):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    window = []
+    for frame in frames:
+        packet = factory(frame)
+        consume(packet)
+        window.append(packet)
+        if len(window) > keep:
+            window.pop(0)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_packet_us = elapsed / len(frames) * 1e6
+    print(f"{label:<28} {per_packet_us:8.2f} µs/telegram   peak {peak / 1024:8.1f} KiB   "
+          f"retained {current / 1024:8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=1000, help='telegrams per second')
+    parser.add_argument('--seconds', type=int, default=10, help='simulated duration')
+    parser.add_argument('--window', type=int, default=100, help='packets alive at the same time')
+    args = parser.parse_args()
+
+    frames = make_frames(args.rate * args.seconds)
+    print(f"{len(frames)} telegrams ({args.rate}/s for {args.seconds}s), {args.window} alive at once\n")
+
+    run("legacy (dict + slices)", LegacyESP3Packet, frames, args.window)
+    run("slotted ESP3Packet", ESP3Packet.from_frame, frames, args.window)
+
+    legacy = LegacyESP3Packet(frames[0])
+    slotted = ESP3Packet.from_frame(frames[0])
+    legacy_size = sys.getsizeof(legacy) + sys.getsizeof(legacy.__dict__) + sys.getsizeof(legacy.data) + sys.getsizeof(legacy.optional_data)
+    slotted_size = sys.getsizeof(slotted) + sys.getsizeof(slotted.raw)
+    print(f"per-instance size: legacy {legacy_size} B, slotted {slotted_size} B")
+
+
+if __name__ == '__main__':
+    main()
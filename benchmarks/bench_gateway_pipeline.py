@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Throughput/Latency Benchmark: simulated gateway -> SerialHandler -> EEP parser
+Starts the synthetic gateway simulator in-process, connects a SerialHandler
+to it via tcp://127.0.0.1 and decodes every received telegram with the
+device's EEP profile (the MQTT publish is not part of the measurement).
+Reports received telegrams/s and the latency from the simulator writing a
+frame to the bridge finishing its decode.
+
+Usage: python3 benchmarks/bench_gateway_pipeline.py [--devices 2000] [--interval 1]
+           [--duration 10] [--families A5,F6] [--corrupt 0.01]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import types
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+# TCP mode does not touch pyserial; allow running without it installed
+try:
+    import serial  # noqa: F401
+except ImportError:
+    sys.modules['serial'] = types.ModuleType('serial')
+
+from core.serial_handler import SerialHandler  # noqa: E402
+from eep.loader import EEPLoader  # noqa: E402
+from eep.parser import EEPParser  # noqa: E402
+from gateway_simulator import DEFINITIONS_PATH, GatewaySimulator  # noqa: E402
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=1.0, help="mean seconds between telegrams per device")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--families', default='', help="comma separated EEP prefixes, e.g. A5-02,F6")
+    parser.add_argument('--corrupt', type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    families = [f.strip() for f in args.families.split(',') if f.strip()]
+    sim = GatewaySimulator(devices=args.devices, interval=args.interval, families=families,
+                           corrupt_rate=args.corrupt, seed=1)
+    sent_at = {}
+    sim.on_sent = lambda frame, ts: sent_at.__setitem__(frame, ts)
+    port = await sim.start('127.0.0.1', 0)
+
+    loader = EEPLoader(DEFINITIONS_PATH)
+    eep_parser = EEPParser()
+    profiles = {sender: loader.get_profile(eep) for sender, eep in sim.device_map.items()}
+
+    handler = SerialHandler(f"tcp://127.0.0.1:{port}")
+    assert await handler.open(), "could not connect to simulator"
+    print(f"Base ID {await handler.get_base_id()}, {args.devices} devices, "
+          f"~{args.devices / args.interval:.0f} telegrams/s offered for {args.duration:.0f}s\n")
+
+    latencies = []
+    decoded = 0
+
+    async def on_packet(packet):
+        nonlocal decoded
+        profile = profiles.get(packet.get_sender_id())
+        if profile and eep_parser.parse_telegram_with_full_data(packet.data, profile) is not None:
+            decoded += 1
+        sent = sent_at.pop(packet.raw, None)
+        if sent is not None:
+            latencies.append(time.monotonic() - sent)
+
+    reader = asyncio.create_task(handler.start_reading(on_packet))
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    elapsed = time.perf_counter() - start
+    handler.stop_reading()
+    reader.cancel()
+    handler.close()
+    await sim.stop()
+
+    stats = handler.get_statistics()
+    print(f"offered    {sim.stats['telegrams'] / elapsed:10.0f} telegrams/s  ({sim.stats['corrupted']} corrupted)")
+    print(f"received   {len(latencies) / elapsed:10.0f} telegrams/s  ({decoded} decoded)")
+    print(f"CRC errors {stats['data_crc_errors'] + stats['header_crc_errors']:10d}")
+    print(f"latency    p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"max {max(latencies, default=0) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
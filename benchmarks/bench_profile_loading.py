@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark: EEP profile loading
+Compares parsing every profile definition up front (the former
+EEPLoader.load_profiles) with the lazy loader, which only indexes the
+files at startup and parses the profiles of assigned devices on first
+use, and with the lazy loader reading the precompiled profile bundle
+(eep.bundle, built once before the runs). Each variant runs in a fresh
+interpreter; reports startup time and the growth of the resident set size
+(peak RSS after imports vs. after loading).
+
+Usage: python3 benchmarks/bench_profile_loading.py [--assigned 12] [--runs 5]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from glob import glob
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+from eep.bundle import sync  # noqa: E402
+from eep.loader import EEPLoader, EEPProfile  # noqa: E402
+from gateway_simulator import DEFINITIONS_PATH  # noqa: E402
+
+
+def rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load_eager():
+    """All definitions parsed and compiled at startup"""
+    profiles = {}
+    for file_path in glob(os.path.join(DEFINITIONS_PATH, '**', '*.json'), recursive=True):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if 'eep' in data:
+            profiles[data['eep']] = EEPProfile(data)
+    return profiles
+
+
+def load_lazy(assigned: int, bundle_path=None):
+    """Index at startup, then the profiles of the assigned devices"""
+    loader = EEPLoader(DEFINITIONS_PATH, bundle_path=bundle_path)
+    eeps = sorted(loader.manifest)
+    step = max(1, len(eeps) // max(1, assigned))
+    for eep in eeps[::step][:assigned]:
+        loader.get_profile(eep)
+    return loader
+
+
+def measure(mode: str, assigned: int, bundle_path: str):
+    """Runs in the child interpreter: prints startup seconds and RSS growth"""
+    before = rss_kb()
+    start = time.perf_counter()
+    if mode == 'eager':
+        result = load_eager()
+    else:
+        result = load_lazy(assigned, bundle_path if mode == 'bundle' else None)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb() - before}))
+    return result
+
+
+def run_child(mode: str, assigned: int, bundle_path: str) -> dict:
+    output = subprocess.run([sys.executable, __file__, '--child', mode, '--assigned', str(assigned),
+                             '--bundle-path', bundle_path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assigned', type=int, default=12, help='distinct EEPs in use')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=('eager', 'lazy', 'bundle'), help=argparse.SUPPRESS)
+    parser.add_argument('--bundle-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child, args.assigned, args.bundle_path)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        bundle_path = os.path.join(directory, 'eep_profiles.bundle')
+        sync([DEFINITIONS_PATH], bundle_path)
+
+        print(f"{'variant':32} {'startup ms':>11} {'RSS growth MB':>14}")
+        results = {}
+        for mode, label in (('eager', 'parse all at startup'),
+                            ('lazy', f'lazy, {args.assigned} EEPs assigned'),
+                            ('bundle', f'lazy + bundle, {args.assigned} EEPs')):
+            runs = [run_child(mode, args.assigned, bundle_path) for _ in range(args.runs)]
+            seconds = sorted(r['seconds'] for r in runs)[len(runs) // 2]
+            rss = sorted(r['rss_kb'] for r in runs)[len(runs) // 2]
+            results[mode] = (seconds, rss)
+            print(f"{label:32} {seconds * 1000:11.1f} {rss / 1024:14.1f}")
+
+    eager = results['eager']
+    for mode in ('lazy', 'bundle'):
+        seconds, rss = results[mode]
+        print(f"{mode}: startup {eager[0] / seconds:.1f}x faster, {(eager[1] - rss) / 1024:.1f} MB less resident memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Throughput Benchmark: TX scheduler with mixed RPS and 4BS traffic
+Measures commands/second when emulated rocker presses (press + 100 ms +
+release) and 4BS telegrams to many destinations are submitted at once,
+compared with the former sequential path (sleep between press and
+release inside the command handler).
+
+The transport is simulated as a 57600 baud serial line.
+
+Usage: python3 benchmarks/bench_tx_scheduler.py [--commands 200] [--devices 40]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+# The scheduler does not touch pyserial; allow running without it installed
+try:
+    import serial  # noqa: F401
+except ImportError:
+    sys.modules['serial'] = types.ModuleType('serial')
+
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+from core.serial_handler import TransmitScheduler  # noqa: E402
+
+BASE_ID = 'ff800000'
+BAUDRATE = 57600
+PRESS_DURATION = 0.1
+
+
+async def serial_write(packets) -> bool:
+    # 10 bits per byte on the wire
+    await asyncio.sleep(sum(len(packet.build()) for packet in packets) * 10 / BAUDRATE)
+    return True
+
+
+def make_commands(count: int, devices: int):
+    commands = []
+    for i in range(count):
+        destination = f"{0x05000000 + (i % devices):08x}"
+        if i % 2:
+            commands.append(('4bs', destination, [ESP3Packet.create_4bs_packet(BASE_ID, destination, i & 0x7F, 0, 0, 0x08)]))
+        else:
+            commands.append(('rps', destination, [
+                ESP3Packet.create_rps_packet(BASE_ID, destination, 0x10, pressed=True),
+                ESP3Packet.create_rps_packet(BASE_ID, destination, 0x10, pressed=False),
+            ]))
+    return commands
+
+
+async def run_sequential(commands) -> float:
+    start = time.perf_counter()
+    for kind, _, packets in commands:
+        await serial_write(packets[:1])
+        if kind == 'rps':
+            await asyncio.sleep(PRESS_DURATION)
+            await serial_write(packets[1:])
+    return time.perf_counter() - start
+
+
+async def run_scheduler(commands):
+    tx = TransmitScheduler(serial_write, duty_cycle=1.0)
+    start = time.perf_counter()
+    futures = [
+        tx.submit(packets, gap=PRESS_DURATION if kind == 'rps' else 0.0, destination=destination)
+        for kind, destination, packets in commands
+    ]
+    results = await asyncio.gather(*futures)
+    elapsed = time.perf_counter() - start
+    tx.stop()
+    assert all(results)
+    return elapsed, tx.get_statistics()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commands', type=int, default=200, help='number of commands (half RPS, half 4BS)')
+    parser.add_argument('--devices', type=int, default=40, help='number of destinations')
+    args = parser.parse_args()
+
+    commands = make_commands(args.commands, args.devices)
+    print(f"{len(commands)} commands (50% RPS, 50% 4BS) to {args.devices} devices\n")
+
+    sequential = await run_sequential(commands)
+    print(f"sequential (sleep in handler)  {len(commands) / sequential:8.1f} commands/s  ({sequential:.2f}s)")
+
+    elapsed, stats = await run_scheduler(commands)
+    print(f"TX scheduler (timed release)   {len(commands) / elapsed:8.1f} commands/s  ({elapsed:.2f}s)")
+    print(f"\nmax release delay beyond {PRESS_DURATION * 1000:.0f} ms: {stats['release_late_max'] * 1000:.2f} ms, "
+          f"avg queue latency {stats['latency_avg'] * 1000:.1f} ms, "
+          f"{stats['frames_per_flush']:.1f} frames/flush (max {stats['frames_per_flush_max']})")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
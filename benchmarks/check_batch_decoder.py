@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Differential Check + Benchmark: batch decoder vs single-telegram path
+Decodes random telegrams (every payload value for 1-byte profiles) of every
+bundled EEP profile once with EEPParser.parse_batch and once per telegram
+with EEPParser.parse_telegram_with_full_data, and fails on the first row
+where the two disagree. Afterwards reports telegrams/s of both paths.
+
+Requires numpy.
+
+Usage: python3 benchmarks/check_batch_decoder.py [--telegrams 2000] [--families A5-02,F6]
+           [--bench-telegrams 100000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is required for the batch decoder (pip install numpy)")
+
+from eep.batch import stack_telegrams  # noqa: E402
+from eep.loader import EEPLoader  # noqa: E402
+from eep.parser import EEPParser  # noqa: E402
+from gateway_simulator import DEFINITIONS_PATH, _payload_length  # noqa: E402
+
+STATUS_VALUES = (0x00, 0x20, 0x30, 0x0F, 0xFF)
+SENDER = bytes.fromhex('01a2b3c4')
+
+
+def make_telegrams(profile, count: int, rand: random.Random):
+    """ERP1 data blocks with random payloads and status bytes"""
+    rorg = bytes([int(profile.rorg, 16)])
+    length = _payload_length(profile)
+    if length == 1:
+        payloads = [bytes([value]) for value in range(256)]
+        return [rorg + payload + SENDER + bytes([status]) for payload in payloads for status in STATUS_VALUES]
+    return [rorg + bytes(rand.getrandbits(8) for _ in range(length)) + SENDER
+            + bytes([rand.choice(STATUS_VALUES + (rand.getrandbits(8),))])
+            for _ in range(count)]
+
+
+def row(decoded, index: int) -> dict:
+    return {shortcut: (column[index].item() if hasattr(column[index], 'item') else column[index])
+            for shortcut, column in decoded.items() if not np.ma.getmaskarray(column)[index]}
+
+
+def check_profile(eep_parser, profile, telegrams) -> int:
+    """Number of rows where batch and single-telegram results differ"""
+    payloads, status = stack_telegrams(telegrams)
+    decoded = eep_parser.parse_batch(payloads, profile, status)
+    mismatches = 0
+    for i, data in enumerate(telegrams):
+        expected = dict(eep_parser.parse_telegram_with_full_data(data, profile))
+        got = row(decoded, i)
+        if got != expected:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"  {profile.eep} {data.hex()}:\n    single {expected}\n    batch  {got}")
+    return mismatches
+
+
+def rate(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--telegrams', type=int, default=2000, help='random telegrams per profile')
+    parser.add_argument('--families', default='', help='comma separated EEP prefixes (default: all)')
+    parser.add_argument('--bench-telegrams', type=int, default=100000, help='telegrams per timed family')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    loader = EEPLoader(DEFINITIONS_PATH)
+    eep_parser = EEPParser(cache_size=0)
+    rand = random.Random(1)
+    families = [f.strip() for f in args.families.split(',') if f.strip()]
+    profiles = [profile for eep, profile in sorted(loader.profiles.items())
+                if profile.rorg and (not families or any(eep.startswith(f) for f in families))]
+
+    failed = 0
+    for profile in profiles:
+        mismatches = check_profile(eep_parser, profile, make_telegrams(profile, args.telegrams, rand))
+        if mismatches:
+            failed += 1
+            print(f"{profile.eep}: {mismatches} mismatching rows")
+    print(f"\n{len(profiles) - failed}/{len(profiles)} profiles identical\n")
+
+    print(f"{'eep':12} {'single/s':>12} {'batch/s':>12} {'speedup':>8}")
+    timed = {}
+    for profile in profiles:
+        timed.setdefault(profile.eep[:5], profile)
+    for family, profile in sorted(timed.items()):
+        telegrams = make_telegrams(profile, args.bench_telegrams, rand)
+        telegrams = (telegrams * (args.bench_telegrams // len(telegrams) + 1))[:args.bench_telegrams]
+        payloads, status = stack_telegrams(telegrams)
+        single = rate(lambda: [eep_parser.parse_telegram_with_full_data(data, profile) for data in telegrams],
+                      len(telegrams))
+        batch = rate(lambda: eep_parser.parse_batch(payloads, profile, status), len(telegrams))
+        print(f"{profile.eep:12} {single:12.0f} {batch:12.0f} {batch / single:7.1f}x")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
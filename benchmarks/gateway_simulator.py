@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Synthetic EnOcean Gateway Simulator
+Local TCP server speaking ESP3 like a busware TCP gateway, so the bridge
+can be load tested without hardware (connect with tcp://127.0.0.1:<port>).
+
+Simulates any number of devices across the bundled EEP families with
+randomised send intervals, bursts, an RSSI distribution and optional CRC
+corruption. CO_RD_IDBASE and CO_RD_VERSION are answered like a real
+gateway, every other common command and every radio telegram written by
+the bridge is acknowledged with RET_OK.
+
+Usage: python3 benchmarks/gateway_simulator.py [--port 2100] [--devices 2000]
+           [--interval 10] [--families A5,F6] [--corrupt 0.01]
+"""
+import argparse
+import asyncio
+import heapq
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'addon', 'rootfs', 'app')
+sys.path.insert(0, os.path.abspath(APP_PATH))
+
+from core.esp3_framer import ESP3Framer  # noqa: E402
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+from eep.loader import EEPLoader  # noqa: E402
+
+DEFINITIONS_PATH = os.path.join(os.path.abspath(APP_PATH), 'eep', 'definitions')
+
+RORG_RPS = 0xF6
+RORG_1BS = 0xD5
+RORG_4BS = 0xA5
+RET_OK = 0x00
+
+# Rocker actions used for simulated RPS switches (press, release pairs)
+RPS_PRESS_CODES = (0x10, 0x30, 0x50, 0x70)
+
+
+class SimulatedDevice:
+    """One simulated sender"""
+
+    __slots__ = ('sender_id', 'eep', 'rorg', 'payload_length', 'interval', 'rssi_mean')
+
+    def __init__(self, sender_id: int, eep: str, rorg: int, payload_length: int,
+                 interval: float, rssi_mean: float):
+        self.sender_id = sender_id
+        self.eep = eep
+        self.rorg = rorg
+        self.payload_length = payload_length
+        self.interval = interval
+        self.rssi_mean = rssi_mean
+
+
+def _payload_length(profile) -> int:
+    """Data bytes between RORG and sender id for a profile"""
+    rorg = int(profile.rorg, 16)
+    if rorg == RORG_4BS:
+        return 4
+    if rorg in (RORG_RPS, RORG_1BS):
+        return 1
+    # VLD and others: cover the highest bit any datafield uses
+    highest = 8
+    cases = profile.data.get('case', [])
+    for case in cases if isinstance(cases, list) else []:
+        for field in case.get('datafield', []):
+            try:
+                highest = max(highest, int(field.get('bitoffs', 0)) + int(field.get('bitsize', 0)))
+            except (TypeError, ValueError):
+                continue
+    return min((highest + 7) // 8, 14)
+
+
+class GatewaySimulator:
+    """Emits synthetic ERP1 telegrams to every connected TCP client"""
+
+    def __init__(self, devices: int = 1000, interval: float = 60.0, families: Optional[List[str]] = None,
+                 burst_probability: float = 0.0, burst_size: int = 3, rssi_mean: float = -70.0,
+                 rssi_stddev: float = 8.0, corrupt_rate: float = 0.0, base_id: str = 'ff800000',
+                 seed: Optional[int] = None, definitions_path: str = DEFINITIONS_PATH):
+        """
+        Initialize simulator
+
+        Args:
+            devices: Number of simulated senders
+            interval: Mean seconds between telegrams of one device (jittered +-50%)
+            families: EEP prefixes to simulate (e.g. ['A5-02', 'F6']), default all
+            burst_probability: Chance that a transmission is repeated burst_size times
+            burst_size: Copies sent back to back in a burst
+            rssi_mean: Mean RSSI in dBm; each device gets its own mean around it
+            rssi_stddev: Per-telegram RSSI spread in dB
+            corrupt_rate: Fraction of frames with a flipped data byte (bad CRC)
+            base_id: Base ID reported for CO_RD_IDBASE
+            seed: Random seed for reproducible runs
+        """
+        self.random = random.Random(seed)
+        self.interval = interval
+        self.burst_probability = burst_probability
+        self.burst_size = max(1, burst_size)
+        self.rssi_stddev = rssi_stddev
+        self.corrupt_rate = corrupt_rate
+        self.base_id = bytes.fromhex(base_id)
+        self.on_sent: Optional[Callable[[bytes, float], None]] = None
+
+        loader = EEPLoader(definitions_path)
+        eeps = sorted(entry.eep for entry in loader.manifest.values() if entry.rorg and
+                      (not families or any(entry.eep.startswith(f) for f in families)))
+        if not eeps:
+            raise ValueError("No EEP profiles match the requested families")
+        profiles = [loader.get_profile(eep) for eep in eeps]
+
+        self.devices: List[SimulatedDevice] = []
+        for index in range(devices):
+            profile = profiles[index % len(profiles)]
+            self.devices.append(SimulatedDevice(
+                sender_id=0x05000000 + index,
+                eep=profile.eep,
+                rorg=int(profile.rorg, 16),
+                payload_length=_payload_length(profile),
+                interval=interval,
+                rssi_mean=self.random.gauss(rssi_mean, rssi_stddev),
+            ))
+
+        self._clients: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._emitter: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {
+            'telegrams': 0,
+            'bytes': 0,
+            'bursts': 0,
+            'corrupted': 0,
+            'commands': 0,
+            'radio_writes': 0,
+        }
+
+    @property
+    def device_map(self) -> Dict[str, str]:
+        """Sender id (hex) -> EEP of every simulated device"""
+        return {f"{d.sender_id:08x}": d.eep for d in self.devices}
+
+    # --- Telegram generation ---
+
+    def _payload(self, device: SimulatedDevice) -> tuple:
+        rand = self.random
+        if device.rorg == RORG_RPS:
+            pressed = rand.random() < 0.5
+            return bytes([rand.choice(RPS_PRESS_CODES) if pressed else 0x00]), (0x30 if pressed else 0x20)
+        payload = bytearray(rand.getrandbits(8) for _ in range(device.payload_length))
+        if device.rorg in (RORG_4BS, RORG_1BS):
+            payload[-1] |= 0x08  # LRN bit set = data telegram, not teach-in
+        return bytes(payload), 0x00
+
+    def build_frame(self, device: SimulatedDevice) -> bytes:
+        payload, status = self._payload(device)
+        data = bytes([device.rorg]) + payload + device.sender_id.to_bytes(4, 'big') + bytes([status])
+        rssi = int(min(max(-self.random.gauss(device.rssi_mean, self.rssi_stddev), 30), 110))
+        optional = bytes([0x01, 0xFF, 0xFF, 0xFF, 0xFF, rssi, 0x00])
+        frame = ESP3Packet.from_parts(ESP3Packet.PACKET_TYPE_RADIO_ERP1, data, optional).build()
+        if self.corrupt_rate and self.random.random() < self.corrupt_rate:
+            corrupted = bytearray(frame)
+            corrupted[ESP3Packet.HEADER_LENGTH + self.random.randrange(len(data))] ^= 0xFF
+            self.stats['corrupted'] += 1
+            return bytes(corrupted)
+        return frame
+
+    def _next_delay(self, device: SimulatedDevice) -> float:
+        return device.interval * self.random.uniform(0.5, 1.5)
+
+    async def _emit_loop(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # Spread first transmissions over one interval
+        schedule = [(now + self.random.uniform(0, self.interval), index) for index in range(len(self.devices))]
+        heapq.heapify(schedule)
+        while True:
+            delay = schedule[0][0] - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = loop.time()
+            chunk = bytearray()
+            while schedule and schedule[0][0] <= now:
+                due, index = heapq.heappop(schedule)
+                device = self.devices[index]
+                copies = 1
+                if self.burst_probability and self.random.random() < self.burst_probability:
+                    copies = self.burst_size
+                    self.stats['bursts'] += 1
+                for _ in range(copies):
+                    frame = self.build_frame(device)
+                    chunk += frame
+                    self.stats['telegrams'] += 1
+                    if self.on_sent:
+                        self.on_sent(frame, time.monotonic())
+                heapq.heappush(schedule, (due + self._next_delay(device), index))
+            if chunk:
+                self._broadcast(bytes(chunk))
+            else:
+                await asyncio.sleep(0)
+
+    def _broadcast(self, data: bytes):
+        self.stats['bytes'] += len(data)
+        for writer in list(self._clients):
+            if writer.is_closing():
+                continue
+            writer.write(data)
+
+    # --- Host commands ---
+
+    def _response(self, packet: ESP3Packet) -> bytes:
+        if packet.packet_type == ESP3Packet.PACKET_TYPE_COMMON_COMMAND:
+            self.stats['commands'] += 1
+            command = packet.data[0] if packet.data_length else None
+            if command == ESP3Packet.CO_RD_IDBASE:
+                data = bytes([RET_OK]) + self.base_id + bytes([0x0A])
+            elif command == ESP3Packet.CO_RD_VERSION:
+                data = (bytes([RET_OK, 2, 11, 1, 0, 2, 6, 3, 0]) + bytes.fromhex('01a2b3c4') +
+                        b'GSIM' + b'GATEWAY SIM'.ljust(16, b'\x00'))
+            else:
+                data = bytes([RET_OK])
+        else:
+            self.stats['radio_writes'] += 1
+            data = bytes([RET_OK])
+        return ESP3Packet.from_parts(ESP3Packet.PACKET_TYPE_RESPONSE, data).build()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        framer = ESP3Framer()
+        self._clients[writer] = asyncio.current_task()
+        peer = writer.get_extra_info('peername')
+        print(f"Client connected: {peer}")
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                for packet in framer.feed(data):
+                    writer.write(self._response(packet))
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+            print(f"Client disconnected: {peer}")
+
+    # --- Lifecycle ---
+
+    async def start(self, host: str = '127.0.0.1', port: int = 2100) -> int:
+        """Start listening and emitting; returns the bound port"""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        self._emitter = asyncio.create_task(self._emit_loop())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._emitter:
+            self._emitter.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        clients = list(self._clients.items())
+        for writer, _ in clients:
+            writer.close()
+        # Let client handlers see EOF and finish before the loop goes away
+        await asyncio.gather(*(task for _, task in clients), return_exceptions=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2100)
+    parser.add_argument('--devices', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=10.0, help="mean seconds between telegrams per device")
+    parser.add_argument('--families', default='', help="comma separated EEP prefixes, e.g. A5-02,F6")
+    parser.add_argument('--burst-probability', type=float, default=0.0)
+    parser.add_argument('--burst-size', type=int, default=3)
+    parser.add_argument('--rssi-mean', type=float, default=-70.0)
+    parser.add_argument('--rssi-stddev', type=float, default=8.0)
+    parser.add_argument('--corrupt', type=float, default=0.0, help="fraction of frames with bad CRC")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    families = [f.strip() for f in args.families.split(',') if f.strip()]
+    sim = GatewaySimulator(devices=args.devices, interval=args.interval, families=families,
+                           burst_probability=args.burst_probability, burst_size=args.burst_size,
+                           rssi_mean=args.rssi_mean, rssi_stddev=args.rssi_stddev,
+                           corrupt_rate=args.corrupt, seed=args.seed)
+    port = await sim.start(args.host, args.port)
+    rate = args.devices / args.interval
+    print(f"Simulating {args.devices} devices (~{rate:.0f} telegrams/s) on tcp://{args.host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"  {sim.stats}")
+    finally:
+        await sim.stop()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
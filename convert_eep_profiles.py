@@ -8,10 +8,13 @@ Smart EEP Downloader & Converter v8 (Cover & Climate Support)
 - Macht Sollwerte (Setpoints) und Ventile steuerbar (number)
 - Markiert RSSI, Last Seen, Error als 'diagnostic'
 - Erkennt Batterien korrekt (device_class: battery)
+- Optional: schreibt alle Profile als vorkompiliertes Bundle (--bundle)
 """
+import argparse
 import json
 import os
 import re
+import sys
 import urllib.request
 import zipfile
 from pathlib import Path
@@ -22,6 +25,8 @@ from pathlib import Path
 GITHUB_URL = "https://github.com/Jey-Cee/ioBroker.enocean/archive/refs/heads/master.zip"
 ZIP_INTERNAL_PATH = "ioBroker.enocean-master/lib/definitions/eep"
 DEST_DIR = Path("addon/rootfs/app/eep/definitions")
+APP_DIR = Path("addon/rootfs/app")
+BUNDLE_PATH = DEST_DIR.parent / "definitions.bundle"
 
 # ==============================================================================
 # DEFINITIONEN & MAPPINGS
@@ -249,5 +254,24 @@ def download_and_process():
         print(f"\n🎉 Fertig! {count} Profile konvertiert (v8: Cover, Climate Controls, Fixes).")
     except Exception as e: print(f"\n❌ FEHLER: {e}")
 
+def write_bundle(bundle_path=BUNDLE_PATH):
+    """Alle Profile aus DEST_DIR -> ein Bundle (gestrippt, Ausdrücke vorkompiliert, siehe eep/bundle.py)"""
+    sys.path.insert(0, str(APP_DIR))
+    from eep.bundle import sync
+
+    entries, stats = sync([str(DEST_DIR)], str(bundle_path))
+    profiles = sum(1 for entry in entries if entry.header)
+    print(f"📦 Bundle: {bundle_path} ({profiles} Profile, {os.path.getsize(bundle_path)} Bytes, "
+          f"{stats['compiled']} neu kompiliert)")
+
 if __name__ == "__main__":
-    download_and_process()
+    parser = argparse.ArgumentParser(description="EEP Downloader & Converter")
+    parser.add_argument("--bundle", action="store_true", help="zusätzlich das Profil-Bundle schreiben")
+    parser.add_argument("--bundle-only", action="store_true", help="nur das Bundle aus DEST_DIR schreiben (kein Download)")
+    parser.add_argument("--bundle-path", default=str(BUNDLE_PATH))
+    args = parser.parse_args()
+
+    if not args.bundle_only:
+        download_and_process()
+    if args.bundle or args.bundle_only:
+        write_bundle(args.bundle_path)